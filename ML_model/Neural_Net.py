@@ -1,76 +1,121 @@
-import torch
-import torch.nn as nn
-import pandas as pd
-from torch.utils.data import Dataset, DataLoader
-from sklearn.preprocessing import StandardScaler
-import matplotlib.pyplot as plt
-import matplotlib as mpl
-from matplotlib.colors import LinearSegmentedColormap
-from matplotlib.ticker import MaxNLocator
-from sklearn.metrics import confusion_matrix, ConfusionMatrixDisplay
-import numpy as np
-
-# ==============================
-# Load and Parse Sensor Data
-# ==============================
+"""
+Coffee roast classifier: a small fully connected network trained on chamber
+sensor readings, labelled AIR, LIGHT, MEDIUM or DARK.
 
-file_path = "data/3-17_week_training.csv"
-separate_test_file = True
-tf_path = "data\COMBINED_SET3-14.csv" # Test file path
-num_epochs = 20
+The pipeline is split into functions so each stage can be reused, cached and
+profiled on its own:
 
-label_mapping = { 'AIR': 0, 'LIGHT': 1, 'MEDIUM': 2, 'DARK': 3 }
+    load_dataset -> fit_scaler / scale -> split_dataset -> train -> evaluate -> export_model
 
-# Load dataset
-df = pd.read_csv(file_path, header=None)
+Run as a script for the whole pipeline, ex:
 
-# Extract labels (first column) and sensor values (every second column starting from column 2)
-labels = df.iloc[:, 0]  # Labels (first column)
-sensor_values = df.iloc[:, 2::2]  # Only sensor readings (columns 2,4,6,...)
+    python Neural_Net.py --train data/3-17_week_training.csv --test data/COMBINED_SET3-14.csv \\
+        --export models/roast_classifier.npz --plot confusion_matrix_4k.pdf
 
+`--fast` trains on the whole feature tensor with index-sliced batches instead of
+a DataLoader, which allows large batches, ex:
 
-# **Store Original Label Names Before Conversion**
-if labels.dtype.name == 'object':
-    #label_mapping = {name: i for i, name in enumerate(labels.astype('category').cat.categories)}  # Map words -> numbers
-    reverse_mapping = {i: name for name, i in label_mapping.items()}  # Map numbers -> words
-    labels = labels.map(label_mapping)  # Convert labels to numerical
-else:
-    label_mapping = None  # No mapping needed if labels were already numeric
+    python Neural_Net.py --fast --batch-size 256 --patience 5 --report-speedup
 
-# Normalize the sensor data (optional but often helpful)
-scaler = StandardScaler()
-sensor_values = scaler.fit_transform(sensor_values)
+matplotlib is only imported when a plot is requested, so headless training
+never loads it.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
 
-# Convert data to PyTorch tensors
-sensor_tensor = torch.tensor(sensor_values, dtype=torch.float32)
-labels_tensor = torch.tensor(labels.values, dtype=torch.long)
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.utils.data import Dataset, DataLoader
 
-# Repeat the same process to create a test set from another file
-if separate_test_file:
-    # Load test dataset
-    tf = pd.read_csv(tf_path, header=None)
+try:
+    from model_export import WEIGHT_DTYPES, export_model, verify_export
+except ImportError:
+    # run or imported from outside ML_model
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from model_export import WEIGHT_DTYPES, export_model, verify_export
 
-    # Extract labels (first column) and sensor values (every second column starting from column 2)
-    t_labels = tf.iloc[:, 0]  # Labels (first column)
-    t_sensor_values = tf.iloc[:, 2::2]  # Only sensor readings (columns 2,4,6,...)
+label_mapping = { 'AIR': 0, 'LIGHT': 1, 'MEDIUM': 2, 'DARK': 3 }
+reverse_mapping = {i: name for name, i in label_mapping.items()}  # Map numbers -> words
 
+# ==============================
+# Load and Parse Sensor Data
+# ==============================
 
-    # Store Original Label Names Before Conversion
-    if t_labels.dtype.name == 'object':
-        #t_label_mapping = {name: i for i, name in enumerate(t_labels.astype('category').cat.categories)}  # Map words -> numbers
-        #t_reverse_mapping = {i: name for name, i in t_label_mapping.items()}  # Map numbers -> words
-        t_reverse_mapping = {i: name for name, i in label_mapping.items()}  # Map numbers -> words
-        t_labels = t_labels.map(label_mapping)  # Convert labels to numerical
-    else:
-        t_label_mapping = None  # No mapping needed if labels were already numeric
+def load_dataset(path: str, cache_dir: str | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Reads a labelled sensor CSV.
+
+    Rows are <label>, <chamber>, <22 ##READING values>. The label is a class name
+    (see `label_mapping`) or its number, and only every second column starting from
+    column 2 is used as a feature.
+
+    Parameters:
+        path (`str`):
+            The CSV file.
+        cache_dir (`str | None`):
+            Directory to keep the parsed arrays in. They are reused while the CSV's size
+            and modification time are unchanged, so pandas is not even imported.
+
+    Returns:
+        `tuple[np.ndarray, np.ndarray]`: float32 (rows, features) and int64 (rows,) labels.
+    """
+    cache_path = None
+    if cache_dir is not None:
+        st = os.stat(path)
+        key = hashlib.sha1(f"{os.path.abspath(path)}:{st.st_size}:{st.st_mtime_ns}".encode()).hexdigest()[:16]
+        cache_path = os.path.join(cache_dir, f"{os.path.splitext(os.path.basename(path))[0]}-{key}.npz")
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as data:
+                return data["features"], data["labels"]
+
+    import pandas as pd
+    df = pd.read_csv(path, header=None)
 
-    # Normalize the sensor data (optional but often helpful)
-    t_sensor_values = scaler.fit_transform(t_sensor_values)
+    # Extract labels (first column) and sensor values (every second column starting from column 2)
+    labels = df.iloc[:, 0]  # Labels (first column)
+    sensor_values = df.iloc[:, 2::2]  # Only sensor readings (columns 2,4,6,...)
+    if labels.dtype.name == 'object':
+        labels = labels.map(label_mapping)  # Convert labels to numerical
+        if labels.isna().any():
+            raise ValueError(f"{path} has labels other than {list(label_mapping)}")
+
+    features = sensor_values.to_numpy(dtype=np.float32)
+    labels = labels.to_numpy(dtype=np.int64)
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        np.savez(cache_path, features=features, labels=labels)
+    return features, labels
+
+def fit_scaler(features: np.ndarray):
+    """A StandardScaler fit on the features, normalizing is optional but often helpful"""
+    from sklearn.preprocessing import StandardScaler
+    return StandardScaler().fit(features)
+
+def scale(scaler, features: np.ndarray) -> np.ndarray:
+    return scaler.transform(features).astype(np.float32)
+
+def split_dataset(labels: np.ndarray, train_fraction: float = 0.6,
+                  rng: np.random.Generator | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Splits one dataset into train and test indices with the same number of test
+    samples from every class, returns (train indices, test indices).
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    classes = np.unique(labels)
+    test_size = len(labels) - int(train_fraction * len(labels))
+    test_samples_per_class = test_size // len(classes)
+    train_indices, test_indices = [], []
+    for lbl in classes:
+        label_idxs = np.where(labels == lbl)[0]  # Get all indices for this label
+        rng.shuffle(label_idxs)  # Shuffle to randomize
+        test_indices.extend(label_idxs[:test_samples_per_class])
+        train_indices.extend(label_idxs[test_samples_per_class:])  # Use the rest for training
+    return np.array(train_indices, dtype=np.int64), np.array(test_indices, dtype=np.int64)
 
-    # Convert data to PyTorch tensors
-    t_sensor_tensor = torch.tensor(t_sensor_values, dtype=torch.float32)
-    t_labels_tensor = torch.tensor(t_labels.values, dtype=torch.long)
-        
 # ==============================
 # Create Dataset
 # ==============================
@@ -86,57 +131,6 @@ class SensorDataset(Dataset):
     def __getitem__(self, idx):
         return self.features[idx], self.labels[idx]
 
-# Instead of using the entire dataset for training, let's split it (e.g., 80% train, 20% test)
-dataset_size = len(sensor_tensor)
-train_size = int(0.6 * dataset_size)
-test_size = 0
-if (separate_test_file):
-    test_size = len(t_sensor_tensor)
-    train_size = int(dataset_size)
-else:
-    test_size = dataset_size - train_size
-
-# Create indices and split manually
-indices = torch.randperm(dataset_size)
-train_indices, test_indices = [], []
-test_samples_per_class = 1
-if not separate_test_file:
-    test_samples_per_class = test_size // len(np.unique(labels))
-
-for lbl in np.unique(labels):
-    label_idxs = np.where(labels == lbl)[0]  # Get all indices for this label
-    np.random.shuffle(label_idxs)  # Shuffle to randomize
-
-    # determine number of test samples
-    if separate_test_file:
-        t_label_idxs = np.where(t_labels == lbl)[0]
-        test_indices.extend(t_label_idxs)
-        train_indices.extend(label_idxs)
-    else:
-        test_indices.extend(label_idxs[:test_samples_per_class])
-        train_indices.extend(label_idxs[test_samples_per_class:])  # Use the rest for training
-
-# Convert lists to PyTorch tensors
-train_indices = torch.tensor(train_indices, dtype=torch.long)
-test_indices = torch.tensor(test_indices, dtype=torch.long)
-
-train_features = sensor_tensor[train_indices]
-train_labels = labels_tensor[train_indices]
-if (separate_test_file):
-    test_features = t_sensor_tensor[test_indices]
-    t_labels = t_labels_tensor[test_indices]
-else:
-    test_features = sensor_tensor[test_indices]
-    t_labels = labels_tensor[test_indices]
-
-# Create PyTorch datasets
-train_dataset = SensorDataset(train_features, train_labels)
-test_dataset = SensorDataset(test_features, t_labels)
-
-batch_size = 8
-train_loader = DataLoader(dataset=train_dataset, batch_size=batch_size, shuffle=True)
-test_loader = DataLoader(dataset=test_dataset, batch_size=batch_size, shuffle=False)
-
 # ==============================
 # Define Neural Network
 # ==============================
@@ -158,181 +152,407 @@ class NeuralNet(nn.Module):
         out = self.l3(out)
         return out  # No softmax here, since CrossEntropyLoss applies it
 
-# ==============================
-# Initialize Model, Loss, and Optimizer
-# ==============================
-
-input_size = sensor_tensor.shape[1]  # 8 sensor values per row
-hidden_size = 256  # Adjust as needed
-num_classes = len(labels_tensor.unique())  # Should be 4 for your case
-learning_rate = 0.001  # Lower learning rate is better for Adam
-
-print('Using CUDA' if torch.cuda.is_available() else "Using CPU")
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = NeuralNet(input_size, hidden_size, num_classes).to(device)
-
-criterion = nn.CrossEntropyLoss()
-optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
+def get_device() -> torch.device:
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
 # ==============================
 # Train the Model
 # ==============================
 
-n_total_steps = len(train_loader)
-for epoch in range(num_epochs):
-    for i, (inputs, lbls) in enumerate(train_loader):
-        inputs, lbls = inputs.to(device), lbls.to(device)
-
-        # Forward pass
-        outputs = model(inputs)
-        loss = criterion(outputs, lbls)
-
-        # Backward and optimization
-        optimizer.zero_grad()
-        loss.backward()
-        optimizer.step()
-
-        if (i + 1) % 10 == 0:
-            print(f"Epoch [{epoch+1}/{num_epochs}], Step [{i+1}/{n_total_steps}], Loss: {loss.item():.4f}")
+def train(model: NeuralNet, features: np.ndarray, labels: np.ndarray, num_epochs: int = 20,
+          batch_size: int = 8, learning_rate: float = 0.001, log_every: int = 10) -> dict:
+    """
+    Trains the model with Adam and cross entropy on scaled features.
+
+    Returns:
+        `dict`: loss (last batch loss of each epoch) and epoch_times (seconds).
+    """
+    device = next(model.parameters()).device
+    train_dataset = SensorDataset(torch.tensor(features, dtype=torch.float32), torch.tensor(labels, dtype=torch.long))
+    train_loader = DataLoader(dataset=train_dataset, batch_size=batch_size, shuffle=True)
+
+    criterion = nn.CrossEntropyLoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)  # Lower learning rate is better for Adam
+
+    history = {"loss": [], "epoch_times": []}
+    n_total_steps = len(train_loader)
+    model.train()
+    for epoch in range(num_epochs):
+        start = time.perf_counter()
+        for i, (inputs, lbls) in enumerate(train_loader):
+            inputs, lbls = inputs.to(device), lbls.to(device)
+
+            # Forward pass
+            outputs = model(inputs)
+            loss = criterion(outputs, lbls)
+
+            # Backward and optimization
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+
+            if log_every and (i + 1) % log_every == 0:
+                print(f"Epoch [{epoch+1}/{num_epochs}], Step [{i+1}/{n_total_steps}], Loss: {loss.item():.4f}")
+        history["epoch_times"].append(time.perf_counter() - start)
+        history["loss"].append(loss.item())
+    return history
+
+def scaled_learning_rate(learning_rate: float, batch_size: int, base_batch_size: int = 8, rule: str = "sqrt") -> float:
+    """
+    Learning rate for `batch_size` given one tuned for `base_batch_size`. "linear"
+    scales it with the batch size, "sqrt" (usual for Adam) with its square root.
+    """
+    ratio = batch_size / base_batch_size
+    match rule:
+        case "linear":
+            return learning_rate * ratio
+        case "sqrt":
+            return learning_rate * ratio ** 0.5
+        case "none":
+            return learning_rate
+    raise ValueError(f"Unknown learning rate scaling rule {rule}")
+
+def train_fast(model: NeuralNet, features: np.ndarray, labels: np.ndarray, num_epochs: int = 20,
+               batch_size: int = 8, learning_rate: float = 0.001,
+               val_features: np.ndarray | None = None, val_labels: np.ndarray | None = None,
+               patience: int | None = None, min_delta: float = 0.0) -> dict:
+    """
+    Same training as `train` without `Dataset`/`DataLoader`. The whole feature and
+    label tensors stay on the device and each epoch slices batches out of them with
+    a shuffled index, so there is no per-sample indexing or collation in Python.
+    Losses are summed on the device and only read back once per epoch.
+
+    With validation data, the validation loss is computed after every epoch.
+    Training stops once it has not improved by `min_delta` for `patience` epochs,
+    and the weights of the best epoch are restored.
+
+    Returns:
+        `dict`: loss (mean training loss of each epoch), val_loss, epoch_times (seconds),
+        best_epoch and stopped_early.
+    """
+    device = next(model.parameters()).device
+    x = torch.as_tensor(features, dtype=torch.float32, device=device)
+    y = torch.as_tensor(labels, dtype=torch.long, device=device)
+    validate = val_features is not None
+    if validate:
+        val_x = torch.as_tensor(val_features, dtype=torch.float32, device=device)
+        val_y = torch.as_tensor(val_labels, dtype=torch.long, device=device)
+
+    criterion = nn.CrossEntropyLoss()
+    optimizer = torch.optim.Adam(model.parameters(), lr=learning_rate)
+
+    history = {"loss": [], "val_loss": [], "epoch_times": [], "best_epoch": None, "stopped_early": False}
+    best_loss, best_state, bad_epochs = float("inf"), None, 0
+    n = len(x)
+    for epoch in range(num_epochs):
+        start = time.perf_counter()
+        model.train()
+        total_loss = torch.zeros((), device=device)
+        perm = torch.randperm(n, device=device)
+        for i in range(0, n, batch_size):
+            idx = perm[i:i + batch_size]
+            outputs = model(x[idx])
+            loss = criterion(outputs, y[idx])
+
+            optimizer.zero_grad(set_to_none=True)
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.detach() * len(idx)
+        history["loss"].append(total_loss.item() / n)
+
+        if validate:
+            model.eval()
+            with torch.no_grad():
+                val_loss = criterion(model(val_x), val_y).item()
+            history["val_loss"].append(val_loss)
+            if val_loss < best_loss - min_delta:
+                best_loss, bad_epochs = val_loss, 0
+                history["best_epoch"] = epoch
+                best_state = {k: v.detach().clone() for k, v in model.state_dict().items()}
+            else:
+                bad_epochs += 1
+        history["epoch_times"].append(time.perf_counter() - start)
+
+        if validate and patience is not None and bad_epochs >= patience:
+            history["stopped_early"] = True
+            break
+    if best_state is not None:
+        model.load_state_dict(best_state)
+    return history
+
+def compare_epoch_times(features: np.ndarray, labels: np.ndarray, hidden_size: int = 256,
+                        batch_size: int = 8, fast_batch_size: int | None = None, epochs: int = 3) -> dict:
+    """
+    Times training epochs of fresh models with the `DataLoader` loop (`train`) and
+    the whole-tensor loop (`train_fast`) at the same batch size, and with
+    `train_fast` at `fast_batch_size` when given.
+
+    Returns:
+        `dict`: mean seconds per epoch of each run and the speedups over `train`.
+    """
+    device = get_device()
+    def new_model():
+        return NeuralNet(features.shape[1], hidden_size, len(label_mapping)).to(device)
+
+    report = {"loader_s": float(np.mean(train(new_model(), features, labels, num_epochs=epochs,
+                                              batch_size=batch_size, log_every=0)["epoch_times"]))}
+    report["fast_s"] = float(np.mean(train_fast(new_model(), features, labels, num_epochs=epochs,
+                                                batch_size=batch_size)["epoch_times"]))
+    report["speedup"] = report["loader_s"] / report["fast_s"]
+    if fast_batch_size and fast_batch_size != batch_size:
+        report[f"fast_bs{fast_batch_size}_s"] = float(np.mean(train_fast(new_model(), features, labels, num_epochs=epochs,
+                                                                         batch_size=fast_batch_size)["epoch_times"]))
+        report[f"speedup_bs{fast_batch_size}"] = report["loader_s"] / report[f"fast_bs{fast_batch_size}_s"]
+    return report
 
 # ==============================
 # Test the Model
 # ==============================
 
-all_preds = []
-all_labels = []
-
-with torch.no_grad():
-    n_correct = 0
-    n_samples = len(test_dataset)
-    for i, (inputs, lbls) in enumerate(test_loader):
-        inputs, lbls = inputs.to(device), lbls.to(device)
-        outputs = model(inputs)
-        _, predicted = torch.max(outputs, 1)
-        n_correct += (predicted == lbls).sum().item()
-    
-
-        # Store predictions and labels for confusion matrix
-        all_preds.extend(predicted.cpu().numpy())
-        all_labels.extend(lbls.cpu().numpy())
-
-    acc = n_correct / n_samples
-    print(f"Overall Accuracy of the network on {n_samples} test samples: {100*acc:.2f} %")
+def evaluate(model: NeuralNet, features: np.ndarray, labels: np.ndarray, batch_size: int = 8) -> dict:
+    """
+    Returns:
+        `dict`: accuracy, preds and labels (numpy arrays of class numbers).
+    """
+    device = next(model.parameters()).device
+    test_dataset = SensorDataset(torch.tensor(features, dtype=torch.float32), torch.tensor(labels, dtype=torch.long))
+    test_loader = DataLoader(dataset=test_dataset, batch_size=batch_size, shuffle=False)
+
+    all_preds = []
+    all_labels = []
+    model.eval()
+    with torch.no_grad():
+        for inputs, lbls in test_loader:
+            inputs, lbls = inputs.to(device), lbls.to(device)
+            outputs = model(inputs)
+            _, predicted = torch.max(outputs, 1)
+            # Store predictions and labels for confusion matrix
+            all_preds.extend(predicted.cpu().numpy())
+            all_labels.extend(lbls.cpu().numpy())
+
+    all_preds, all_labels = np.array(all_preds), np.array(all_labels)
+    return {
+        "accuracy": float((all_preds == all_labels).mean()) if len(all_labels) else 0.0,
+        "preds": all_preds,
+        "labels": all_labels,
+    }
+
+def predict(model: NeuralNet, features: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+    """Predicted class numbers, the whole feature array goes through the model in a few large batches"""
+    device = next(model.parameters()).device
+    x = torch.as_tensor(features, dtype=torch.float32, device=device)
+    model.eval()
+    with torch.no_grad():
+        preds = [model(x[i:i + chunk_size]).argmax(dim=1) for i in range(0, len(x), chunk_size)]
+    return torch.cat(preds).cpu().numpy() if preds else np.zeros(0, dtype=np.int64)
+
+def evaluate_fast(model: NeuralNet, features: np.ndarray, labels: np.ndarray) -> dict:
+    """`evaluate` with one vectorized forward pass instead of a DataLoader"""
+    preds = predict(model, features)
+    labels = np.asarray(labels)
+    return {
+        "accuracy": float((preds == labels).mean()) if len(labels) else 0.0,
+        "preds": preds,
+        "labels": labels,
+    }
 
 # ==============================
-# Convert Numerical Labels Back to Word Labels
+# Confusion Matrix
 # ==============================
 
-# Convert predictions and labels back to word labels
-if label_mapping is not None:
-    all_preds_named = [reverse_mapping[p] for p in all_preds]  # Convert predictions
-    all_labels_named = [reverse_mapping[l] for l in all_labels]  # Convert actual labels
-else:
-    all_preds_named = all_preds
-    all_labels_named = all_labels
-#print(all_labels_named)
+def plot_confusion_matrix(labels: np.ndarray, preds: np.ndarray, path: str | None = None, show: bool = False):
+    """Plots the confusion matrix of class numbers, saved to `path` and/or shown"""
+    import matplotlib as mpl
+    if not show:
+        mpl.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import LinearSegmentedColormap
+    from matplotlib.ticker import MaxNLocator
+    from sklearn.metrics import confusion_matrix, ConfusionMatrixDisplay
+
+    plt.rcParams.update({
+        # Thicken grid lines
+        'grid.linewidth': 2,
+        # Remove the axes border by setting its width to 0
+        'axes.linewidth': 0,
+        'axes.labelpad': 12,
+        'axes.titlepad': 12,
+        # Font: choose a round‑looking sans‑serif and bump up the size
+        'font.family': 'sans-serif',
+        'font.sans-serif': ['Tahoma', 'DejaVu Sans'],
+        'font.size': 18,          # base font size
+        'font.weight': '500',
+        # Make tick marks thicker too
+        'xtick.major.width': 0,
+        'ytick.major.width': 0,
+        'xtick.major.size': 0,
+        'ytick.major.size': 0,
+    })
+
+    # Convert numerical labels back to word labels
+    actual_label_names = [name.title() for name in reverse_mapping.values()]
+    named_labels = [reverse_mapping[l].title() for l in labels]
+    named_preds = [reverse_mapping[p].title() for p in preds]
+    conf_matrix = confusion_matrix(named_labels, named_preds, labels=actual_label_names)
+
+    # Create and display confusion matrix
+    disp = ConfusionMatrixDisplay(confusion_matrix=conf_matrix, display_labels=actual_label_names)
+    fig, ax = plt.subplots(figsize=(10, 7))  # Set figure size
+
+    # create color map
+    orig_cmap = LinearSegmentedColormap.from_list(
+        "GreyGreen",
+        ["white", "darkolivegreen", "darkgreen"],       # start at grey, end at full green
+        N=256                          # number of discrete steps
+    )
+    # subsection cmap to scale lower bound color and down upper bound color
+    cust_cmap = LinearSegmentedColormap.from_list(
+        "Green_trunc",
+        orig_cmap(np.linspace(0.08, 0.75, 256))
+    )
+
+    disp.plot(ax=ax, cmap=cust_cmap, values_format="d",  colorbar=False)  # "d" ensures integer values are displayed
+    cbar = fig.colorbar(disp.im_, ax=ax)
+    cbar.ax.yaxis.set_major_locator(MaxNLocator(integer=True))
+    # limit number ticks for cbar
+    cbar.locator = MaxNLocator(nbins=8, integer=True)
+    cbar.update_ticks()
+
+    # axis labels
+    ax.set_xlabel("Predicted Label")
+    ax.set_ylabel("True Label")
+    ax.set_title("Confusion Matrix")
+
+    if path:
+        fig.savefig(path, dpi=600)
+    if show:
+        plt.show()
+    return fig
 
 # ==============================
-# Confusion Matrix
+# Pipeline
 # ==============================
 
-# Ensure equal number of samples per label for visualization
-equal_sample_idxs = []
-
-for lbl in np.unique(all_labels):
-    label_idxs = np.where(np.array(all_labels) == lbl)[0]  # Get indices for this label
-    # Ensure we do not sample more than the available number of items
-    if separate_test_file: 
-        sample_size = len(label_idxs)
-    else: 
-        sample_size = min(test_samples_per_class, len(label_idxs))
-    sampled_idxs = np.random.choice(label_idxs, sample_size, replace=False)
-    equal_sample_idxs.extend(sampled_idxs)
-    
-
-
-all_preds_named = np.array(all_preds_named)
-all_labels_named = np.array(all_labels_named)
-
-equal_preds = all_preds_named[equal_sample_idxs]
-equal_labels = all_labels_named[equal_sample_idxs]
-
-# Ensure actual label names are correctly extracted
-actual_label_names = list(reverse_mapping.values())  # Convert back to word labels
-
-# Find misclassified indices
-misclassified_idxs = np.where(equal_preds != equal_labels)[0]
-
-# Print misclassified cases
-print("\n=== Misclassified Points ===")
-for idx in misclassified_idxs:
-    original_idx = equal_sample_idxs[idx]  # Get original index from full test dataset
-    true_label = equal_labels[idx]  # Actual class
-    predicted_label = equal_preds[idx]  # Predicted class
-    #print(f"Index: {original_idx}, True Label: {true_label}, Predicted: {predicted_label}")
-
-# Print total number of misclassifications
-print(f"\nTotal Misclassified Samples: {len(misclassified_idxs)} / {len(equal_labels)}")
-
-
-plt.rcParams.update({
-    # Thicken grid lines
-    'grid.linewidth': 2,
-    # Remove the axes border by setting its width to 0
-    'axes.linewidth': 0,
-    'axes.labelpad': 12,
-    'axes.titlepad': 12,
-    # Font: choose a round‑looking sans‑serif and bump up the size
-    'font.family': 'sans-serif',
-    'font.sans-serif': ['Tahoma', 'DejaVu Sans'],
-    'font.size': 18,          # base font size
-    'font.weight': '500',
-    # Make tick marks thicker too
-    'xtick.major.width': 0,
-    'ytick.major.width': 0,
-    'xtick.major.size': 0,
-    'ytick.major.size': 0,
-})
-
-
-equal_labels = [label.title() for label in equal_labels]
-equal_preds = [label.title() for label in equal_preds]
-actual_label_names = [label.title() for label in actual_label_names]
-# Generate confusion matrix
-conf_matrix = confusion_matrix(equal_labels, equal_preds, labels=actual_label_names)
-
-# Create and display confusion matrix
-disp = ConfusionMatrixDisplay(confusion_matrix=conf_matrix, display_labels=actual_label_names)
-fig, ax = plt.subplots(figsize=(10, 7))  # Set figure size
-
-# create color map
-# grab the original cmap
-orig_cmap = mpl.cm.get_cmap("Greens")
-
-orig_cmap = LinearSegmentedColormap.from_list(
-    "GreyGreen", 
-    ["white", "darkolivegreen", "darkgreen"],       # start at grey, end at full green
-    N=256                          # number of discrete steps
-)
-# subsection cmap to scale lower bound color and down upper bound color
-cust_cmap = LinearSegmentedColormap.from_list(
-    "Green_trunc",
-    orig_cmap(np.linspace(0.08, 0.75, 256))
-)
-
-disp.plot(ax=ax, cmap=cust_cmap, values_format="d",  colorbar=False)  # "d" ensures integer values are displayed
-cbar = fig.colorbar(disp.im_, ax=ax)
-cbar.ax.yaxis.set_major_locator(MaxNLocator(integer=True))
-# limit number ticks for cbar
-cbar.locator = MaxNLocator(nbins=8, integer=True)
-cbar.update_ticks()
-
-# axis labels
-ax.set_xlabel("Predicted Label")
-ax.set_ylabel("True Label")
-ax.set_title("Confusion Matrix")
-
-plt.show()
-# fig.savefig("confusion_matrix_4k.svg")
-fig.savefig("confusion_matrix_4k.pdf", dpi=600)
-...
+def run_pipeline(args) -> dict:
+    """dataset -> features -> train -> evaluate -> export, returns the results and the time spent in each stage"""
+    timings = {}
+    rng = np.random.default_rng(args.seed)
+    if args.seed is not None:
+        torch.manual_seed(args.seed)
+
+    start = time.perf_counter()
+    features, labels = load_dataset(args.train, cache_dir=args.cache_dir)
+    if args.test:
+        test_features, test_labels = load_dataset(args.test, cache_dir=args.cache_dir)
+    timings["dataset"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scaler = fit_scaler(features)
+    if args.test:
+        train_features, train_labels = scale(scaler, features), labels
+        # the test file is normalized on its own, `scaler` stays fit on the training data for export
+        test_features = scale(fit_scaler(test_features), test_features) if args.refit_test_scaler else scale(scaler, test_features)
+    else:
+        train_idx, test_idx = split_dataset(labels, train_fraction=args.train_fraction, rng=rng)
+        scaled = scale(scaler, features)
+        train_features, train_labels = scaled[train_idx], labels[train_idx]
+        test_features, test_labels = scaled[test_idx], labels[test_idx]
+    timings["features"] = time.perf_counter() - start
+
+    device = get_device()
+    print('Using CUDA' if device.type == "cuda" else "Using CPU")
+    if args.report_speedup:
+        speedup = compare_epoch_times(train_features, train_labels, hidden_size=args.hidden_size,
+                                      batch_size=8, fast_batch_size=args.batch_size)
+        print("Epoch times: " + ", ".join(f"{k} {v:.4f}" for k, v in speedup.items()))
+
+    model = NeuralNet(train_features.shape[1], args.hidden_size, len(label_mapping)).to(device)
+    start = time.perf_counter()
+    if args.fast:
+        learning_rate = scaled_learning_rate(args.lr, args.batch_size, base_batch_size=8, rule=args.lr_scaling)
+        val_features = val_labels = None
+        if args.patience is not None:
+            # early stopping watches a stratified slice of the training data
+            fit_idx, val_idx = split_dataset(train_labels, train_fraction=1 - args.val_fraction, rng=rng)
+            val_features, val_labels = train_features[val_idx], train_labels[val_idx]
+            fit_features, fit_labels = train_features[fit_idx], train_labels[fit_idx]
+        else:
+            fit_features, fit_labels = train_features, train_labels
+        history = train_fast(model, fit_features, fit_labels, num_epochs=args.epochs, batch_size=args.batch_size,
+                             learning_rate=learning_rate, val_features=val_features, val_labels=val_labels,
+                             patience=args.patience)
+        print(f"Trained {len(history['loss'])} epochs at lr {learning_rate:.2e}, final loss {history['loss'][-1]:.4f}"
+              + (f", stopped early, best epoch {history['best_epoch'] + 1}" if history["stopped_early"] else ""))
+    else:
+        history = train(model, train_features, train_labels, num_epochs=args.epochs,
+                        batch_size=args.batch_size, learning_rate=args.lr)
+    timings["train"] = time.perf_counter() - start
+    print(f"Mean epoch time {np.mean(history['epoch_times']):.4f}s")
+
+    start = time.perf_counter()
+    if args.fast:
+        results = evaluate_fast(model, test_features, test_labels)
+    else:
+        results = evaluate(model, test_features, test_labels, batch_size=args.batch_size)
+    timings["evaluate"] = time.perf_counter() - start
+    print(f"Overall Accuracy of the network on {len(test_labels)} test samples: {100*results['accuracy']:.2f} %")
+    print(f"\nTotal Misclassified Samples: {int((results['preds'] != results['labels']).sum())} / {len(results['labels'])}")
+
+    parity = None
+    if args.export:
+        start = time.perf_counter()
+        export_path = export_model(model, scaler, args.export, weight_dtype=args.weight_dtype)
+        # the exported file scales raw readings itself, check it matches torch on the training rows
+        parity = verify_export(model, export_path, scaler.inverse_transform(train_features))
+        timings["export"] = time.perf_counter() - start
+        print(f"Exported model to {export_path} ({parity['file_bytes']} bytes), "
+              f"max logit difference {parity['max_abs_diff']:.2e}, label agreement {100*parity['label_agreement']:.2f} %")
+        if not parity["ok"]:
+            print("WARNING: the exported model does not match the torch model")
+
+    if args.plot or args.show:
+        start = time.perf_counter()
+        plot_confusion_matrix(results["labels"], results["preds"], path=args.plot, show=args.show)
+        timings["plot"] = time.perf_counter() - start
+
+    print("Stage times: " + ", ".join(f"{stage} {t:.2f}s" for stage, t in timings.items()))
+    return {"model": model, "scaler": scaler, "history": history, "results": results,
+            "parity": parity, "timings": timings}
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Train, evaluate and export the roast classifier")
+    parser.add_argument("--train", default=os.path.join("data", "3-17_week_training.csv"), help="training CSV")
+    parser.add_argument("--test", default=os.path.join("data", "COMBINED_SET3-14.csv"),
+                        help="separate test CSV, pass an empty string to split the training CSV instead")
+    parser.add_argument("--train-fraction", type=float, default=0.6, help="share of rows trained on when splitting")
+    parser.add_argument("--refit-test-scaler", action=argparse.BooleanOptionalAction, default=True,
+                        help="normalize the test CSV with its own scaler instead of the training one")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--hidden-size", type=int, default=256)
+    parser.add_argument("--lr", type=float, default=0.001)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--fast", action="store_true",
+                        help="train on whole resident tensors with index-sliced batches instead of a DataLoader")
+    parser.add_argument("--lr-scaling", choices=["sqrt", "linear", "none"], default="sqrt",
+                        help="with --fast, scale --lr from batch size 8 to --batch-size")
+    parser.add_argument("--patience", type=int, default=None,
+                        help="with --fast, stop after this many epochs without validation loss improvement")
+    parser.add_argument("--val-fraction", type=float, default=0.1, help="share of training rows held out for --patience")
+    parser.add_argument("--report-speedup", action="store_true",
+                        help="time DataLoader epochs against whole-tensor epochs before training")
+    parser.add_argument("--cache-dir", default=None, help="cache parsed CSVs here")
+    parser.add_argument("--export", default=None,
+                        help="write the model for the Pi to this .npz, ex: models/roast_classifier.npz")
+    parser.add_argument("--weight-dtype", choices=WEIGHT_DTYPES, default="float32")
+    parser.add_argument("--plot", default=None, help="save the confusion matrix to this file, ex: confusion_matrix_4k.pdf")
+    parser.add_argument("--show", action="store_true", help="show the confusion matrix")
+    return parser
+
+def main() -> int:
+    run_pipeline(build_arg_parser().parse_args())
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,226 @@
+"""
+Hyperparameter sweep for `NeuralNet` with stratified k-fold cross-validation.
+
+Every (parameter set, fold) pair is trained with `train_fast` in a pool of
+worker processes. Each worker runs torch with a single thread so the pool
+scales across CPU cores instead of the workers fighting over them, which also
+keeps it usable on CPU-only machines.
+
+Results are written to `<out>/sweep_results.csv` (one row per parameter set,
+mean and std over folds) and `<out>/sweep_results.json` (every fold). The best
+parameter set is retrained on all the data and saved to `<out>/best_model.pt`
+and, for the Pi, `<out>/best_model.npz`.
+
+Usage:
+    python hyperparameter_sweep.py --train data/3-17_week_training.csv --folds 5 \\
+        --grid '{"hidden_size": [64, 128, 256], "lr": [0.001, 0.003], "batch_size": [8, 64]}'
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+
+import numpy as np
+
+DEFAULT_GRID = {
+    "hidden_size": [64, 128, 256],
+    "lr": [0.001, 0.003],
+    "batch_size": [8, 64, 256],
+    "epochs": [20],
+}
+# used for any parameter a grid leaves out, the defaults of Neural_Net.py's CLI
+DEFAULT_PARAMS = {"hidden_size": 256, "lr": 0.001, "batch_size": 8, "epochs": 20}
+
+
+def with_defaults(grid: dict[str, list]) -> dict[str, list]:
+    """The grid with a one-value list of `DEFAULT_PARAMS` for every parameter it leaves out"""
+    return {**{k: [v] for k, v in DEFAULT_PARAMS.items()}, **grid}
+
+
+def param_grid(grid: dict[str, list]) -> list[dict]:
+    """Every combination of the grid's values"""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def stratified_folds(labels: np.ndarray, k: int, seed: int | None = None) -> list[tuple[np.ndarray, np.ndarray]]:
+    """(train indices, validation indices) of each fold, every class split evenly across folds"""
+    from sklearn.model_selection import StratifiedKFold
+    skf = StratifiedKFold(n_splits=k, shuffle=True, random_state=seed)
+    return [(train_idx, val_idx) for train_idx, val_idx in skf.split(np.zeros(len(labels)), labels)]
+
+
+# dataset each worker process receives once through the pool initializer
+_features: np.ndarray | None = None
+_labels: np.ndarray | None = None
+
+def _init_worker(features: np.ndarray, labels: np.ndarray):
+    global _features, _labels
+    import torch
+    # one thread per worker, the pool provides the parallelism
+    torch.set_num_threads(1)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # already set in this process
+    _features, _labels = features, labels
+
+
+def run_fold(params: dict, fold: int, train_idx: np.ndarray, val_idx: np.ndarray,
+             seed: int | None = None, patience: int | None = None) -> dict:
+    """Trains on one fold's training rows and scores on its validation rows"""
+    import torch
+    from Neural_Net import (NeuralNet, evaluate_fast, fit_scaler, label_mapping, scale, split_dataset,
+                            train_fast)
+
+    if seed is not None:
+        torch.manual_seed(seed + fold)
+    start = time.perf_counter()
+    # scaler fit on the fold's training rows only, the validation rows stay unseen
+    scaler = fit_scaler(_features[train_idx])
+    train_x, train_y = scale(scaler, _features[train_idx]), _labels[train_idx]
+    val_x, val_y = scale(scaler, _features[val_idx]), _labels[val_idx]
+
+    stop_x = stop_y = None
+    if patience is not None:
+        # early stopping watches a slice of the training rows, not the scored fold
+        rng = np.random.default_rng(None if seed is None else seed + fold)
+        fit_idx, stop_idx = split_dataset(train_y, train_fraction=0.9, rng=rng)
+        stop_x, stop_y = train_x[stop_idx], train_y[stop_idx]
+        train_x, train_y = train_x[fit_idx], train_y[fit_idx]
+
+    hp = {**DEFAULT_PARAMS, **params}
+    model = NeuralNet(train_x.shape[1], hp["hidden_size"], len(label_mapping))
+    history = train_fast(model, train_x, train_y, num_epochs=hp["epochs"],
+                         batch_size=hp["batch_size"], learning_rate=hp["lr"],
+                         val_features=stop_x, val_labels=stop_y, patience=patience)
+    results = evaluate_fast(model, val_x, val_y)
+    return {
+        "params": params,
+        "fold": fold,
+        "accuracy": results["accuracy"],
+        "train_loss": history["loss"][-1],
+        "epochs_run": len(history["loss"]),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def summarize(fold_results: list[dict]) -> list[dict]:
+    """Mean and std of each parameter set over its folds, best mean accuracy first"""
+    by_params: dict[str, list[dict]] = {}
+    for result in fold_results:
+        by_params.setdefault(json.dumps(result["params"], sort_keys=True), []).append(result)
+    rows = []
+    for key, results in by_params.items():
+        accuracies = np.array([r["accuracy"] for r in results])
+        rows.append({
+            **json.loads(key),
+            "folds": len(results),
+            "mean_accuracy": float(accuracies.mean()),
+            "std_accuracy": float(accuracies.std()),
+            "mean_epochs_run": float(np.mean([r["epochs_run"] for r in results])),
+            "mean_seconds": float(np.mean([r["seconds"] for r in results])),
+        })
+    rows.sort(key=lambda row: (-row["mean_accuracy"], row["std_accuracy"]))
+    return rows
+
+
+def run_sweep(features: np.ndarray, labels: np.ndarray, grid: dict[str, list], folds: int = 5,
+              workers: int | None = None, seed: int | None = None, patience: int | None = None) -> tuple[list[dict], list[dict]]:
+    """
+    Cross-validates every parameter set of the grid in a process pool.
+
+    Returns:
+        `tuple[list[dict], list[dict]]`: the summary rows (best first) and every fold's result.
+    """
+    splits = stratified_folds(labels, folds, seed=seed)
+    tasks = [(params, fold, train_idx, val_idx) for params in param_grid(grid)
+             for fold, (train_idx, val_idx) in enumerate(splits)]
+    workers = workers or os.cpu_count() or 1
+    print(f"Running {len(tasks)} fits ({len(tasks) // folds} parameter sets x {folds} folds) on {workers} workers")
+
+    fold_results = []
+    # spawn so workers start clean instead of inheriting the parent's torch thread pools
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"),
+                             initializer=_init_worker, initargs=(features, labels)) as pool:
+        futures = [pool.submit(run_fold, params, fold, train_idx, val_idx, seed, patience)
+                   for params, fold, train_idx, val_idx in tasks]
+        for done, future in enumerate(as_completed(futures), start=1):
+            result = future.result()
+            fold_results.append(result)
+            print(f"[{done}/{len(tasks)}] {result['params']} fold {result['fold']}: "
+                  f"accuracy {100*result['accuracy']:.2f} % in {result['seconds']:.1f}s")
+    return summarize(fold_results), fold_results
+
+
+def save_results(out_dir: str, summary: list[dict], fold_results: list[dict], meta: dict):
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "sweep_results.csv"), "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(summary[0]))
+        writer.writeheader()
+        writer.writerows(summary)
+    with open(os.path.join(out_dir, "sweep_results.json"), "w") as f:
+        json.dump({**meta, "summary": summary, "folds": fold_results}, f, indent=2)
+
+
+def train_best(features: np.ndarray, labels: np.ndarray, params: dict, out_dir: str, seed: int | None = None):
+    """Retrains the best parameter set on all rows and saves it as torch weights and for the Pi"""
+    import torch
+    from Neural_Net import NeuralNet, fit_scaler, label_mapping, scale, train_fast
+    from model_export import export_model
+
+    if seed is not None:
+        torch.manual_seed(seed)
+    hp = {**DEFAULT_PARAMS, **params}
+    scaler = fit_scaler(features)
+    model = NeuralNet(features.shape[1], hp["hidden_size"], len(label_mapping))
+    train_fast(model, scale(scaler, features), labels, num_epochs=hp["epochs"],
+               batch_size=hp["batch_size"], learning_rate=hp["lr"])
+    torch.save({"params": params, "state_dict": model.state_dict(),
+                "scaler_mean": scaler.mean_, "scaler_scale": scaler.scale_},
+               os.path.join(out_dir, "best_model.pt"))
+    export_model(model, scaler, os.path.join(out_dir, "best_model.npz"))
+    return model, scaler
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter sweep for the roast classifier")
+    parser.add_argument("--train", default=os.path.join("data", "3-17_week_training.csv"), help="training CSV")
+    parser.add_argument("--grid", default=None, help="JSON object of parameter -> list of values, defaults to DEFAULT_GRID, "
+                        "parameters left out use DEFAULT_PARAMS")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, default one per CPU core")
+    parser.add_argument("--patience", type=int, default=None, help="early stopping patience within each fold")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache-dir", default=None, help="cache parsed CSVs here")
+    parser.add_argument("--out", default="sweep_results", help="directory for the results table and best model")
+    args = parser.parse_args()
+
+    from Neural_Net import load_dataset
+    grid = with_defaults(json.loads(args.grid) if args.grid else DEFAULT_GRID)
+    features, labels = load_dataset(args.train, cache_dir=args.cache_dir)
+
+    start = time.perf_counter()
+    summary, fold_results = run_sweep(features, labels, grid, folds=args.folds, workers=args.workers,
+                                      seed=args.seed, patience=args.patience)
+    elapsed = time.perf_counter() - start
+    save_results(args.out, summary, fold_results, {
+        "train": args.train, "grid": grid, "folds": args.folds, "seed": args.seed,
+        "patience": args.patience, "seconds": elapsed,
+    })
+
+    best = summary[0]
+    best_params = {k: best[k] for k in grid}
+    print(f"\nSweep took {elapsed:.1f}s, best {best_params}: "
+          f"{100*best['mean_accuracy']:.2f} % +/- {100*best['std_accuracy']:.2f} %")
+    train_best(features, labels, best_params, args.out, seed=args.seed)
+    print(f"Results and best model written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,145 @@
+"""
+Exports a trained `NeuralNet` and its fitted `StandardScaler` to one compact
+`.npz` file for the Pi, which runs it with the NumPy-only `ReadingClassifier`
+(raspberry_pi_src/src/pi_src/control_sys/ReadingClassifier.py) instead of torch.
+
+Weights can be stored as float32, float16 (half the size) or int8 with one
+float32 scale per output row (a quarter of the size). The Pi dequantizes them
+to float32 when loading, so quantization only trades file size for accuracy.
+
+`verify_export` checks that the exported file, run through the Pi's runtime,
+gives the same outputs as the torch model.
+"""
+import os
+import sys
+
+import numpy as np
+
+FORMAT_VERSION = 1
+LAYERS = ["l1", "l2", "l3"]
+# label_mapping in Neural_Net.py, in order of the network outputs
+CLASS_NAMES = ["AIR", "LIGHT", "MEDIUM", "DARK"]
+# Training CSV rows are <label>, <chamber>, <22 ##READING values>, the network is
+# trained on every second column from column 2 (df.iloc[:, 2::2]), these fields
+FEATURE_NAMES = [
+    "co2_ppm", "humidity",
+    "gas_res_1", "gas_res_3", "gas_res_5", "gas_res_7",
+    "light_0", "light_2", "light_4", "light_6", "light_8",
+]
+WEIGHT_DTYPES = ("float32", "float16", "int8")
+
+
+def quantize_int8(weight: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Symmetric per output row int8 quantization, returns (int8 weights, float32 scale per row)"""
+    scale = np.abs(weight).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    q = np.clip(np.round(weight / scale[:, None]), -127, 127).astype(np.int8)
+    return q, scale.astype(np.float32)
+
+
+def export_model(model, scaler, path: str, weight_dtype: str = "float32",
+                 feature_names: list[str] | None = None, class_names: list[str] | None = None) -> str:
+    """
+    Writes the model's linear layers and the scaler's mean and scale to `path`.
+
+    Parameters:
+        model (`NeuralNet`):
+            Trained model, only its `l1`, `l2`, `l3` layers are exported.
+        scaler (`StandardScaler`):
+            The scaler fit on the training features.
+        path (`str`):
+            File to write, `.npz` is added if missing.
+        weight_dtype (`str`):
+            "float32", "float16" or "int8".
+
+    Returns:
+        `str`: The path written.
+    """
+    if weight_dtype not in WEIGHT_DTYPES:
+        raise ValueError(f"weight_dtype must be one of {WEIGHT_DTYPES}, not {weight_dtype}")
+    feature_names = feature_names or FEATURE_NAMES
+    class_names = class_names or CLASS_NAMES
+    if len(feature_names) != len(scaler.mean_):
+        raise ValueError(f"Scaler was fit on {len(scaler.mean_)} features but {len(feature_names)} feature names were given")
+
+    arrays = {
+        "format_version": np.array(FORMAT_VERSION),
+        "weight_dtype": np.array(weight_dtype),
+        "scaler_mean": np.asarray(scaler.mean_, dtype=np.float32),
+        "scaler_scale": np.asarray(scaler.scale_, dtype=np.float32),
+        "feature_names": np.array(feature_names),
+        "class_names": np.array(class_names),
+    }
+    for name in LAYERS:
+        layer = getattr(model, name)
+        weight = layer.weight.detach().cpu().numpy().astype(np.float32)
+        arrays[f"{name}_bias"] = layer.bias.detach().cpu().numpy().astype(np.float32)
+        if weight_dtype == "int8":
+            arrays[f"{name}_weight"], arrays[f"{name}_weight_scale"] = quantize_int8(weight)
+        else:
+            arrays[f"{name}_weight"] = weight.astype(weight_dtype)
+
+    if not path.endswith(".npz"):
+        path += ".npz"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.savez_compressed(path, **arrays)
+    return path
+
+
+def load_runtime():
+    """The Pi's `ReadingClassifier`, from the installed pi_src package or this repo's copy"""
+    try:
+        from pi_src.control_sys.ReadingClassifier import ReadingClassifier
+    except ImportError:
+        sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "raspberry_pi_src", "src"))
+        from pi_src.control_sys.ReadingClassifier import ReadingClassifier
+    return ReadingClassifier
+
+
+# (atol, rtol) of the logits per weight dtype, rtol is relative to the largest torch logit
+PARITY_TOLERANCE = {"float32": (1e-4, 1e-5), "float16": (1e-2, 1e-2), "int8": (5e-2, 5e-2)}
+
+def verify_export(model, path: str, raw_features: np.ndarray, tolerance: tuple[float, float] | None = None) -> dict:
+    """
+    Runs unscaled feature rows through the torch model and through the exported
+    file with the Pi's NumPy runtime and compares the two.
+
+    Parameters:
+        model (`NeuralNet`):
+            The model that was exported.
+        path (`str`):
+            The exported file.
+        raw_features (`np.ndarray`):
+            (n, features) readings before scaling, ex: `scaler.inverse_transform(test_features)`.
+        tolerance (`tuple[float, float] | None`):
+            (atol, rtol) of the logits, `PARITY_TOLERANCE` of the file's weight dtype when None.
+
+    Returns:
+        `dict`: max_abs_diff of the logits, label_agreement (fraction of rows with the same
+        predicted class), and ok, True when the logits agree within the tolerance.
+    """
+    import torch
+
+    classifier = load_runtime().load(path)
+    with np.load(path, allow_pickle=False) as data:
+        weight_dtype = str(data["weight_dtype"])
+        mean, scale = data["scaler_mean"], data["scaler_scale"]
+    atol, rtol = tolerance if tolerance is not None else PARITY_TOLERANCE[weight_dtype]
+
+    raw_features = np.asarray(raw_features, dtype=np.float32)
+    device = next(model.parameters()).device
+    model.eval()
+    with torch.no_grad():
+        scaled = torch.tensor((raw_features - mean) / scale, dtype=torch.float32, device=device)
+        torch_logits = model(scaled).cpu().numpy()
+    numpy_logits = classifier.forward(raw_features)
+
+    max_abs_diff = float(np.abs(torch_logits - numpy_logits).max()) if len(raw_features) else 0.0
+    return {
+        "weight_dtype": weight_dtype,
+        "rows": len(raw_features),
+        "max_abs_diff": max_abs_diff,
+        "label_agreement": float((torch_logits.argmax(axis=1) == numpy_logits.argmax(axis=1)).mean()) if len(raw_features) else 1.0,
+        "ok": max_abs_diff <= atol + rtol * (float(np.abs(torch_logits).max()) if len(raw_features) else 0.0),
+        "file_bytes": os.path.getsize(path),
+    }
@@ -0,0 +1,42 @@
+"""
+Parity of an exported model run by the Pi's NumPy `ReadingClassifier` with the
+torch model it came from, for every weight dtype.
+
+    cd ML_model && python -m pytest -q test_model_export.py
+"""
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+
+from model_export import CLASS_NAMES, FEATURE_NAMES, PARITY_TOLERANCE, WEIGHT_DTYPES, export_model, load_runtime
+from Neural_Net import NeuralNet
+
+
+@pytest.mark.parametrize("weight_dtype", WEIGHT_DTYPES)
+def test_predict_proba_matches_torch(tmp_path, weight_dtype):
+    torch.manual_seed(0)
+    rng = np.random.default_rng(0)
+    model = NeuralNet(len(FEATURE_NAMES), 32, len(CLASS_NAMES)).eval()
+    # export_model only reads the fitted mean_ and scale_
+    scaler = SimpleNamespace(mean_=rng.uniform(0, 1000, len(FEATURE_NAMES)),
+                             scale_=rng.uniform(1, 100, len(FEATURE_NAMES)))
+    path = export_model(model, scaler, str(tmp_path / f"model_{weight_dtype}.npz"), weight_dtype=weight_dtype)
+
+    classifier = load_runtime().load(path)
+    from pi_src.control_sys.SerialMessages import READING_DTYPE
+    records = np.zeros(64, dtype=READING_DTYPE)
+    for i, name in enumerate(FEATURE_NAMES):
+        records[name] = scaler.mean_[i] + scaler.scale_[i] * rng.standard_normal(len(records))
+    numpy_probs = classifier.predict_proba(records)
+
+    raw = classifier.features(records)
+    with torch.no_grad():
+        scaled = torch.tensor((raw - scaler.mean_) / scaler.scale_, dtype=torch.float32)
+        torch_probs = torch.softmax(model(scaled), dim=1).numpy()
+
+    # the logit tolerance bounds the probabilities too, softmax never moves them further than the logits
+    atol, rtol = PARITY_TOLERANCE[weight_dtype]
+    np.testing.assert_allclose(numpy_probs, torch_probs, atol=atol, rtol=rtol)
@@ -0,0 +1,280 @@
+"""
+Benchmarks for the ingestion and purge hot paths. Runs entirely on the "sim"
+HAL backend, so it needs no Pi, boards, or serial ports.
+
+Measures:
+- parse: lines/sec through `SerialMonitor.parse_serial_msg` per reading storage backend
+- csv_writes: rows/sec through `CSVWriterPool.write_row`, including the final flush
+- pressure_latency: time from a crossing `##PRESSURE` line entering the serial
+  line queue to `ControlSystem.wait_for_pressure_lvl` returning
+- shift_register: `ShiftRegister` writes/sec per transport and chain length
+
+Results are written as JSON (default `benchmark_results/<UTC time>.json`) so runs
+from different versions can be compared with `--baseline`.
+
+Usage:
+    python -m pi_src.benchmark
+    python -m pi_src.benchmark --quick --baseline benchmark_results/<earlier run>.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from .config.config_manager import settings
+from .control_sys.HAL import SimulatedGPIO, SimulatedPigpio
+from .control_sys.CSVWriterPool import CSVWriterPool
+from .control_sys.SerialMessages import split_fields
+from .control_sys.ShiftRegister import ShiftRegister
+from .control_sys.ShiftRegisterTransport import FakeShiftTransport, GPIOShiftTransport
+from .simulator.VirtualChamber import VirtualChamber
+
+# settings every benchmark runs with, applied in memory only and never saved
+BENCH_SETTINGS = {
+    "DEBUG": 0,
+    "hal_backend": "sim",
+    "serial_backend": "threads",
+    "valve_shift_reg_transport": "gpio",
+    "valve_shift_reg_ser_pin": 17,
+    "valve_shift_reg_srclk_pin": 27,
+    "valve_shift_reg_rclk_pin": 4,
+    "valve_shift_reg_srclr_pin": 22,
+    "valve_shift_reg_oe_pin": None,
+    "valve_shift_reg_count": 2,
+    "vacuum_ctrl_pin": 5,
+    "ambient_valve_pin": -1,
+    "ring_buffer_dir": None,
+    "chamber_groups": {},
+    "disabled_chambers": [],
+}
+
+
+@contextlib.contextmanager
+def bench_settings(**overrides):
+    """Temporarily replaces settings values, restoring the originals on exit"""
+    missing = object()
+    saved = {key: settings.get(key, missing) for key in overrides}
+    settings.update(overrides)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is missing:
+                settings.pop(key, None)
+            else:
+                settings[key] = value
+
+
+@contextlib.contextmanager
+def quiet():
+    """Sends stdout to /dev/null, ex: debug prints of the code being measured"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def _sample_lines(num_chambers: int, count: int, kind: str) -> list[str]:
+    chambers = [VirtualChamber(f"bench{i}", i, seed=i) for i in range(1, num_chambers + 1)]
+    lines = []
+    for i in range(count):
+        chamber = chambers[i % num_chambers]
+        if kind == "reading" or (kind == "mixed" and i % 10 == 0):
+            lines.append(chamber.reading_line())
+        else:
+            lines.append(chamber.pressure_line())
+    return lines
+
+
+def bench_parse(num_lines: int, num_chambers: int, data_dir: str) -> dict:
+    from .control_sys.SerialMonitor import SerialMonitor
+    results = {}
+    for storage in (["csv"], ["binary"], ["csv", "binary"]):
+        for kind in ("reading", "pressure", "mixed"):
+            lines = _sample_lines(num_chambers, num_lines, kind)
+            run_dir = tempfile.mkdtemp(dir=data_dir)
+            with bench_settings(data_dir=run_dir, reading_storage=storage):
+                monitor = SerialMonitor(ports=[])
+            # registered like an open port so route updates are part of the timing
+            monitor._register_connection("bench", None)
+            for i in range(1, num_chambers + 1):
+                monitor.last_readings[f"bench{i}"] = {"pressure": None, "reading": None, "message": None, "alert": None}
+
+            with quiet():
+                start = time.perf_counter()
+                for line in lines:
+                    monitor.parse_serial_msg(line, port_name="bench")
+                parsed = time.perf_counter() - start
+                for store in monitor.reading_stores:
+                    store.close()
+                total = time.perf_counter() - start
+            results[f"{'+'.join(storage)}/{kind}"] = {
+                "lines": num_lines,
+                "lines_per_s": num_lines / parsed,
+                "lines_per_s_incl_close": num_lines / total,
+            }
+    return results
+
+
+def bench_csv_writes(num_rows: int, num_chambers: int, data_dir: str) -> dict:
+    row_values = split_fields(VirtualChamber("bench", 1, seed=1).reading_line())[2:]
+    results = {}
+    for flush_rows in (1, 32, 256):
+        pool = CSVWriterPool(data_dir=tempfile.mkdtemp(dir=data_dir), flush_rows=flush_rows, flush_interval=3600)
+        start = time.perf_counter()
+        for i in range(num_rows):
+            pool.write_row(f"bench{i % num_chambers}", [str(i), f"bench{i % num_chambers}", *row_values])
+        pool.close()
+        elapsed = time.perf_counter() - start
+        results[f"flush_rows={flush_rows}"] = {"rows": num_rows, "rows_per_s": num_rows / elapsed}
+    return results
+
+
+def bench_pressure_latency(iterations: int, data_dir: str) -> dict:
+    from .control_sys.ControlSystem import ControlSystem
+    with bench_settings(data_dir=data_dir, reading_storage=["csv"]), quiet():
+        control_system = ControlSystem(gpio=SimulatedGPIO(), pigpio=SimulatedPigpio())
+        control_system.add_chamber("bench1", "bench", 1)
+        monitor = control_system.serial_monitor
+        monitor.ports = []  # parse workers only, lines are fed straight into the queue
+        monitor.start_monitoring()
+        chamber = control_system.chambers["bench1"]
+        try:
+            latencies = []
+            for _ in range(iterations):
+                monitor.parse_serial_msg("##PRESSURE, bench1, 101325.00")
+                done = {}
+                waiter = threading.Thread(target=lambda: done.update(
+                    unmet=control_system.wait_for_pressure_lvl([chamber], pressure_lvl=4040, low_pressure=True, timeout=5),
+                    end=time.perf_counter()))
+                waiter.start()
+                while not monitor.pressure_watches.get("bench1"):
+                    time.sleep(0.0005)
+                start = time.perf_counter()
+                monitor._enqueue_line("bench", "##PRESSURE, bench1, 3000.00")
+                waiter.join()
+                if done["unmet"]:
+                    raise RuntimeError("wait_for_pressure_lvl timed out during the latency benchmark")
+                latencies.append(done["end"] - start)
+        finally:
+            monitor.stop_monitoring()
+            control_system.led_strip_controller.stop()
+            control_system.fan_controller.stop()
+
+    latencies_ms = sorted(l * 1000 for l in latencies)
+    return {
+        "iterations": iterations,
+        "mean_ms": statistics.fmean(latencies_ms),
+        "p50_ms": latencies_ms[len(latencies_ms) // 2],
+        "p95_ms": latencies_ms[int(len(latencies_ms) * 0.95) - 1],
+        "max_ms": latencies_ms[-1],
+    }
+
+
+def bench_shift_register(num_writes: int) -> dict:
+    results = {}
+    for num_registers in (2, 13):
+        for name in ("fake", "gpio"):
+            gpio = SimulatedGPIO()
+            if name == "fake":
+                transport = FakeShiftTransport()
+            else:
+                gpio.setmode(gpio.BCM)
+                transport = GPIOShiftTransport(SER=17, SRCLK=27, RCLK=4, SRCLR=22, gpio=gpio)
+            shift_reg = ShiftRegister(num_registers=num_registers, transport=transport)
+            gpio.reset_stats()
+            num_bits = shift_reg.num_bits
+            start = time.perf_counter()
+            for i in range(num_writes):
+                # alternate levels so no write is skipped as unchanged
+                shift_reg.write_bit(i % num_bits, (i // num_bits + 1) % 2)
+            elapsed = time.perf_counter() - start
+            result = {"writes": num_writes, "writes_per_s": num_writes / elapsed}
+            if name == "gpio":
+                result["gpio_calls_per_write"] = sum(gpio.calls.values()) / num_writes
+            results[f"{name}/{num_registers}x8"] = result
+    return results
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=os.path.dirname(__file__), stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(results: dict, baseline: dict) -> list[str]:
+    """Returns one line per metric that changed between a baseline run and this one"""
+    old, new = _flatten(baseline.get("results", {})), _flatten(results.get("results", {}))
+    lines = []
+    for name in sorted(old.keys() & new.keys()):
+        if old[name] and old[name] != new[name]:
+            change = (new[name] - old[name]) / old[name] * 100
+            lines.append(f"{name}: {old[name]:.4g} -> {new[name]:.4g} ({change:+.1f}%)")
+    return lines
+
+
+def run(quick: bool = False) -> dict:
+    scale = 10 if quick else 1
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir, bench_settings(**BENCH_SETTINGS):
+        results["parse"] = bench_parse(num_lines=20_000 // scale, num_chambers=16, data_dir=data_dir)
+        results["csv_writes"] = bench_csv_writes(num_rows=50_000 // scale, num_chambers=16, data_dir=data_dir)
+        results["pressure_latency"] = bench_pressure_latency(iterations=200 // scale, data_dir=data_dir)
+        results["shift_register"] = bench_shift_register(num_writes=20_000 // scale)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "quick": quick,
+        "results": results,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the ingestion and purge hot paths with simulated hardware")
+    parser.add_argument("-o", "--output", default=None,
+                        help="JSON file to write, default benchmark_results/<UTC time>.json")
+    parser.add_argument("--baseline", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--quick", action="store_true", help="run a tenth of the iterations")
+    args = parser.parse_args()
+
+    report = run(quick=args.quick)
+    output = args.output or os.path.join(
+        "benchmark_results", datetime.now(timezone.utc).strftime("%Y-%m-%dT%H-%M-%SZ") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(report["results"], indent=2))
+    print(f"Results written to {output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"Compared to {args.baseline} ({baseline.get('git_commit')}):")
+        for line in compare(report, baseline):
+            print(f"  {line}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -1,18 +1,265 @@
+import atexit
 import json
 import os
+import threading
+import time
+from typing import Any, Callable
 
 
 BASE = os.path.dirname(__file__)
-CONFIG_PATH = os.path.join(BASE, "config.json")
+# PI_SRC_CONFIG points the settings at another file, ex: a scratch copy in the tests
+CONFIG_PATH = os.environ.get("PI_SRC_CONFIG") or os.path.join(BASE, "config.json")
+
+class Settings(dict):
+    """
+    The config.json contents as a dict, plus:
+
+    - Typed attributes (`FIELDS`) for values read in hot loops, ex: `settings.debug`
+      instead of `settings.get("DEBUG", False)`. They are resolved once and refreshed
+      whenever their key changes.
+    - Write-behind persistence. `save()` returns immediately and a background thread
+      writes the file once no further save has been requested for `debounce_s`
+      seconds, to a temp file that is then renamed over config.json so the file is
+      never left half written.
+    - Reloading. `start_watching()` polls the file and, when it is edited by
+      something else, applies the new values and calls the subscribers registered
+      with `subscribe`. Keys changed in memory but not yet written keep their
+      in-memory values.
+
+    Parameters:
+        path (`str`):
+            The json file backing the settings.
+        debounce_s (`float`):
+            Quiet time after the last `save()` before the file is written.
+    """
+    # attribute -> (settings key, type, default)
+    FIELDS: dict[str, tuple[str, type, Any]] = {
+        "debug": ("DEBUG", bool, False),
+        "vac_pressure": ("vac_pressure", float, 101000/25),
+        "vac_timeout": ("vac_timeout", float, 5.0),
+        "gas_pressure": ("gas_pressure", float, 101000.0),
+        "gas_timeout": ("gas_timeout", float, 5.0),
+        "purge_pipelining": ("purge_pipelining", bool, True),
+    }
+    _KEY_TO_FIELD = {key: attr for attr, (key, _, _) in FIELDS.items()}
+
+    def __init__(self, path: str, debounce_s: float = 1.0):
+        super().__init__()
+        self.path = path
+        self.debounce_s = debounce_s
+        self._cond = threading.Condition()
+        # serializes file writes, held without self._cond while writing
+        self._io_lock = threading.Lock()
+        self._dirty_keys: set[str] = set()  # changed in memory since the last write
+        self._save_due: float | None = None  # when the pending write-behind is due
+        self._writer: threading.Thread | None = None
+        self._watcher: threading.Thread | None = None
+        self._watch_stop = threading.Event()
+        self._file_stat: tuple[int, int] | None = None  # (mtime_ns, size) of the version we last read or wrote
+        # (callback, keys or None for every key)
+        self._subscribers: list[tuple[Callable[[dict], None], frozenset | None]] = []
+        super().update(self._read_file())
+        self._file_stat = self._stat()
+        for attr in self.FIELDS:
+            self._resolve(attr)
+
+    # ---- dict interface, every mutation refreshes typed attributes and marks the key dirty ----
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._changed(key)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._changed(key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def pop(self, key, *default):
+        value = super().pop(key, *default)
+        self._changed(key)
+        return value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def _changed(self, key):
+        with self._cond:
+            self._dirty_keys.add(key)
+        if key in self._KEY_TO_FIELD:
+            self._resolve(self._KEY_TO_FIELD[key])
+
+    def _resolve(self, attr: str):
+        key, typ, default = self.FIELDS[attr]
+        value = self.get(key, default)
+        setattr(self, attr, default if value is None else typ(value))
+
+    # ---- write-behind persistence ----
+    def save(self):
+        """Schedules a write of the settings to disk, returns without waiting for it"""
+        with self._cond:
+            self._save_due = time.monotonic() + self.debounce_s
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="settings-writer", daemon=True)
+                self._writer.start()
+            self._cond.notify_all()
+
+    def flush(self):
+        """Writes any pending save right away, ex: before shutting down"""
+        with self._io_lock:  # waits out a write already in progress
+            with self._cond:
+                if self._save_due is None:
+                    return
+                self._save_due = None
+            self._write()
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                if self._save_due is None:
+                    if not self._cond.wait(timeout=60) and self._save_due is None:
+                        self._writer = None  # idle, the next save() starts a new writer
+                        return
+                    continue
+                remaining = self._save_due - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(timeout=remaining)
+                    continue
+            with self._io_lock:
+                with self._cond:
+                    # flush() may have written it, or a new save() pushed it back, meanwhile
+                    if self._save_due is None or self._save_due > time.monotonic():
+                        continue
+                    self._save_due = None
+                try:
+                    self._write()
+                except OSError as e:
+                    print(f"Failed to save settings to {self.path}: {e}")
+
+    def _write(self):
+        # caller must hold self._io_lock, only the snapshot is taken under self._cond
+        # so __setitem__, save() and reload() never wait on the disk
+        with self._cond:
+            snapshot = dict(self)
+            self._dirty_keys.clear()
+        while True:
+            try:
+                data = json.dumps(snapshot, indent=2)
+                break
+            except RuntimeError:
+                continue  # a nested value changed size mid copy, try again
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        stat = self._stat()
+        with self._cond:
+            self._file_stat = stat
+
+    # ---- reloading ----
+    def subscribe(self, callback: Callable[[dict], None], keys: list[str] | None = None) -> Callable[[], None]:
+        """
+        Calls `callback({key: new value})` from the watcher thread when keys change on disk,
+        only for `keys` when given. Returns a function that unsubscribes.
+        """
+        entry = (callback, frozenset(keys) if keys is not None else None)
+        with self._cond:
+            self._subscribers = [*self._subscribers, entry]
+
+        def unsubscribe():
+            with self._cond:
+                self._subscribers = [s for s in self._subscribers if s is not entry]
+        return unsubscribe
+
+    def start_watching(self, interval: float | None = None):
+        """Starts polling the file for edits every `interval` seconds (settings_watch_interval_s)"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        interval = interval if interval is not None else self.get("settings_watch_interval_s", 2.0)
+        self._watch_stop.clear()
+        self._watcher = threading.Thread(target=self._watch_loop, args=(interval,),
+                                         name="settings-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._watch_stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def reload(self) -> dict:
+        """Applies edits made to the file since it was last read or written, returns the changed keys"""
+        try:
+            new = self._read_file()
+        except (OSError, ValueError):
+            return {}  # missing or mid edit, picked up on the next poll
+        missing = object()
+        with self._cond:
+            self._file_stat = self._stat()
+            dirty = set(self._dirty_keys)
+            changed = {key: value for key, value in new.items()
+                       if key not in dirty and (key not in self or self[key] != value)}
+            previous = {key: self.get(key, missing) for key in changed}
+            for key, value in changed.items():
+                super().__setitem__(key, value)
+            subscribers = self._subscribers
+        for key in list(changed):
+            if key not in self._KEY_TO_FIELD:
+                continue
+            try:
+                self._resolve(self._KEY_TO_FIELD[key])
+            except (TypeError, ValueError) as e:
+                # keep the last good value rather than stopping the watcher
+                print(f"Ignoring invalid {key} {changed.pop(key)!r} in {self.path}: {e}")
+                with self._cond:
+                    if previous[key] is missing:
+                        super().pop(key, None)
+                    else:
+                        super().__setitem__(key, previous[key])
+        if changed:
+            for callback, keys in subscribers:
+                wanted = changed if keys is None else {k: v for k, v in changed.items() if k in keys}
+                if wanted:
+                    try:
+                        callback(wanted)
+                    except Exception as e:
+                        print(f"Settings subscriber failed: {e}")
+        return changed
+
+    def _watch_loop(self, interval: float):
+        while not self._watch_stop.wait(interval):
+            stat = self._stat()
+            if stat is not None and stat != self._file_stat:
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"Failed to reload settings from {self.path}: {e}")
+
+    def _read_file(self) -> dict:
+        with open(self.path, "r") as f:
+            return json.load(f)
+
+    def _stat(self) -> tuple[int, int] | None:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
 
-def _load() -> dict:
-    with open(CONFIG_PATH, "r") as f:
-        return json.load(f)
 
 def  save_settings():
-    """Write the current settings dict back to the json file"""
-    with open(CONFIG_PATH, "w") as f:
-        json.dump(settings, f, indent=2)
+    """Schedules a write-behind of the current settings to the json file, never blocks on disk I/O"""
+    settings.save()
+
+def flush_settings():
+    """Writes pending settings changes to the json file now"""
+    settings.flush()
 
-# module‐level "singleton" config dict (one instance of settings shared between models)
-settings: dict = _load()
+# module‐level "singleton" config (one instance of settings shared between models)
+settings: Settings = Settings(CONFIG_PATH)
+atexit.register(settings.flush)
@@ -0,0 +1,167 @@
+"""
+AsyncSerialMonitor.py
+
+asyncio backend for SerialMonitor. Instead of one reader thread per serial
+port, every port is opened non-blocking and registered with a single event
+loop running on one thread. Complete lines are handed to the same bounded
+parse queue as the threaded backend, so `last_readings`, `ignore_next_reading`,
+and the `start_monitoring` / `stop_monitoring` API behave the same way.
+
+Only works on POSIX systems since it relies on `Serial.fileno()`.
+"""
+import asyncio
+import threading
+import time
+import serial
+
+from ..config.config_manager import settings
+from .SerialMonitor import SerialMonitor
+
+
+class AsyncSerialMonitor(SerialMonitor):
+    """
+    Monitors all serial ports from a single asyncio event loop and stores sensor
+    data messages in their designated csv files
+    """
+    # bytes kept for a partial line before it is thrown away
+    MAX_LINE_LEN = 4096
+
+    def __init__(self,
+                 baud_rate=None,
+                 print_msgs=False,
+                 save_data=True,
+                 ports: list[str] | None = None):
+        super().__init__(baud_rate=baud_rate, print_msgs=print_msgs, save_data=save_data, ports=ports)
+        # port_name -> serial.Serial, all owned by the event loop thread
+        self.active_ports = {}
+        # port_name -> bytes received after the last newline
+        self._line_buffers: dict[str, bytearray] = {}
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._stop_event: asyncio.Event | None = None
+
+    def _start_readers(self, monitor_interval):
+        self.loop = asyncio.new_event_loop()
+        self._stop_event = asyncio.Event()
+        self.monitor_thread = threading.Thread(
+            target=self._run_loop,
+            args=(monitor_interval,),
+            daemon=False,  # non-daemon so we can join it cleanly
+        )
+        self.monitor_thread.start()
+
+    def _stop_readers(self, join_timeout):
+        loop = self.loop
+        if loop is not None and self._stop_event is not None:
+            try:
+                loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                pass  # loop already closed
+        t = self.monitor_thread
+        if t is not None:
+            t.join(timeout=join_timeout)
+
+    def _run_loop(self, monitor_interval):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._monitor_ports_async(monitor_interval))
+        except Exception as e:
+            print(f"Serial event loop error: {e}")
+        finally:
+            for port in list(self.active_ports):
+                self._close_port(port)
+            self.loop.close()
+            self.loop = None
+
+    async def _monitor_ports_async(self, monitor_interval):
+        # Scan for ports only while monitoring is active
+        while self.running and not self._stop_event.is_set():
+            for port in self._list_ports():
+                if port not in self.active_ports:
+                    self._open_port(port)
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=monitor_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _open_port(self, port_name: str):
+        try:
+            # timeout=0 makes reads non-blocking, the event loop tells us when data is ready
+            ser = serial.Serial(port_name, self.baud_rate, timeout=0)
+        except serial.SerialException as e:
+            print(f"Could not open {port_name}: {e}")
+            return
+        try:
+            ser.reset_input_buffer()
+        except Exception:
+            pass
+
+        with self.lock:
+            self.active_ports[port_name] = ser
+        self._register_connection(port_name, ser)
+        self._line_buffers[port_name] = bytearray()
+        self.loop.add_reader(ser.fileno(), self._on_readable, port_name)
+        print(f"Started listening on {port_name}")
+
+    def _close_port(self, port_name: str):
+        self._unregister_connection(port_name)
+        with self.lock:
+            ser = self.active_ports.pop(port_name, None)
+        self._line_buffers.pop(port_name, None)
+        if ser is None:
+            return
+        try:
+            self.loop.remove_reader(ser.fileno())
+        except Exception:
+            pass
+        try:
+            if ser.is_open:
+                ser.close()
+        except Exception:
+            pass
+        print(f"Stopped listening on {port_name}")
+
+    def _on_readable(self, port_name: str):
+        ser = self.active_ports.get(port_name)
+        if ser is None:
+            return
+        try:
+            data = ser.read(ser.in_waiting or 1)
+        except (serial.SerialException, OSError) as e:
+            # device unplugged, the next scan will pick it back up if it returns
+            print(f"Error on {port_name}: {e}")
+            self._close_port(port_name)
+            return
+        if not data:
+            return
+
+        buf = self._line_buffers[port_name]
+        buf.extend(data)
+        while (end := buf.find(b"\n")) != -1:
+            raw = bytes(buf[:end])
+            del buf[:end + 1]
+            line = raw.decode('utf-8', errors='ignore').strip()
+            if line:
+                self._enqueue_line(port_name, line)
+        if len(buf) > self.MAX_LINE_LEN:
+            if settings.debug:
+                print(f"Discarding {len(buf)} bytes without a newline from {port_name}")
+            buf.clear()
+
+
+def main() -> int:
+    monitor = AsyncSerialMonitor()
+    try:
+        print("Starting Serial Monitor (asyncio). Press Ctrl+C to stop.")
+        monitor.start_monitoring()
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print("Stopping...")
+        monitor.stop_monitoring()
+        print("Exited.")
+        return 0
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,143 @@
+"""
+BatchedWriter.py
+
+Per-chamber write batching shared by the on-disk stores (`CSVWriterPool`,
+`BinaryReadingStore`). Rows are held in memory and written out once a chamber
+has buffered `flush_rows` rows or `flush_interval` seconds have passed,
+whichever comes first. All disk writes happen on a background flusher thread, a
+full batch is handed to it and the caller returns without waiting for the disk.
+`close()` flushes and fsyncs every file so nothing is lost on shutdown.
+"""
+import os
+import threading
+import time
+
+
+class BatchedWriter:
+    """
+    Base class for the batched, per-chamber file writers. Subclasses write a
+    batch with `_write_rows` and list their open files with `_open_files`.
+
+    Parameters:
+        data_dir (`str`):
+            Directory the chamber files are written to.
+        flush_rows (`int`):
+            Number of buffered rows for a chamber that triggers a write to disk.
+        flush_interval (`float`):
+            Maximum number of seconds a row may sit in the buffer before it is written.
+    """
+    # used in error messages
+    DATA_NAME = "chamber data"
+
+    def __init__(self, data_dir: str, flush_rows: int, flush_interval: float):
+        self.data_dir = data_dir
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+
+        # chamber name -> rows waiting to be written
+        self._pending: dict[str, list] = {}
+        # (chamber, rows) of full batches waiting for the flusher, oldest first
+        self._ready: list[tuple[str, list]] = []
+        # guards _pending and _ready, never held while writing
+        self.lock = threading.Lock()
+        # serializes writes so a chamber's batches reach the file in order
+        self._io_lock = threading.Lock()
+
+        self._stop_event = threading.Event()
+        self._wake = threading.Event()
+        self._flush_thread = None
+
+    def _append(self, chamber: str, row):
+        """
+        Queues a row for the chamber. Never touches the disk, once the chamber's
+        buffer reaches `flush_rows` it is handed to the flusher thread.
+        """
+        with self.lock:
+            rows = self._pending.setdefault(chamber, [])
+            rows.append(row)
+            full = len(rows) >= self.flush_rows
+            if full:
+                self._ready.append((chamber, self._pending.pop(chamber)))
+            self._start_flush_thread()
+        if full:
+            self._wake.set()
+
+    def flush(self, fsync: bool = False):
+        """Writes every buffered row to disk, optionally forcing it to physical storage"""
+        with self._io_lock:
+            self._write_batches(everything=True)
+            for _, f in self._open_files():
+                f.flush()
+                if fsync:
+                    os.fsync(f.fileno())
+
+    def close(self, join_timeout: float = 3.0):
+        """Stops the background flusher, writes out all buffered rows, fsyncs, and closes every file"""
+        self._stop_event.set()
+        self._wake.set()
+        t = self._flush_thread
+        if t is not None:
+            t.join(timeout=join_timeout)
+        self._flush_thread = None
+
+        self.flush(fsync=True)
+        with self._io_lock:
+            for chamber, f in self._open_files():
+                try:
+                    f.close()
+                except OSError as e:
+                    print(f"Error closing {self.DATA_NAME} file for chamber \"{chamber}\": {e}")
+            self._forget_files()
+        self._stop_event.clear()
+
+    def _write_rows(self, chamber: str, rows: list):
+        # caller must hold self._io_lock
+        raise NotImplementedError
+
+    def _open_files(self) -> list:
+        """(chamber, file) of every open file"""
+        raise NotImplementedError
+
+    def _forget_files(self):
+        # caller must hold self._io_lock, the files are already closed
+        raise NotImplementedError
+
+    def _write_batches(self, everything: bool):
+        # caller must hold self._io_lock, batches are taken under it so they are written in order
+        with self.lock:
+            batches, self._ready = self._ready, []
+            if everything:
+                batches.extend(self._pending.items())
+                self._pending = {}
+        for chamber, rows in batches:
+            self._write_rows(chamber, rows)
+
+    def _start_flush_thread(self):
+        # caller must hold self.lock
+        if self._flush_thread is not None and self._flush_thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._wake.clear()
+        self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flush_thread.start()
+
+    def _flush_loop(self):
+        # Writes full batches as they are handed over, and periodically pushes out
+        # rows from chambers that report too slowly to hit flush_rows
+        next_flush = time.monotonic() + self.flush_interval
+        while True:
+            self._wake.wait(timeout=max(next_flush - time.monotonic(), 0))
+            self._wake.clear()
+            if self._stop_event.is_set():
+                return
+            everything = time.monotonic() >= next_flush
+            try:
+                if everything:
+                    self.flush()
+                else:
+                    with self._io_lock:
+                        self._write_batches(everything=False)
+            except OSError as e:
+                print(f"Error flushing {self.DATA_NAME}: {e}")
+            if everything:
+                next_flush = time.monotonic() + self.flush_interval
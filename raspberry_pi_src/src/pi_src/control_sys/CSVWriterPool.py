@@ -0,0 +1,64 @@
+"""
+CSVWriterPool.py
+
+Keeps one open, buffered file handle per chamber CSV so sensor readings can be
+appended without reopening the file for every row. Batching and the background
+flusher are shared with the binary store, see `BatchedWriter`.
+"""
+import csv
+import os
+
+from ..config.config_manager import settings
+from .BatchedWriter import BatchedWriter
+
+
+class CSVWriterPool(BatchedWriter):
+    """
+    Pool of long lived, per-chamber CSV writers.
+
+    Parameters:
+        data_dir (`str`):
+            Directory the chamber CSV files are written to.
+        flush_rows (`int`):
+            Number of buffered rows for a chamber that triggers a write to disk.
+        flush_interval (`float`):
+            Maximum number of seconds a row may sit in the buffer before it is written.
+    """
+    def __init__(self,
+                 data_dir=None,
+                 flush_rows=None,
+                 flush_interval=None):
+        super().__init__(data_dir if data_dir is not None else settings.get("data_dir", "data"),
+                         flush_rows if flush_rows is not None else settings.get("csv_flush_rows", 32),
+                         flush_interval if flush_interval is not None else settings.get("csv_flush_interval_s", 5.0))
+        # chamber name -> open file handle
+        self._files = {}
+
+    def file_path(self, chamber: str) -> str:
+        """Returns the CSV path readings for `chamber` are appended to"""
+        return os.path.join(self.data_dir, f"chamber_{chamber}_readings.csv")
+
+    def write_row(self, chamber: str, row: list):
+        """
+        Queues a row to be appended to the chamber's CSV file. Never touches the
+        disk, once the chamber's buffer reaches `flush_rows` it is handed to the
+        flusher thread.
+        """
+        self._append(chamber, row)
+
+    def _write_rows(self, chamber: str, rows: list[list]):
+        # caller must hold self._io_lock
+        f = self._files.get(chamber)
+        if f is None:
+            os.makedirs(self.data_dir, exist_ok=True)
+            f = open(self.file_path(chamber), mode='a', newline='', encoding='utf-8')
+            self._files[chamber] = f
+        csv.writer(f).writerows(rows)
+        f.flush()
+        if (settings.debug): print(f"{len(rows)} row(s) appended to {self.file_path(chamber)}")
+
+    def _open_files(self) -> list:
+        return list(self._files.items())
+
+    def _forget_files(self):
+        self._files.clear()
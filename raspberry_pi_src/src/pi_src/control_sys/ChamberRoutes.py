@@ -0,0 +1,93 @@
+"""
+ChamberRoutes.py
+
+Routing table mapping chamber names to the serial port they were last heard on.
+SerialMonitor updates it from incoming `##READING` / `##PRESSURE` / `##ALERT`
+traffic so commands can be sent to a single board instead of broadcast to all
+of them, and so chambers that have gone quiet can be spotted without scanning.
+"""
+import threading
+import time
+
+
+class ChamberRoutes:
+    """
+    Thread safe chamber name -> (port, last seen time) index, with a reverse
+    port -> chamber names index so a disconnected port can be dropped in one step.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # chamber name -> port_name
+        self._ports: dict[str, str] = {}
+        # chamber name -> unix time of the last message from the chamber
+        self._last_seen: dict[str, float] = {}
+        # port_name -> chamber names heard on that port
+        self._chambers: dict[str, set[str]] = {}
+
+    def update(self, chamber: str, port_name: str, timestamp: float | None = None):
+        """Records that `chamber` sent a message on `port_name` at `timestamp`"""
+        timestamp = timestamp if timestamp is not None else time.time()
+        with self.lock:
+            old_port = self._ports.get(chamber)
+            if old_port != port_name:
+                if old_port is not None:
+                    self._discard(old_port, chamber)
+                self._ports[chamber] = port_name
+                self._chambers.setdefault(port_name, set()).add(chamber)
+            self._last_seen[chamber] = timestamp
+
+    def port_for(self, chamber: str) -> str | None:
+        """Returns the port the chamber was last heard on, or None if it is unknown"""
+        return self._ports.get(chamber)
+
+    def last_seen(self, chamber: str) -> float | None:
+        """Returns the unix time of the chamber's last message, or None if it has never been heard"""
+        return self._last_seen.get(chamber)
+
+    def chambers_on(self, port_name: str) -> list[str]:
+        """Returns the chambers that have been heard on `port_name`"""
+        with self.lock:
+            return sorted(self._chambers.get(port_name, ()))
+
+    def is_connected(self, chamber: str, max_age: float | None = None) -> bool:
+        """
+        Returns True if the chamber has a known port and, when `max_age` is given,
+        has sent a message within the last `max_age` seconds.
+        """
+        with self.lock:
+            if chamber not in self._ports:
+                return False
+            if max_age is None:
+                return True
+            return time.time() - self._last_seen[chamber] <= max_age
+
+    def stale_chambers(self, max_age: float) -> list[str]:
+        """Returns chambers that have not sent a message in the last `max_age` seconds"""
+        cutoff = time.time() - max_age
+        with self.lock:
+            return [c for c, seen in self._last_seen.items() if seen < cutoff]
+
+    def drop_port(self, port_name: str) -> list[str]:
+        """Forgets every chamber routed through a port that has closed and returns their names"""
+        with self.lock:
+            chambers = self._chambers.pop(port_name, set())
+            for chamber in chambers:
+                self._ports.pop(chamber, None)
+            return sorted(chambers)
+
+    def snapshot(self) -> dict[str, dict]:
+        """Returns a copy of the table as {chamber: {"port": ..., "last_seen": ...}}"""
+        with self.lock:
+            return {
+                chamber: {"port": self._ports.get(chamber), "last_seen": seen}
+                for chamber, seen in self._last_seen.items()
+            }
+
+    def _discard(self, port_name: str, chamber: str):
+        # caller must hold self.lock
+        chambers = self._chambers.get(port_name)
+        if chambers is None:
+            return
+        chambers.discard(chamber)
+        if not chambers:
+            del self._chambers[port_name]
@@ -1,22 +1,49 @@
-from queue import Queue
+import threading
 import time
-import RPi.GPIO as GPIO
+from typing import Any
 from .SerialMonitor import SerialMonitor
+from .AsyncSerialMonitor import AsyncSerialMonitor
 from .LEDBreather import LEDBreather
 from .FanController import FanController
-from ..config.config_manager import settings, save_settings
-from .DiscordAlerts import send_discord_alert_webhook
+from ..config.config_manager import settings, save_settings, flush_settings
+from .DiscordAlerts import send_discord_alert_webhook, flush_alerts
 from .ShiftRegister import ShiftRegister
 from .EnvironmentalChamber import EnvironmentalChamber
+from .PurgeScheduler import PurgeScheduler
+from .PurgeEngine import PurgeEngine
+from .StateStore import StateStore
+from .HAL import get_gpio, get_pigpio
 
 class ControlSystem:
-    def __init__(self):
-        GPIO.setmode(GPIO.BCM)
+    def __init__(self, gpio: Any = None, pigpio: Any = None):
+        # RPi.GPIO and pigpio style backends shared with the hardware classes, chosen by
+        # the hal_backend setting when not given
+        self.GPIO = gpio if gpio is not None else get_gpio()
+        self.pigpio = pigpio if pigpio is not None else get_pigpio()
+        self.GPIO.setmode(self.GPIO.BCM)
         self.chambers: dict[str, EnvironmentalChamber] = {}
-        # The queue for chamber groups that need to be purged (vacuum and flushed with gas)
-        self.purge_queue = Queue()
 
         self.groups = settings.get("chamber_groups", {})
+        # purge history and chamber status, kept out of config.json so recording them never rewrites it
+        self.state = StateStore()
+        self.state.import_settings(settings)
+        if self.state.interrupted:
+            print(f"Purges of groups {sorted({group for group, _ in self.state.interrupted})} were interrupted, they are purged again")
+        self._purge_ids: dict[str, int] = {} # group -> id of its running purge in the state store
+        # group name -> chambers in that group, kept up to date by add_chamber
+        self.group_chambers: dict[str, list[EnvironmentalChamber]] = {}
+        # Heap of groups that have chambers, keyed on when they need to be purged (vacuum and flushed with gas).
+        # Groups due within the coalesce window of each other share one purge cycle, off (0 s) unless configured.
+        self.purge_scheduler = PurgeScheduler(coalesce_window=settings.get("purge_coalesce_window_s", 0))
+        # Purges of different batches run concurrently, one batch can pump down while another fills with gas
+        self.purge_engine = PurgeEngine(self, cycles=settings.get("purge_cycles", 2))
+        self.vacuum_lock = threading.Lock() # the vacuum pump and vacuum manifold, held for a whole vacuum phase
+        self.gas_lock = threading.Lock() # the gas supply manifold, held for a whole gas fill phase
+        self.settings_lock = threading.Lock() # guards chamber_groups edits made while the system runs
+        # pressure waits in progress, disable_chamber wakes them so a disabled chamber stops being waited on
+        self._pressure_watches: set = set()
+        self._watches_lock = threading.Lock()
+        self._unsubscribe_settings = None
         
         # The pin that controls power to the vacuum pump
         self.vacuum_ctrl_pin = settings.get("vacuum_ctrl_pin", -1)
@@ -25,64 +52,119 @@ class ControlSystem:
         if self.ambient_valve_pin == -1: self.ambient_valve_pin = None
         
 
-        self.valve_shift_reg = ShiftRegister(num_bits=16)
+        # two valves (gas, vacuum) per chamber, 4 chambers per chained 8-bit register
+        self.valve_shift_reg = ShiftRegister(num_registers=settings.get("valve_shift_reg_count", 2), gpio=self.GPIO)
 
-        GPIO.setup(self.vacuum_ctrl_pin, GPIO.OUT, initial=GPIO.LOW)
+        self.GPIO.setup(self.vacuum_ctrl_pin, self.GPIO.OUT, initial=self.GPIO.LOW)
         if self.ambient_valve_pin != None:
-            GPIO.setup(self.ambient_valve_pin, GPIO.OUT, initial=GPIO.LOW)
+            self.GPIO.setup(self.ambient_valve_pin, self.GPIO.OUT, initial=self.GPIO.LOW)
 
-        if (settings.get("DEBUG", False)): 
+        if (settings.debug): 
             print("Turning serial monitor on")
-        self.serial_monitor = SerialMonitor()
-        if (settings.get("DEBUG", False)): 
+        if settings.get("serial_backend", "threads") == "asyncio":
+            self.serial_monitor = AsyncSerialMonitor()
+        else:
+            self.serial_monitor = SerialMonitor()
+        if (settings.debug): 
             print("Turning on LED Breather")
-        self.led_strip_controller = LEDBreather()
-        if (settings.get("DEBUG", False)): 
+        self.led_strip_controller = LEDBreather(pigpio=self.pigpio)
+        if (settings.debug): 
             print("Turning on Fan Controller")
-        self.fan_controller = FanController()
+        self.fan_controller = FanController(gpio=self.GPIO)
 
     def run_sys(self):
         try:
             self.serial_monitor.start_monitoring()
             self.led_strip_controller.start()
             self.fan_controller.run()
+            # pick up edits to config.json while running
+            self._unsubscribe_settings = settings.subscribe(self._on_settings_changed,
+                                                            keys=["chamber_groups", "purge_coalesce_window_s"])
+            settings.start_watching()
             
             while(True):
-                next_purge_time = 0
-                next_purge_group = None
-                chambers = []
-                for group in self.groups:
-                    chambers = [c for c in self.chambers.values() if c.group == group]
-                    if not chambers:
-                        continue
-                    if next_purge_time == 0 or (self.groups[group]["last_purge"] + self.groups[group]["purge_interval_s"]) < next_purge_time:
-                        next_purge_time = self.groups[group]["last_purge"] + self.groups[group]["purge_interval_s"]
-                        next_purge_group = group
-                if time.time() > next_purge_time and next_purge_group != None:
-                    self.groups[next_purge_group]["last_purge"] = time.time() if len(chambers) != 0 else 0
-                    # purge twice
-                    self.purge_chambers(chambers=chambers)
-                    self.purge_chambers(chambers=chambers)
-                    settings["chamber_groups"] = self.groups
-                    save_settings()
-                else:
-                    # sleep until next purge time
-                    sleep_time = next_purge_time - time.time()
-                    time.sleep(sleep_time)
+                # sleeps until the next group is due, or wakes early when groups or intervals change
+                due_groups = self.purge_scheduler.wait_for_due()
+                if (settings.debug): print(f"Purging groups {due_groups}")
+                now = time.time()
+                for group in due_groups:
+                    self._purge_ids[group] = self.state.start_purge(group, started=now)
+                # purges in the background, the groups are rescheduled once their purge finishes
+                self.purge_engine.submit(due_groups, on_done=self._finish_purge)
+                if not settings.purge_pipelining:
+                    self.purge_engine.wait_idle()
         except KeyboardInterrupt:
             print("\nKeyboard interrupt received. Stopping control system")
         finally:
             self.shut_sys_down()
 
+    def set_purge_interval(self, group: str, purge_interval_s: float):
+        """Changes how often a group is purged, taking effect immediately in a running system"""
+        if group not in self.groups:
+            self.groups[group] = {}
+        self.groups[group]["purge_interval_s"] = purge_interval_s
+        with self.settings_lock:
+            settings["chamber_groups"] = self.groups
+            save_settings()
+        # a group being purged is left alone, _finish_purge reschedules it with the new interval
+        self._schedule_group(group)
+
+    def _finish_purge(self, groups: list[str], ok: bool = True):
+        """
+        Records the purge of the groups as finished and reschedules them, a failed
+        purge is retried after `purge_retry_delay_s` instead of a whole interval
+        """
+        finished = time.time()
+        for group in groups:
+            purge_id = self._purge_ids.pop(group, None)
+            if purge_id is not None:
+                self.state.finish_purge(purge_id, finished=finished, ok=ok)
+            self.purge_scheduler.finish(group)
+            self._schedule_group(group, not_before=0 if ok else finished + settings.get("purge_retry_delay_s", 300))
+
+    def _on_settings_changed(self, changed: dict):
+        """Applies purge settings edited in config.json while the system is running"""
+        if "purge_coalesce_window_s" in changed:
+            self.purge_scheduler.coalesce_window = changed["purge_coalesce_window_s"]
+            self.purge_scheduler.notify()
+        if "chamber_groups" in changed:
+            old_groups, self.groups = self.groups, changed["chamber_groups"]
+            new_groups = self.groups
+            for group in set(old_groups) | set(new_groups):
+                # popped or purging groups, including ones not yet handed to the purge engine,
+                # are rescheduled from the new settings by _finish_purge
+                if self.purge_scheduler.in_flight(group):
+                    continue
+                self._schedule_group(group)
+        if (settings.debug): print(f"Applied settings changes to {list(changed)}")
+
+    def _schedule_group(self, group: str, not_before: float = 0):
+        """(Re)schedules the group's next purge from its last purge time and interval, no earlier than `not_before`"""
+        if group not in self.groups or not self.group_chambers.get(group):
+            # chambers in unconfigured groups are never purged
+            self.purge_scheduler.remove(group)
+            return
+        self.purge_scheduler.schedule(group, max(self.state.last_purge(group) + self.groups[group]["purge_interval_s"], not_before))
+
     def shut_sys_down(self):
-        '''Kills all threads, closes all valves, and turns off the vacuum pump by setting all GPIO pins to LOW'''
+        '''Kills all threads, flushes buffered sensor data to disk, closes all valves, and turns off the vacuum pump by setting all GPIO pins to LOW'''
+        # running purges finish their current cycle first so no valve is left open mid phase
+        self.purge_engine.stop(join_timeout=settings.vac_timeout + settings.gas_timeout + 5)
         self.reset_valve_pins()
         time.sleep(0.2)
         self.turn_vacuum_off()
+        # also flushes and fsyncs the buffered chamber csv files
         self.serial_monitor.stop_monitoring()
         self.led_strip_controller.stop()
         self.fan_controller.stop()
-        GPIO.cleanup()
+        self.GPIO.cleanup()
+        if self._unsubscribe_settings is not None:
+            self._unsubscribe_settings()
+        settings.stop_watching()
+        flush_settings()
+        self.state.close()
+        # alerts are sent in the background, give queued ones a chance to go out
+        flush_alerts(timeout=settings.get("alert_timeout_s", 5.0) * 2)
      
     def add_chamber(self, name: str, group: str, slot: int):
         """
@@ -97,12 +179,21 @@ class ControlSystem:
                 print(f"Tried to add chamber \"{name}\" to slot {slot}, but a chamber with the same name is already configured.")  
                 return
             
-        if (settings.get("DEBUG", False)): print(f"Adding chamber \"{name}\" to slot {slot}")
+        if not 1 <= slot <= self.valve_shift_reg.num_bits // 2:
+            print(f"Tried to add chamber \"{name}\" to slot {slot}, but the valve shift registers only have slots 1-{self.valve_shift_reg.num_bits // 2}.")
+            return
+
+        if (settings.debug): print(f"Adding chamber \"{name}\" to slot {slot}")
         self.chambers[name] = EnvironmentalChamber(name=name, group=group, chamber_slot=slot)
-        if slot not in settings["disabled_chambers"]:
+        self.group_chambers.setdefault(group, []).append(self.chambers[name])
+        if group not in self.purge_scheduler:
+            self._schedule_group(group)
+        # disabled_chambers in config.json is for disabling slots by hand, the state store records chambers the system disabled
+        if slot not in settings.get("disabled_chambers", []) and self.state.chamber_status(slot) in (None, "NORMAL"):
             self.serial_monitor.last_readings[name] = {
                 "pressure": None,
                 "reading": None,
+                "message": None,
                 "alert": None
             }
         else: 
@@ -110,9 +201,14 @@ class ControlSystem:
         
 
     def purge_chambers(self, chambers: list[EnvironmentalChamber]):
+        """
+        Runs one purge cycle (vacuum, then gas fill) on the chambers. The vacuum phase holds
+        `vacuum_lock` and the gas phase holds `gas_lock`, so this can be called from several
+        threads and one call's vacuum phase overlaps another call's gas fill.
+        """
         #  Ignore the next reading from the passed in chambers to avoid sampling during purge
         self.serial_monitor.ignore_next_reading |= {chamber.name: True for chamber in chambers}
-        if (settings.get("DEBUG", False)): print(f"Purging chambers in slots {[c.chamber_slot for c in chambers]}")
+        if (settings.debug): print(f"Purging chambers in slots {[c.chamber_slot for c in chambers]}")
         # Send a message to the chamber being purged so that it stops gathering data while it's being purged
         # May need to send an initial wake message 
         
@@ -126,65 +222,95 @@ class ControlSystem:
             
         
         for chamber in active_chambers:
-            self.serial_monitor.send_to_all_serial_ports(f"#{chamber.chamber_slot}, purging")
-            time.sleep(0.01)
-            # open the slenoid valve for the vacuum
-            self.open_vacuum_valve(chamber=chamber)
-        
-        self.turn_vacuum_on()
-        vac_unmet = self.wait_for_pressure_lvl(chambers=active_chambers,
-                                   pressure_lvl=settings.get("vac_pressure", 101000/25), # default to pretty much 1 atm in pascal
-                                   low_pressure=True,
-                                   timeout=settings.get("vac_timeout", 5)) # 5 second default timeout
+            # goes out over the already open reader connection for the chamber's board
+            self.serial_monitor.send_to_chamber(chamber.name, f"#{chamber.chamber_slot}, purging")
 
-        for chamber in active_chambers:
-            self.close_vacuum_valve(chamber=chamber)
-        self.turn_vacuum_off()
+        self._vacuum_phase(active_chambers)
+        time.sleep(1)
+        self._gas_phase(active_chambers)
+        if (settings.debug): print(f"Finished purging chambers {[chamber.name for chamber in active_chambers]}")
+
+    def _vacuum_phase(self, active_chambers: list[EnvironmentalChamber]):
+        """Pumps the chambers down, disabling and removing the ones that don't reach vac_pressure"""
+        with self.vacuum_lock:
+            with self.valve_transaction():
+                for chamber in active_chambers:
+                    # open the slenoid valve for the vacuum
+                    self.open_vacuum_valve(chamber=chamber)
+            
+            self.turn_vacuum_on()
+            vac_unmet = self.wait_for_pressure_lvl(chambers=active_chambers,
+                                       pressure_lvl=settings.vac_pressure, # default to pretty much 1 atm in pascal
+                                       low_pressure=True,
+                                       timeout=settings.vac_timeout) # 5 second default timeout
+
+            with self.valve_transaction():
+                for chamber in active_chambers:
+                    self.close_vacuum_valve(chamber=chamber)
+            self.turn_vacuum_off()
+        # alerts go out after the pump is released so a slow webhook doesn't hold up other purges
         for chamber in vac_unmet: # disable chambers that were not able to reach pressure level (likely not sealed properly)
             self.disable_chamber(chamber, "DISABLED")
             active_chambers.remove(chamber)
             # self.serial_monitor.send_to_all_serial_ports(f"#{chamber.chamber_slot}, DISABLED")
             send_discord_alert_webhook(chamber.chamber_slot, "Vacuum pressure not met!")
 
-        time.sleep(1)
-        
-        for chamber in active_chambers:
-            self.open_gas_valve(chamber=chamber)
-        gas_unmet = self.wait_for_pressure_lvl(chambers=active_chambers,
-                                   pressure_lvl=settings.get("gas_pressure", 101000),
-                                   low_pressure=False,
-                                   timeout=settings.get("gas_timeout", 5))
-        
+    def _gas_phase(self, active_chambers: list[EnvironmentalChamber]):
+        """Fills the chambers with gas, disabling and removing the ones that don't reach gas_pressure"""
+        with self.gas_lock:
+            with self.valve_transaction():
+                for chamber in active_chambers:
+                    self.open_gas_valve(chamber=chamber)
+            gas_unmet = self.wait_for_pressure_lvl(chambers=active_chambers,
+                                       pressure_lvl=settings.gas_pressure,
+                                       low_pressure=False,
+                                       timeout=settings.gas_timeout)
+
+            with self.valve_transaction():
+                for chamber in active_chambers:
+                    self.close_gas_valve(chamber=chamber)
+                    # self.serial_monitor.send_to_all_serial_ports(f"#{chamber.chamber_slot}, purge complete")
         for chamber in gas_unmet: # disable chambers that were not able to reach pressure level (likely not sealed properly)
             self.disable_chamber(chamber, "DISABLED")
             active_chambers.remove(chamber)
             # self.serial_monitor.send_to_all_serial_ports(f"#{chamber.slot}, DISABLED")
             send_discord_alert_webhook(chamber.chamber_slot, "Gas pressure not met!")
 
-        for chamber in active_chambers:
-            self.close_gas_valve(chamber=chamber)
-            # self.serial_monitor.send_to_all_serial_ports(f"#{chamber.chamber_slot}, purge complete")
-        if (settings.get("DEBUG", False)): print(f"Finished purging chambers {[chamber.name for chamber in active_chambers]}")
-
     def disable_chamber(self, chamber: EnvironmentalChamber, new_status: str):
         send_discord_alert_webhook(chamber.name, new_status)
-        self.close_gas_valve(chamber=chamber)
-        self.close_vacuum_valve(chamber=chamber)
+        with self.valve_transaction():
+            self.close_gas_valve(chamber=chamber)
+            self.close_vacuum_valve(chamber=chamber)
         chamber.status = new_status # DISABLED by convention
-        if chamber.chamber_slot not in settings["disabled_chambers"]:
-            settings["disabled_chambers"].append(chamber.chamber_slot)
-            save_settings()
-        if (settings.get("DEBUG", False)): print(f"Disabled Chamber {chamber.chamber_slot} with status {new_status}")
+        with self._watches_lock:
+            for watch in self._pressure_watches:
+                watch.cancel(chamber.name)
+        self.state.set_chamber_status(chamber.chamber_slot, new_status, name=chamber.name)
+        if (settings.debug): print(f"Disabled Chamber {chamber.chamber_slot} with status {new_status}")
+
+    def enable_chamber(self, chamber: EnvironmentalChamber):
+        """Puts a chamber the system disabled back into service, ex: after its leak was fixed"""
+        chamber.status = "NORMAL"
+        self.state.set_chamber_status(chamber.chamber_slot, "NORMAL", name=chamber.name)
+        self.serial_monitor.last_readings.setdefault(chamber.name, {"pressure": None, "reading": None, "message": None, "alert": None})
+        if (settings.debug): print(f"Enabled Chamber {chamber.chamber_slot}")
     
+    def valve_transaction(self):
+        """
+        Context manager that batches every valve change made inside it into a
+        single shift register write when the block exits.
+        """
+        return self.valve_shift_reg.transaction()
+
     def turn_vacuum_on(self):
         """Turns power to the vacuum pump on by setting its GPIO pin HIGH"""
         self.set_pin_high(self.vacuum_ctrl_pin)
-        if (settings.get("DEBUG", False)): print("Vacuum turned ON")
+        if (settings.debug): print("Vacuum turned ON")
     
     def turn_vacuum_off(self):
         """Turns power to the vacuum pump off by setting its GPIO pin LOW"""
         self.set_pin_low(self.vacuum_ctrl_pin)
-        if (settings.get("DEBUG", False)): print("Vacuum turned OFF")
+        if (settings.debug): print("Vacuum turned OFF")
     
     def open_gas_valve(self, chamber: EnvironmentalChamber):
         """Opens the gas valve for the chamber"""
@@ -195,13 +321,13 @@ class ControlSystem:
             self.close_vacuum_valve(chamber=chamber)
             print(f"Tried to open gas valve for chamber {chamber.chamber_slot} but chamber is in {chamber.status} state.")
         else: 
-            self.valve_shift_reg.write_bit(bit_num=(chamber.chamber_slot-1)*2, level=GPIO.HIGH)
-            if (settings.get("DEBUG", False)): print(f"Chamber {chamber.chamber_slot} gas valve opened")
+            self.valve_shift_reg.write_bit(bit_num=(chamber.chamber_slot-1)*2, level=self.GPIO.HIGH)
+            if (settings.debug): print(f"Chamber {chamber.chamber_slot} gas valve opened")
 
     def close_gas_valve(self, chamber: EnvironmentalChamber):
         """Closes the gas valve of the chamber"""
-        self.valve_shift_reg.write_bit(bit_num=(chamber.chamber_slot-1)*2, level=GPIO.LOW)
-        if (settings.get("DEBUG", False)): print(f"Chamber {chamber.chamber_slot} gas valve closed")
+        self.valve_shift_reg.write_bit(bit_num=(chamber.chamber_slot-1)*2, level=self.GPIO.LOW)
+        if (settings.debug): print(f"Chamber {chamber.chamber_slot} gas valve closed")
 
     
     def open_vacuum_valve(self, chamber: EnvironmentalChamber):
@@ -212,74 +338,84 @@ class ControlSystem:
             self.close_vacuum_valve(chamber=chamber)
             print(f"Tried to open vac valve for chamber {chamber.chamber_slot} but chamber is in {chamber.status} state.")
         else: 
-            self.valve_shift_reg.write_bit(bit_num=(chamber.chamber_slot-1)*2+1, level=GPIO.HIGH)
-            if (settings.get("DEBUG", False)): print(f"Chamber {chamber.chamber_slot} vac valve opened")
+            self.valve_shift_reg.write_bit(bit_num=(chamber.chamber_slot-1)*2+1, level=self.GPIO.HIGH)
+            if (settings.debug): print(f"Chamber {chamber.chamber_slot} vac valve opened")
 
  
     def close_vacuum_valve(self, chamber: EnvironmentalChamber):
         """Closes the vacuum valve of the chamber"""
-        self.valve_shift_reg.write_bit(bit_num=(chamber.chamber_slot-1)*2+1, level=GPIO.LOW)
-        if (settings.get("DEBUG", False)): print(f"Chamber {chamber.chamber_slot} vac valve closed")
+        self.valve_shift_reg.write_bit(bit_num=(chamber.chamber_slot-1)*2+1, level=self.GPIO.LOW)
+        if (settings.debug): print(f"Chamber {chamber.chamber_slot} vac valve closed")
 
     
     def set_pin_high(self, pin):
         """Sets the GPIO pin HIGH"""
-        GPIO.output(pin, GPIO.HIGH)
-        if (settings.get("DEBUG", False)): print(f"Pin {pin} set HIGH")
+        self.GPIO.output(pin, self.GPIO.HIGH)
+        if (settings.debug): print(f"Pin {pin} set HIGH")
     
     def set_pin_low(self, pin):
         """Sets the GPIO pin LOW"""
-        GPIO.output(pin, GPIO.LOW)
-        if (settings.get("DEBUG", False)): print(f"Pin {pin} set LOW")
+        self.GPIO.output(pin, self.GPIO.LOW)
+        if (settings.debug): print(f"Pin {pin} set LOW")
         
     def toggle_pin(self, pin):
         """Toggles the logic level of the GPIO pin"""
-        GPIO.output(pin, not GPIO.input(pin))
-        if (settings.get("DEBUG", False)): print(f"Pin {pin} toggled")
+        self.GPIO.output(pin, not self.GPIO.input(pin))
+        if (settings.debug): print(f"Pin {pin} toggled")
         
     def reset_valve_pins(self):
         '''Sets all GPIO pins for the solenoid values to LOW'''
-        for chamber in self.chambers.values():
-            self.close_gas_valve(chamber=chamber)
-            self.close_vacuum_valve(chamber=chamber)
+        with self.valve_transaction():
+            for chamber in self.chambers.values():
+                self.close_gas_valve(chamber=chamber)
+                self.close_vacuum_valve(chamber=chamber)
         
-        GPIO.output(self.vacuum_ctrl_pin, GPIO.LOW)
-        if (self.ambient_valve_pin != None): GPIO.output(self.ambient_valve_pin, GPIO.LOW)
-        if (settings.get("DEBUG", False)): print(f"Reset valve pins")
+        self.GPIO.output(self.vacuum_ctrl_pin, self.GPIO.LOW)
+        if (self.ambient_valve_pin != None): self.GPIO.output(self.ambient_valve_pin, self.GPIO.LOW)
+        if (settings.debug): print(f"Reset valve pins")
     
     def wait_for_pressure_lvl(self, chambers: list[EnvironmentalChamber], pressure_lvl: int, low_pressure: bool, timeout: int) -> list[EnvironmentalChamber]:
-        if (settings.get("DEBUG", False)): print(f"Waiting for {"low" if low_pressure else "high"} pressure")
+        """
+        Blocks until every chamber's pressure has crossed `pressure_lvl` or `timeout` seconds pass,
+        closing each chamber's valves as soon as it crosses. Sleeps until the serial monitor sees a
+        crossing instead of polling. Chambers whose status stops being NORMAL mid wait are dropped.
+        Returns the NORMAL chambers that never reached the pressure level.
+        """
+        direction = "low" if low_pressure else "high"
+        if (settings.debug): print(f"Waiting for {direction} pressure")
         timeout_time = time.time() + timeout
-        
-        pressure_unmet = chambers.copy() # list of chambers that haven't met the pressure level yet
-        
-        while timeout_time > time.time():
-            for chamber in pressure_unmet:
-                if (pressure := self.serial_monitor.last_readings.get(chamber.name, {}).get("pressure", None)) is not None:
-                    try:
-                        pressure = float(pressure)
-                    except (TypeError, ValueError):
-                        pressure = None
-                # check that a presssure reading has been received since start up for the chamber
-                if (chamber.status != "NORMAL"):
-                    if (settings.get("DEBUG", False)): 
-                        print(f"""Non-normal chamber status for chamber \"{chamber.name}\" when trying to read pressure
-                             Ceasing presssure check for chamber.""")
-                    pressure_unmet.remove(chamber)
-                elif pressure == None:
-                    if (settings.get("DEBUG", False)): 
-                        print(f"""No pressure reading for chamber \"{chamber.name}\"",
-                          \nWaiting on a {"low" if low_pressure else "high"} pressure threshold.""")
-                elif (pressure < pressure_lvl and low_pressure 
-                    or pressure > pressure_lvl and not low_pressure
-                    ) and chamber in pressure_unmet:
+
+        pressure_unmet = [] # list of chambers that haven't met the pressure level yet
+        for chamber in chambers:
+            if (chamber.status != "NORMAL"):
+                if (settings.debug):
+                    print(f"Non-normal chamber status for chamber \"{chamber.name}\" when trying to read pressure. Ceasing presssure check for chamber.")
+            else:
+                pressure_unmet.append(chamber)
+        by_name = {chamber.name: chamber for chamber in pressure_unmet}
+
+        watch = self.serial_monitor.watch_pressure(list(by_name), pressure_lvl, low_pressure)
+        with self._watches_lock:
+            self._pressure_watches.add(watch)
+        try:
+            while pressure_unmet and (remaining := timeout_time - time.time()) > 0:
+                # disable_chamber wakes the watch, the cap catches statuses changed any other way
+                met = watch.wait(timeout=min(remaining, 1.0))
+                with self.valve_transaction():
+                    for name in met:
+                        chamber = by_name[name]
+                        pressure_unmet.remove(chamber)
+                        self.close_vacuum_valve(chamber=chamber)
+                        self.close_gas_valve(chamber=chamber)
+                        if (settings.debug): print(f"Pressure met for chamber \"{chamber.name}\"")
+                for chamber in [c for c in pressure_unmet if c.status != "NORMAL"]:
                     pressure_unmet.remove(chamber)
-                    self.close_vacuum_valve(chamber=chamber)
-                    self.close_gas_valve(chamber=chamber)
-                    if (settings.get("DEBUG", False)): print(f"Pressure met for chamber \"{chamber.name}\"")
-                    
-            if len(pressure_unmet) == 0: return []    
-                
-            time.sleep(0.01)
-        if (settings.get("DEBUG", False)): print(f"Finished waiting for {"low" if low_pressure else "high"} pressure")
+                    watch.cancel(chamber.name)
+                    if (settings.debug): print(f"Chamber \"{chamber.name}\" became {chamber.status} while waiting for pressure, ceasing pressure check")
+        finally:
+            with self._watches_lock:
+                self._pressure_watches.discard(watch)
+            self.serial_monitor.unwatch_pressure(watch)
+
+        if (settings.debug): print(f"Finished waiting for {direction} pressure")
         return pressure_unmet
@@ -21,18 +21,21 @@ Usage:
         mux.cleanup()
 """
 
-import RPi.GPIO as GPIO
 import time
+from typing import Any
+
+from .HAL import get_gpio
 
 class DEMUX: #DEMUX
     def __init__(self,
                  select_pins: list[int],
                  signal_pin: int,
-                 gpio_mode=GPIO.BCM,
+                 gpio_mode=11, # GPIO.BCM
                  initial_channel: int = 0,
                  settle_time: float = 0.001,
                  FF_stored: bool = False,
-                 FF_clk_pin: int | None = None):
+                 FF_clk_pin: int | None = None,
+                 gpio: Any = None):
         """
         Generic multiplexer controller:
         - N select lines -> 2^N channels
@@ -49,7 +52,10 @@ class DEMUX: #DEMUX
             Channel (0 to 2^N - 1) to select at init
         settle_time : float
             Delay (s) after switching before read/write
+        gpio :
+            RPi.GPIO style backend, HAL.get_gpio() when None
         """
+        self.GPIO = gpio if gpio is not None else get_gpio()
         self.sel = select_pins
         self.sig = signal_pin
         self.settle = settle_time
@@ -61,12 +67,12 @@ class DEMUX: #DEMUX
         if self.n_bits < 1:
             raise ValueError("Must have at least one select pin")
 
-        GPIO.setmode(gpio_mode)
-        GPIO.setwarnings(False)
+        self.GPIO.setmode(gpio_mode)
+        self.GPIO.setwarnings(False)
 
         # Initialize select lines
         for pin in self.sel:
-            GPIO.setup(pin, GPIO.OUT, initial=GPIO.LOW)
+            self.GPIO.setup(pin, self.GPIO.OUT, initial=self.GPIO.LOW)
 
         self.channel = None
         self.select(initial_channel)
@@ -79,8 +85,8 @@ class DEMUX: #DEMUX
             raise ValueError(f"channel must be between 0 and {self.max_channel - 1}")
 
         for bit in range(self.n_bits):
-            level = GPIO.HIGH if ((channel >> bit) & 1) else GPIO.LOW
-            GPIO.output(self.sel[bit], level)
+            level = self.GPIO.HIGH if ((channel >> bit) & 1) else self.GPIO.LOW
+            self.GPIO.output(self.sel[bit], level)
 
         self.channel = channel
         time.sleep(self.settle)
@@ -90,8 +96,8 @@ class DEMUX: #DEMUX
         Drive the selected channel pin high or low.
         """
         self.select(channel)
-        GPIO.setup(self.sig, GPIO.OUT)
-        GPIO.output(self.sig, value)
+        self.GPIO.setup(self.sig, self.GPIO.OUT)
+        self.GPIO.output(self.sig, value)
         if (self.FF_stored): # clock value into flip flop
             self.pos_edge(self.FF_clk_pin)
 
@@ -101,13 +107,13 @@ class DEMUX: #DEMUX
         Ensures signal is low then sends a quick high pulse
         """
         # ensure pin starts low
-        GPIO.setup(pin, GPIO.OUT)
-        GPIO.output(pin, GPIO.LOW)
+        self.GPIO.setup(pin, self.GPIO.OUT)
+        self.GPIO.output(pin, self.GPIO.LOW)
         # wait for mux and flip flop to settle
         time.sleep(self.settle)
-        GPIO.output(pin, GPIO.HIGH)
+        self.GPIO.output(pin, self.GPIO.HIGH)
         time.sleep(self.settle)
-        GPIO.output(pin, GPIO.LOW)
+        self.GPIO.output(pin, self.GPIO.LOW)
         time.sleep(self.settle)
 
     def channel_pos_edge(self, channel: int):
@@ -117,13 +123,13 @@ class DEMUX: #DEMUX
         # set address
         self.select(channel)
         # ensure signal starts low
-        GPIO.setup(self.sig, GPIO.OUT)
-        GPIO.output(self.sig, GPIO.LOW)
+        self.GPIO.setup(self.sig, self.GPIO.OUT)
+        self.GPIO.output(self.sig, self.GPIO.LOW)
         # wait for mux and flip flop to settle
         time.sleep(self.settle)
-        GPIO.output(self.sig, GPIO.HIGH)
+        self.GPIO.output(self.sig, self.GPIO.HIGH)
         time.sleep(self.settle)
-        GPIO.output(self.sig, GPIO.LOW)
+        self.GPIO.output(self.sig, self.GPIO.LOW)
         time.sleep(self.settle)
 
     def read(self, channel: int) -> int:
@@ -132,8 +138,8 @@ class DEMUX: #DEMUX
         Returns GPIO.HIGH (1) or GPIO.LOW (0).
         """
         self.select(channel)
-        GPIO.setup(self.sig, GPIO.IN)
-        return GPIO.input(self.sig)
+        self.GPIO.setup(self.sig, self.GPIO.IN)
+        return self.GPIO.input(self.sig)
 
     def cleanup(self):
         """
@@ -141,10 +147,11 @@ class DEMUX: #DEMUX
         """
         pins = [*self.sel, self.sig]
         if self.FF_stored: pins.append(self.FF_clk_pin)
-        GPIO.cleanup(pins)
+        self.GPIO.cleanup(pins)
 
 
 if __name__ == "__main__":
+    GPIO = get_gpio()
     # Example for 8-channel MUX:
     sel_pins = [17, 27, 22]  # 3 select lines -> 8 channels
     sig_pin = 24
@@ -1,36 +1,264 @@
+import queue
+import threading
+import time
+
 import requests
-from ..config.config_manager import settings, save_settings
+from requests.adapters import HTTPAdapter
+from ..config.config_manager import settings
+
+DISCORD_MAX_CONTENT = 2000  # characters per webhook message
 
-def send_discord_alert_webhook(chamber: int | str, new_status: str) -> bool:
+
+class AlertDispatcher:
     """
-    Sends a message to a Discord webhook URL.
+    Sends chamber alerts to a Discord webhook from a background thread so callers
+    (the serial parse workers, purge threads) never wait on the network.
+
+    - Alerts go into a bounded queue, new alerts are dropped (and counted) when it is full.
+    - Alerts arriving within `coalesce_s` of the first one are sent together as one message.
+    - Alerts sent with `dedup=True` (status lines a chamber repeats, ex: firmware
+      ##ALERTs) that repeat a (chamber, status) already sent within `dedup_window_s`
+      are suppressed, the number of repeats is added to the next message sent for it.
+      Other alerts (pressure not met, disabled chambers, failed purges) each report a
+      separate event and are always sent.
+    - Requests share one pooled `requests.Session`, have a timeout, and are retried
+      with exponential backoff on connection errors, 5xx, and 429 (honoring the
+      `retry_after` Discord sends). At most one message is sent per `min_interval_s`.
+
+    The webhook URL is read from the `discord_alert_webhook` setting for every
+    message unless `url` is given, ex: a local HTTP stub in tests.
 
     Parameters:
-        chamber (`int`): 
+        url (`str | None`):
+            Webhook URL, overrides the `discord_alert_webhook` setting.
+        queue_size (`int`):
+            Alerts held waiting to be sent (`alert_queue_size`).
+        coalesce_s (`float`):
+            How long to gather a burst of alerts into one message (`alert_coalesce_s`).
+        dedup_window_s (`float`):
+            Repeats of a deduplicated alert within this time are suppressed (`alert_dedup_window_s`).
+        timeout_s (`float`):
+            Connect and read timeout of each request (`alert_timeout_s`).
+        max_retries (`int`):
+            Retries of a failed message before it is dropped (`alert_max_retries`).
+        min_interval_s (`float`):
+            Minimum time between two messages (`alert_min_interval_s`).
+    """
+    def __init__(self, url: str | None = None, queue_size: int | None = None, coalesce_s: float | None = None,
+                 dedup_window_s: float | None = None, timeout_s: float | None = None,
+                 max_retries: int | None = None, min_interval_s: float | None = None):
+        self.url = url
+        self.coalesce_s = coalesce_s if coalesce_s is not None else settings.get("alert_coalesce_s", 2.0)
+        self.dedup_window_s = dedup_window_s if dedup_window_s is not None else settings.get("alert_dedup_window_s", 300)
+        self.timeout_s = timeout_s if timeout_s is not None else settings.get("alert_timeout_s", 5.0)
+        self.max_retries = max_retries if max_retries is not None else settings.get("alert_max_retries", 4)
+        self.min_interval_s = min_interval_s if min_interval_s is not None else settings.get("alert_min_interval_s", 1.0)
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size if queue_size is not None else settings.get("alert_queue_size", 256))
+
+        self.session = requests.Session()
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+
+        self.lock = threading.Lock()
+        # (chamber, status) -> when it was last sent
+        self._last_sent: dict[tuple[str, str], float] = {}
+        # (chamber, status) -> repeats suppressed since it was last sent
+        self._suppressed: dict[tuple[str, str], int] = {}
+        self._last_post = 0.0
+        self._pending = 0 # alerts queued or being sent, for flush
+        self._idle = threading.Condition(self.lock)
+        self._worker: threading.Thread | None = None
+        self._stop_event = threading.Event()
+        self.stats = {"queued": 0, "sent": 0, "messages": 0, "deduplicated": 0, "dropped": 0, "failed": 0}
+
+    def send(self, chamber: int | str, new_status: str, dedup: bool = False) -> bool:
+        """
+        Queues an alert without blocking, returns False if it was dropped because the queue is full.
+        Repeats within `dedup_window_s` are suppressed when `dedup` is True.
+        """
+        with self.lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stop_event.clear()
+                self._worker = threading.Thread(target=self._run, name="discord-alerts", daemon=True)
+                self._worker.start()
+            try:
+                self.queue.put_nowait((str(chamber), str(new_status), bool(dedup)))
+            except queue.Full:
+                self.stats["dropped"] += 1
+                return False
+            self._pending += 1
+            self.stats["queued"] += 1
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Waits until every queued alert was sent or given up on, returns False if `timeout` passed first"""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    def stop(self, timeout: float | None = 10.0) -> bool:
+        """Sends what is queued (for up to `timeout` seconds) and stops the worker"""
+        flushed = self.flush(timeout=timeout)
+        self._stop_event.set()
+        if self._worker is not None:
+            self._worker.join(timeout=1)
+            self._worker = None
+        return flushed
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                first = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            batch = [first]
+            # gather the rest of the burst
+            deadline = time.monotonic() + self.coalesce_s
+            while (remaining := deadline - time.monotonic()) > 0:
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                lines = self._dedup(batch)
+                if lines:
+                    self._send_lines(lines)
+            except Exception as e:
+                print(f"Error sending alerts: {e}")
+            finally:
+                with self._idle:
+                    self._pending -= len(batch)
+                    self._idle.notify_all()
+
+    def _dedup(self, batch: list[tuple[str, str, bool]]) -> list[str]:
+        """Message lines for the batch, one per distinct alert, minus deduplicated ones sent within the window"""
+        counts: dict[tuple[str, str, bool], int] = {}
+        for item in batch:
+            counts[item] = counts.get(item, 0) + 1
+        lines = []
+        now = time.time()
+        with self.lock:
+            for (chamber, status, dedup), count in counts.items():
+                key = (chamber, status)
+                if not dedup:
+                    lines.append(f"Chamber {chamber} {status}" + (f" (x{count})" if count > 1 else ""))
+                    continue
+                if now - self._last_sent.get(key, float("-inf")) < self.dedup_window_s:
+                    self._suppressed[key] = self._suppressed.get(key, 0) + count
+                    self.stats["deduplicated"] += count
+                    continue
+                repeats = count - 1 + self._suppressed.pop(key, 0)
+                self.stats["deduplicated"] += count - 1
+                self._last_sent[key] = now
+                lines.append(f"Chamber {chamber} {status}" + (f" (x{repeats + 1})" if repeats else ""))
+        return lines
+
+    def _send_lines(self, lines: list[str]):
+        url = self.url or settings.get("discord_alert_webhook", False)
+        if not url:
+            return
+        for content in self._chunk(lines):
+            ok = self._post(url, content)
+            with self.lock:
+                if ok:
+                    self.stats["sent"] += content.count("\n") + 1
+                    self.stats["messages"] += 1
+                else:
+                    self.stats["failed"] += content.count("\n") + 1
+
+    @staticmethod
+    def _chunk(lines: list[str]) -> list[str]:
+        """Joins lines into as few messages as fit Discord's content limit"""
+        chunks, current = [], ""
+        for line in lines:
+            line = line[:DISCORD_MAX_CONTENT]
+            if current and len(current) + 1 + len(line) > DISCORD_MAX_CONTENT:
+                chunks.append(current)
+                current = ""
+            current = f"{current}\n{line}" if current else line
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def _post(self, url: str, content: str) -> bool:
+        backoff = 1.0
+        for attempt in range(self.max_retries + 1):
+            wait = self._last_post + self.min_interval_s - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_post = time.monotonic()
+            try:
+                if (settings.debug): print(f'Sending "{content}" to webhook {url}')
+                response = self.session.post(url, json={"content": content}, timeout=self.timeout_s)
+                if response.status_code < 300:
+                    return True  # Discord returns 204 No Content on success
+                if response.status_code == 429:
+                    retry_after = self._retry_after(response)
+                    if retry_after is not None:
+                        backoff = max(backoff, retry_after)
+                elif response.status_code < 500:
+                    print(f"Webhook rejected alert with status {response.status_code}: {response.text[:200]}")
+                    return False
+                error = f"status {response.status_code}"
+            except requests.exceptions.RequestException as e:
+                error = str(e)
+            if attempt == self.max_retries or self._stop_event.wait(backoff):
+                print(f"Error sending webhook ({error}), giving up after {attempt + 1} attempt(s)")
+                return False
+            backoff = min(backoff * 2, 60)
+        return False
+
+    @staticmethod
+    def _retry_after(response: requests.Response) -> float | None:
+        try:
+            return float(response.json()["retry_after"])
+        except (ValueError, KeyError, TypeError):
+            pass
+        try:
+            return float(response.headers["Retry-After"])
+        except (KeyError, ValueError):
+            return None
+
+
+_dispatcher: AlertDispatcher | None = None
+_dispatcher_lock = threading.Lock()
+
+def get_alert_dispatcher() -> AlertDispatcher:
+    """The dispatcher shared by every module, created on first use"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = AlertDispatcher()
+        return _dispatcher
+
+def send_discord_alert_webhook(chamber: int | str, new_status: str, dedup: bool = False) -> bool:
+    """
+    Queues a message for the Discord webhook URL, it is sent in the background.
+
+    Parameters:
+        chamber (`int`):
             The chamber slot number
-        new_status: (`str`): 
+        new_status: (`str`):
             The new status of the chamber
+        dedup (`bool`):
+            Suppress repeats of this (chamber, status) within `alert_dedup_window_s`,
+            for status lines a chamber keeps repeating.
 
     Returns:
-        `bool`: True if the message was sent successfully, False otherwise.
+        `bool`: True if the message was queued, False if no webhook is configured or the queue is full.
     """
-    wh = settings.get("discord_alert_webhook", False)
-    if not wh: return False
-
-    payload = {
-        "content": f"Chamber {chamber} {new_status}"
-    }
-    try:
-        if (settings.get("DEBUG", False)): print(f'Sending "{payload["content"]}" to webhook {wh}')
-        response = requests.post(wh, json=payload)
-        return response.status_code == 204  # Discord returns 204 No Content on success
-    except requests.exceptions.RequestException as e:
-        print(f"Error sending webhook: {e}")
-        return False
-    
-    
+    if not settings.get("discord_alert_webhook", False): return False
+    return get_alert_dispatcher().send(chamber, new_status, dedup=dedup)
+
+def flush_alerts(timeout: float | None = 10.0) -> bool:
+    """Sends queued alerts and stops the dispatcher, ex: before shutting down"""
+    if _dispatcher is None:
+        return True
+    return _dispatcher.stop(timeout=timeout)
+
+
 if __name__ == "__main__":
     chamber = 1
     status = "Test"
     print("test")
-    send_discord_alert_webhook(chamber, status)
\ No newline at end of file
+    send_discord_alert_webhook(chamber, status)
+    flush_alerts()
@@ -9,10 +9,10 @@ or via constructor parameters.
 import threading
 import time
 import subprocess
-import RPi.GPIO as GPIO
-from typing import Literal
+from typing import Any, Callable, Literal
 
 from ..config.config_manager import settings
+from .HAL import get_gpio, hal_backend, SimulatedCPUTemp
 
 
 def get_cpu_temp():
@@ -35,18 +35,25 @@ class FanController:
         off_thresh (float): Temperature (°C) to turn fan off.
         poll_rate (float): Seconds between temperature checks.
         gpio_mode: GPIO numbering mode (GPIO.BOARD or GPIO.BCM).
+        gpio: RPi.GPIO style backend, HAL.get_gpio() when None.
+        read_temp: Returns the temperature in °C, get_cpu_temp when None (a fixed simulated temperature with the "sim" HAL backend).
     """
     def __init__(self,
                  fan_pin=None,
                  on_thresh=None,
                  off_thresh=None,
                  poll_rate=None,
-                 gpio_mode: Literal[10, 11]=GPIO.BCM):
+                 gpio_mode: Literal[10, 11]=11, # GPIO.BCM
+                 gpio: Any = None,
+                 read_temp: Callable[[], float] | None = None):
         # Load defaults from config if not provided
         self.fan_pin = fan_pin if fan_pin is not None else settings.get("fan_pin", 32)
         self.on_thresh = on_thresh if on_thresh is not None else settings.get("fan_on_temp_thresh", 0.0)
         self.off_thresh = off_thresh if off_thresh is not None else settings.get("fan_off_temp_thresh", None)
         self.poll_rate = poll_rate if poll_rate is not None else settings.get("fan_temp_poll_rate", 1)
+        if read_temp is None:
+            read_temp = get_cpu_temp if hal_backend() == "rpi" else SimulatedCPUTemp()
+        self.read_temp = read_temp
 
         # Internal state: False=OFF, True=ON
         self.state = False
@@ -55,6 +62,8 @@ class FanController:
         self.running = False
 
         # GPIO setup
+        self.GPIO = gpio if gpio is not None else get_gpio()
+        GPIO = self.GPIO
         GPIO.setwarnings(False)
         GPIO.setmode(gpio_mode)
         GPIO.setup(self.fan_pin, GPIO.OUT)
@@ -67,12 +76,12 @@ class FanController:
             temp (float): current CPU temperature
             state (bool): True if fan ON, False if OFF
         """
-        temp = get_cpu_temp()
+        temp = self.read_temp()
         if self.state and self.off_thresh is not None and temp <= self.off_thresh:
-            GPIO.output(self.fan_pin, GPIO.LOW)
+            self.GPIO.output(self.fan_pin, self.GPIO.LOW)
             self.state = False
         elif not self.state and temp >= self.on_thresh:
-            GPIO.output(self.fan_pin, GPIO.HIGH)
+            self.GPIO.output(self.fan_pin, self.GPIO.HIGH)
             self.state = True
         return temp, self.state
 
@@ -84,7 +93,7 @@ class FanController:
                 print(f"CPU Temp: {temp:.2f}°C, thresholds on={self.on_thresh:.1f}, off={off:.1f} -> Fan {'ON' if state else 'OFF'}")
                 time.sleep(self.poll_rate)
         else:
-            GPIO.output(self.fan_pin, GPIO.HIGH)
+            self.GPIO.output(self.fan_pin, self.GPIO.HIGH)
 
     def run(self, use_thresh=True):
         """
@@ -99,7 +108,7 @@ class FanController:
         self.running = False
         if self.thread is not None:
             self.thread.join(timeout=join_timeout)
-        GPIO.output(self.fan_pin, GPIO.LOW)
+        self.GPIO.output(self.fan_pin, self.GPIO.LOW)
         print("Fan controller stopped and GPIO cleaned up.")
         # GPIO.cleanup()  # Uncomment if you want to reset all GPIO pin
 
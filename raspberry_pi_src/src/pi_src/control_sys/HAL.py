@@ -0,0 +1,245 @@
+"""
+HAL.py
+
+Hardware abstraction layer for the GPIO and PWM libraries used by the control system.
+
+Hardware classes take the backend they drive as a constructor argument (`gpio` for
+an RPi.GPIO style module, `pigpio` for a pigpio style module) and fall back to
+`get_gpio()`/`get_pigpio()` when none is given. Those pick the backend from the
+`hal_backend` setting:
+
+- "rpi" (default): the real RPi.GPIO and pigpio modules, imported on first use.
+- "sim": `SimulatedGPIO`/`SimulatedPigpio`, in-memory backends that record every
+  pin transition and call with a timestamp so purge timing and GPIO call counts
+  can be measured on an ordinary Linux machine.
+
+Every class asking for the simulated backend gets the same instance, so one
+recording covers the whole system.
+"""
+import threading
+import time
+from collections import Counter
+from typing import Any
+
+from ..config.config_manager import settings
+
+
+class SimulatedGPIO:
+    """
+    In-memory stand in for the RPi.GPIO module.
+
+    Attributes:
+        levels (`dict[int, int]`): current level of every pin that has been set up
+        directions (`dict[int, int]`): OUT or IN for every pin that has been set up
+        transitions (`list[tuple[float, int, int]]`): (time.perf_counter(), pin, new level)
+            for every output that actually changed level
+        calls (`Counter`): number of calls made to each API function
+    """
+    BOARD = 10
+    BCM = 11
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_OFF = 20
+    PUD_DOWN = 21
+    PUD_UP = 22
+
+    def __init__(self):
+        self.mode: int | None = None
+        self.levels: dict[int, int] = {}
+        self.directions: dict[int, int] = {}
+        self.transitions: list[tuple[float, int, int]] = []
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def setmode(self, mode: int):
+        self.calls["setmode"] += 1
+        if mode not in (self.BOARD, self.BCM):
+            raise ValueError(f"Invalid GPIO mode {mode}")
+        self.mode = mode
+
+    def getmode(self) -> int | None:
+        self.calls["getmode"] += 1
+        return self.mode
+
+    def setwarnings(self, flag: bool):
+        self.calls["setwarnings"] += 1
+
+    def setup(self, channel: int | list[int], direction: int, pull_up_down: int | None = None, initial: int | None = None):
+        self.calls["setup"] += 1
+        if self.mode is None:
+            raise RuntimeError("Please set pin numbering mode using GPIO.setmode(GPIO.BOARD) or GPIO.setmode(GPIO.BCM)")
+        for pin in self._channels(channel):
+            with self._lock:
+                self.directions[pin] = direction
+            if direction == self.OUT:
+                self._set_level(pin, initial if initial is not None else self.levels.get(pin, self.LOW))
+            else:
+                with self._lock:
+                    self.levels.setdefault(pin, self.HIGH if pull_up_down == self.PUD_UP else self.LOW)
+
+    def output(self, channel: int | list[int], value: int | bool | list[int]):
+        self.calls["output"] += 1
+        pins = self._channels(channel)
+        values = value if isinstance(value, (list, tuple)) else [value] * len(pins)
+        if len(values) != len(pins):
+            raise RuntimeError("Number of channels != number of values")
+        for pin, level in zip(pins, values):
+            if self.directions.get(pin) != self.OUT:
+                raise RuntimeError(f"The GPIO channel {pin} has not been set up as an OUTPUT")
+            self._set_level(pin, level)
+
+    def input(self, channel: int) -> int:
+        self.calls["input"] += 1
+        if channel not in self.directions:
+            raise RuntimeError(f"You must setup() the GPIO channel {channel} first")
+        return self.levels.get(channel, self.LOW)
+
+    def cleanup(self, channel: int | list[int] | None = None):
+        self.calls["cleanup"] += 1
+        with self._lock:
+            pins = list(self.directions) if channel is None else self._channels(channel)
+            for pin in pins:
+                self.directions.pop(pin, None)
+            if channel is None:
+                self.mode = None
+
+    def drive_input(self, pin: int, level: int):
+        """Sets the level an input pin reads back, ex: to simulate a switch"""
+        self._set_level(pin, level)
+
+    def transitions_for(self, pin: int) -> list[tuple[float, int]]:
+        """Returns the (timestamp, level) transitions recorded for one pin"""
+        with self._lock:
+            return [(t, level) for t, p, level in self.transitions if p == pin]
+
+    def reset_stats(self):
+        """Clears the recorded transitions and call counts, keeping pin state"""
+        with self._lock:
+            self.transitions.clear()
+            self.calls.clear()
+
+    def _set_level(self, pin: int, level: int | bool):
+        level = self.HIGH if level else self.LOW
+        with self._lock:
+            if self.levels.get(pin) != level:
+                self.levels[pin] = level
+                self.transitions.append((time.perf_counter(), pin, level))
+
+    @staticmethod
+    def _channels(channel: int | list[int] | tuple[int, ...]) -> list[int]:
+        return list(channel) if isinstance(channel, (list, tuple)) else [channel]
+
+
+class SimulatedPigpio:
+    """
+    In-memory stand in for the pigpio module. `pi()` hands out connections that
+    record mode changes, writes, and hardware PWM settings.
+
+    Attributes:
+        pwm (`list[tuple[float, int, int, int]]`): (time.perf_counter(), pin, frequency, duty) per hardware_PWM call
+        levels (`dict[int, int]`): pin levels written with `write`
+        calls (`Counter`): number of calls made to each connection method
+    """
+    INPUT = 0
+    OUTPUT = 1
+
+    class error(Exception):
+        pass
+
+    class _Pi:
+        def __init__(self, owner: "SimulatedPigpio"):
+            self._owner = owner
+            self.connected = True
+
+        def set_mode(self, gpio: int, mode: int):
+            self._owner._record("set_mode")
+            self._owner.modes[gpio] = mode
+
+        def write(self, gpio: int, level: int):
+            self._owner._record("write")
+            self._owner.levels[gpio] = 1 if level else 0
+
+        def read(self, gpio: int) -> int:
+            self._owner._record("read")
+            return self._owner.levels.get(gpio, 0)
+
+        def hardware_PWM(self, gpio: int, PWMfreq: int, PWMduty: int):
+            self._owner._record("hardware_PWM")
+            if not self.connected:
+                raise SimulatedPigpio.error("not connected to the pigpio daemon")
+            if not 0 <= PWMduty <= 1_000_000:
+                raise SimulatedPigpio.error("bad PWM dutycycle")
+            with self._owner._lock:
+                self._owner.pwm.append((time.perf_counter(), gpio, PWMfreq, PWMduty))
+
+        def stop(self):
+            self._owner._record("stop")
+            self.connected = False
+
+    def __init__(self):
+        self.modes: dict[int, int] = {}
+        self.levels: dict[int, int] = {}
+        self.pwm: list[tuple[float, int, int, int]] = []
+        self.calls: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def pi(self, *args, **kwargs) -> "SimulatedPigpio._Pi":
+        return self._Pi(self)
+
+    def reset_stats(self):
+        """Clears the recorded PWM settings and call counts"""
+        with self._lock:
+            self.pwm.clear()
+            self.calls.clear()
+
+    def _record(self, name: str):
+        with self._lock:
+            self.calls[name] += 1
+
+
+class SimulatedCPUTemp:
+    """Stand in for the CPU temperature sensor, returns `temp` (°C), which can be changed at any time"""
+    def __init__(self, temp: float = 45.0):
+        self.temp = temp
+
+    def __call__(self) -> float:
+        return self.temp
+
+
+_simulated_gpio: SimulatedGPIO | None = None
+_simulated_pigpio: SimulatedPigpio | None = None
+_sim_lock = threading.Lock()
+
+
+def hal_backend() -> str:
+    """Returns the configured backend name, "rpi" or "sim" """
+    backend = settings.get("hal_backend", "rpi")
+    if backend not in ("rpi", "sim"):
+        raise ValueError(f"Unknown hal_backend '{backend}', expected 'rpi' or 'sim'")
+    return backend
+
+
+def get_gpio(backend: str | None = None) -> Any:
+    """Returns the RPi.GPIO style module for `backend`, the `hal_backend` setting when None"""
+    global _simulated_gpio
+    if (backend or hal_backend()) == "sim":
+        with _sim_lock:
+            if _simulated_gpio is None:
+                _simulated_gpio = SimulatedGPIO()
+            return _simulated_gpio
+    import RPi.GPIO as GPIO
+    return GPIO
+
+
+def get_pigpio(backend: str | None = None) -> Any:
+    """Returns the pigpio style module for `backend`, the `hal_backend` setting when None"""
+    global _simulated_pigpio
+    if (backend or hal_backend()) == "sim":
+        with _sim_lock:
+            if _simulated_pigpio is None:
+                _simulated_pigpio = SimulatedPigpio()
+            return _simulated_pigpio
+    import pigpio
+    return pigpio
@@ -0,0 +1,305 @@
+"""
+InferenceService.py
+
+Classifies ##READING messages as they arrive with an exported model (see
+`ReadingClassifier`) in a separate process, so inference never competes with
+serial ingestion for the GIL.
+
+The processes share one block of shared memory:
+    header      total readings submitted (`count`)
+    input ring  the last `queue_size` submitted readings (`INPUT_DTYPE`)
+    output      the latest prediction of each chamber (`OUTPUT_DTYPE`)
+    stats       counters and a ring of recent latencies, written by the worker
+
+The parse workers copy each reading into the input ring and set an event. The
+worker process takes readings in micro-batches: it runs the network as soon as
+`max_batch` readings are waiting, or once the oldest has waited `max_delay_s`.
+Each slot carries the sequence number it was written for, and the worker skips
+readings that were overwritten before it got to them and counts them as dropped.
+Output rows use the same odd/even `seq` protocol as `ReadingRingBuffer`.
+"""
+import multiprocessing as mp
+import os
+import threading
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from ..config.config_manager import settings
+from .SerialMessages import READING_DTYPE
+
+MAX_CLASSES = 8
+LATENCY_SAMPLES = 256
+
+HEADER_DTYPE = np.dtype([("count", "<u8"), ("_pad", "V56")])
+INPUT_DTYPE = np.dtype([
+    ("seq", "<u8"),         # count after this reading was submitted, 0 while empty or being written
+    ("chamber", "<i4"),     # row in the output table
+    ("enqueued", "<f8"),    # time.time() at submit
+    ("record", READING_DTYPE),
+])
+OUTPUT_DTYPE = np.dtype([
+    ("seq", "<u8"),         # odd while the row is being written
+    ("timestamp", "<i8"),   # of the reading
+    ("latency", "<f8"),     # submit to publish, seconds
+    ("label", "<i4"),
+    ("confidence", "<f4"),
+    ("probs", "<f4", (MAX_CLASSES,)),
+])
+STATS_DTYPE = np.dtype([
+    ("ready", "<u4"),
+    ("pid", "<i4"),
+    ("batches", "<u8"),
+    ("predictions", "<u8"),
+    ("dropped", "<u8"),
+    ("max_batch", "<u8"),
+    ("latency_count", "<u8"),
+    ("latency_sum", "<f8"),
+    ("latency_max", "<f8"),
+    ("latencies", "<f8", (LATENCY_SAMPLES,)),
+    ("error", "S256"),
+])
+
+
+def _views(buf, queue_size: int, max_chambers: int):
+    """header, input ring, output table, and stats arrays over the shared block"""
+    offset = 0
+    views = []
+    for dtype, count in ((HEADER_DTYPE, 1), (INPUT_DTYPE, queue_size), (OUTPUT_DTYPE, max_chambers), (STATS_DTYPE, 1)):
+        views.append(np.ndarray((count,), dtype=dtype, buffer=buf, offset=offset))
+        offset += dtype.itemsize * count
+    return views
+
+def _shared_size(queue_size: int, max_chambers: int) -> int:
+    return (HEADER_DTYPE.itemsize + INPUT_DTYPE.itemsize * queue_size
+            + OUTPUT_DTYPE.itemsize * max_chambers + STATS_DTYPE.itemsize)
+
+
+class InferenceService:
+    """
+    Runs a `ReadingClassifier` in a worker process and keeps the latest
+    prediction of every chamber.
+
+    Parameters:
+        model_path (`str | None`):
+            Exported `.npz` model, the `inference_model_path` setting when None.
+        max_batch (`int | None`):
+            Most readings classified in one batch (`inference_max_batch`).
+        max_delay_s (`float | None`):
+            Longest a reading waits for a batch to fill (`inference_max_delay_s`).
+        queue_size (`int | None`):
+            Readings the input ring holds (`inference_queue_size`).
+        max_chambers (`int | None`):
+            Chambers predictions are kept for (`inference_max_chambers`).
+    """
+    def __init__(self, model_path: str | None = None, max_batch: int | None = None, max_delay_s: float | None = None,
+                 queue_size: int | None = None, max_chambers: int | None = None):
+        self.model_path = model_path or settings.get("inference_model_path", None)
+        if not self.model_path:
+            raise ValueError("No model to run inference with, set inference_model_path")
+        self.max_batch = max_batch or settings.get("inference_max_batch", 32)
+        self.max_delay_s = max_delay_s if max_delay_s is not None else settings.get("inference_max_delay_s", 0.05)
+        self.queue_size = queue_size or settings.get("inference_queue_size", 1024)
+        self.max_chambers = max_chambers or settings.get("inference_max_chambers", 64)
+        # only the class names are read here, the weights are loaded by the worker
+        with np.load(self.model_path, allow_pickle=False) as data:
+            self.class_names = [str(n) for n in data["class_names"]]
+        if len(self.class_names) > MAX_CLASSES:
+            raise ValueError(f"Model has {len(self.class_names)} classes, at most {MAX_CLASSES} are supported")
+
+        self.lock = threading.Lock()
+        # chamber name -> row in the output table
+        self.chamber_rows: dict[str, int] = {}
+        self.submitted = 0
+        self.rejected = 0 # readings from chambers past max_chambers
+        self._shm: SharedMemory | None = None
+        self._process = None
+        # spawn, forking a process with running serial threads is unsafe
+        self._ctx = mp.get_context("spawn")
+        self._wake = self._ctx.Event()
+        self._stop = self._ctx.Event()
+
+    def start(self):
+        if self._process is not None:
+            return
+        # new blocks are zero filled, every slot and row starts out empty
+        self._shm = SharedMemory(create=True, size=_shared_size(self.queue_size, self.max_chambers))
+        self._header, self._ring, self._output, self._stats = _views(self._shm.buf, self.queue_size, self.max_chambers)
+        self._stop.clear()
+        self._process = self._ctx.Process(
+            target=_worker_main, name="inference",
+            args=(self._shm.name, self.model_path, self.queue_size, self.max_chambers,
+                  self.max_batch, self.max_delay_s, settings.get("inference_nice", 5), self._wake, self._stop),
+            daemon=True)
+        self._process.start()
+
+    def stop(self, join_timeout: float = 3.0):
+        if self._process is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._process.join(timeout=join_timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join(timeout=1)
+        self._process = None
+        del self._header, self._ring, self._output, self._stats
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def submit(self, chamber: str, record: np.ndarray) -> bool:
+        """Queues a `READING_DTYPE` record for classification, never blocks"""
+        if self._shm is None:
+            return False
+        with self.lock:
+            row = self.chamber_rows.get(chamber)
+            if row is None:
+                if len(self.chamber_rows) >= self.max_chambers:
+                    self.rejected += 1
+                    return False
+                row = self.chamber_rows[chamber] = len(self.chamber_rows)
+            count = int(self._header["count"][0])
+            slot = self._ring[count % self.queue_size]
+            slot["seq"] = 0  # invalidates the old reading before its fields are overwritten
+            slot["chamber"] = row
+            slot["enqueued"] = time.time()
+            slot["record"] = record[0] if record.ndim else record
+            slot["seq"] = count + 1  # written last, marks the slot complete
+            self._header["count"] = count + 1
+            self.submitted += 1
+        self._wake.set()
+        return True
+
+    def get_prediction(self, chamber: str, retries: int = 10) -> dict | None:
+        """
+        The chamber's latest prediction, None if it has not been classified yet
+        or the row kept being rewritten while it was read.
+        """
+        row = self.chamber_rows.get(chamber)
+        if row is None or self._shm is None:
+            return None
+        for _ in range(retries):
+            seq = int(self._output["seq"][row])
+            if seq & 1:
+                continue  # being written
+            out = self._output[row].copy()
+            if int(self._output["seq"][row]) == seq:
+                break
+        else:
+            return None
+        if seq == 0:
+            return None
+        label = int(out["label"])
+        return {
+            "class": self.class_names[label],
+            "label": label,
+            "confidence": float(out["confidence"]),
+            "probabilities": dict(zip(self.class_names, out["probs"][:len(self.class_names)].tolist())),
+            "timestamp": int(out["timestamp"]),
+            "latency_s": float(out["latency"]),
+        }
+
+    def get_stats(self) -> dict:
+        stats = {"submitted": self.submitted, "rejected": self.rejected,
+                 "running": self._process is not None and self._process.is_alive()}
+        if self._shm is None:
+            return stats
+        s = self._stats[0].copy()
+        latencies = np.sort(s["latencies"][:min(int(s["latency_count"]), LATENCY_SAMPLES)]) * 1000
+        stats.update({
+            "ready": bool(s["ready"]),
+            "error": s["error"].decode(errors="replace") or None,
+            "batches": int(s["batches"]),
+            "predictions": int(s["predictions"]),
+            "dropped": int(s["dropped"]),
+            "max_batch": int(s["max_batch"]),
+            "mean_batch": int(s["predictions"]) / int(s["batches"]) if s["batches"] else None,
+            "latency_mean_ms": float(s["latency_sum"]) / int(s["latency_count"]) * 1000 if s["latency_count"] else None,
+            "latency_max_ms": float(s["latency_max"]) * 1000 if s["latency_count"] else None,
+            # over the last LATENCY_SAMPLES predictions
+            "latency_p50_ms": float(latencies[len(latencies) // 2]) if len(latencies) else None,
+            "latency_p95_ms": float(latencies[max(int(len(latencies) * 0.95) - 1, 0)]) if len(latencies) else None,
+        })
+        return stats
+
+
+def _worker_main(shm_name: str, model_path: str, queue_size: int, max_chambers: int,
+                 max_batch: int, max_delay_s: float, nice: int, wake, stop):
+    from .ReadingClassifier import ReadingClassifier
+
+    # spawned processes share the parent's resource tracker, the parent unlinks the block
+    shm = SharedMemory(name=shm_name)
+    header, ring, output, stats_arr = _views(shm.buf, queue_size, max_chambers)
+    stats = stats_arr[0]
+    stats["pid"] = os.getpid()
+    try:
+        if nice:
+            os.nice(nice)  # serial ingestion comes first
+        classifier = ReadingClassifier.load(model_path)
+    except Exception as e:
+        stats["error"] = f"{type(e).__name__}: {e}".encode()[:256]
+        del header, ring, output, stats_arr, stats
+        shm.close()
+        return
+    stats["ready"] = 1
+
+    read = 0 # count of the next reading to classify
+    try:
+        while not stop.is_set():
+            wake.wait(timeout=0.5)
+            wake.clear()
+            while not stop.is_set():
+                count = int(header["count"][0])
+                if count - read > queue_size:
+                    stats["dropped"] += count - read - queue_size
+                    read = count - queue_size
+                pending = count - read
+                if pending == 0:
+                    break
+                if pending < max_batch:
+                    remaining = float(ring["enqueued"][read % queue_size]) + max_delay_s - time.time()
+                    if remaining > 0:
+                        wake.wait(timeout=remaining)  # more readings may join the batch
+                        wake.clear()
+                        continue
+                n = min(pending, max_batch)
+                seqs = np.arange(read + 1, read + n + 1, dtype=np.uint64)
+                slots = (seqs - 1) % queue_size
+                batch = ring[slots]  # copy
+                # slots overwritten before or while copying are newer readings, picked up by the next batch
+                batch = batch[(batch["seq"] == seqs) & (ring["seq"][slots] == seqs)]
+                read += n
+                if len(batch) < n:
+                    stats["dropped"] += n - len(batch)
+                if len(batch):
+                    _classify(classifier, batch, output, stats)
+    finally:
+        del header, ring, output, stats_arr, stats
+        shm.close()
+
+def _classify(classifier, batch: np.ndarray, output: np.ndarray, stats):
+    probs = classifier.predict_proba(batch["record"])
+    labels = probs.argmax(axis=1)
+    published = time.time()
+    num_classes = probs.shape[1]
+    for i in range(len(batch)):
+        row = output[int(batch["chamber"][i])]
+        row["seq"] += 1
+        row["timestamp"] = batch["record"]["timestamp"][i]
+        row["latency"] = published - batch["enqueued"][i]
+        row["label"] = labels[i]
+        row["confidence"] = probs[i, labels[i]]
+        row["probs"][:num_classes] = probs[i]
+        row["seq"] += 1
+
+    latencies = published - batch["enqueued"]
+    n = int(stats["latency_count"])
+    stats["latencies"][(n + np.arange(len(latencies))) % LATENCY_SAMPLES] = latencies
+    stats["latency_count"] = n + len(latencies)
+    stats["latency_sum"] += latencies.sum()
+    stats["latency_max"] = max(float(stats["latency_max"]), float(latencies.max()))
+    stats["batches"] += 1
+    stats["predictions"] += len(batch)
+    stats["max_batch"] = max(int(stats["max_batch"]), len(batch))
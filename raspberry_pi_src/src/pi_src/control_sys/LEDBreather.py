@@ -13,15 +13,18 @@ Notes:
 import time
 import math
 import threading
-import pigpio
+from typing import Any
 
 from ..config.config_manager import settings
+from .HAL import get_pigpio
 
 
 class LEDBreather:
     """
     Controls a 12 V LED strip with a smooth breathing effect.
 
+    The pigpio module is taken from `pigpio`, or from HAL.get_pigpio() when None.
+
     Usage:
         breather = LEDBreather()
         breather.start()
@@ -34,7 +37,8 @@ class LEDBreather:
                  pwm_freq=None,
                  breathe_period=None,
                  steps=None,
-                 max_duty=None):
+                 max_duty=None,
+                 pigpio: Any = None):
         # Load settings with fallbacks
         # IMPORTANT: LED_strip_pin must be a BCM GPIO number that supports HW PWM
         # (e.g. 13 or 18). The default here is 13.
@@ -53,8 +57,9 @@ class LEDBreather:
         self._stop_event = threading.Event()
         self._thread = None
 
-        # pigpio handle
-        self._pi = pigpio.pi()  # connects to local pigpiod
+        # pigpio style backend (HAL.get_pigpio() when None) and handle
+        self.pigpio = pigpio if pigpio is not None else get_pigpio()
+        self._pi = self.pigpio.pi()  # connects to local pigpiod
         if not self._pi.connected:
             raise RuntimeError(
                 "Cannot connect to pigpio daemon. "
@@ -69,7 +74,7 @@ class LEDBreather:
         on a supported pin (e.g. 13, 18).
         """
         # Ensure pin is set as output (pigpio will also handle mode on hardware_PWM)
-        self._pi.set_mode(self.pin, pigpio.OUTPUT)
+        self._pi.set_mode(self.pin, self.pigpio.OUTPUT)
         # Start with 0% duty (duty argument is 0..1_000_000)
         self._pi.hardware_PWM(self.pin, self.pwm_freq, 0)
 
@@ -81,7 +86,7 @@ class LEDBreather:
         """
         try:
             self._pi.hardware_PWM(self.pin, 0, 0)
-        except pigpio.error:
+        except self.pigpio.error:
             # Ignore errors during cleanup
             pass
 
@@ -0,0 +1,58 @@
+import threading
+
+
+class PressureWatch:
+    """
+    Subscription for a set of chambers crossing a pressure threshold. Registered
+    with `SerialMonitor.watch_pressure`, which feeds it every new `##PRESSURE`
+    value for the watched chambers. Waiters block on `wait` and are only woken
+    when a chamber actually crosses the threshold.
+
+    Parameters:
+        chambers (`list[str]`):
+            Names of the chambers to watch.
+        pressure_lvl (`float`):
+            Threshold in Pa.
+        low_pressure (`bool`):
+            True to wait for pressure to drop below `pressure_lvl`, False to wait for it to rise above.
+    """
+    def __init__(self, chambers: list[str], pressure_lvl: float, low_pressure: bool):
+        self.chambers = list(chambers)
+        self.pressure_lvl = pressure_lvl
+        self.low_pressure = low_pressure
+        self.pending = set(self.chambers)
+        self._met: list[str] = []  # crossed but not yet handed to a waiter
+        self._cond = threading.Condition()
+
+    def crosses(self, pressure: float) -> bool:
+        """Returns True if `pressure` is past the threshold in the watched direction"""
+        if self.low_pressure:
+            return pressure < self.pressure_lvl
+        return pressure > self.pressure_lvl
+
+    def update(self, chamber: str, pressure: float | None):
+        """Feeds a new pressure value for `chamber`, waking waiters if it crossed the threshold"""
+        if pressure is None:
+            return
+        with self._cond:
+            if chamber in self.pending and self.crosses(pressure):
+                self.pending.discard(chamber)
+                self._met.append(chamber)
+                self._cond.notify_all()
+
+    def cancel(self, chamber: str):
+        """Stops watching a chamber without it having met the threshold"""
+        with self._cond:
+            self.pending.discard(chamber)
+            self._cond.notify_all()
+
+    def wait(self, timeout: float | None = None) -> list[str]:
+        """
+        Blocks until at least one chamber crosses the threshold, every chamber is
+        done, or `timeout` seconds pass. Returns the chambers that crossed since
+        the last call.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._met or not self.pending, timeout=timeout)
+            met, self._met = self._met, []
+            return met
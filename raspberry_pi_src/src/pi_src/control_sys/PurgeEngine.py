@@ -0,0 +1,84 @@
+import threading
+from typing import Callable
+
+from .DiscordAlerts import send_discord_alert_webhook
+
+
+class PurgeEngine:
+    """
+    Runs purges for batches of chamber groups on their own threads so purges of
+    different batches overlap instead of queueing behind each other.
+
+    Each purge cycle is a vacuum phase followed by a gas fill phase. The
+    `ControlSystem` guards the phases with `vacuum_lock` (the single vacuum pump
+    and its manifold) and `gas_lock` (the gas supply manifold), so at most one
+    batch pumps down and one batch fills at a time, but batch B can pump down
+    while batch A is filling. Locks are released between phases and cycles so
+    the phases of concurrent batches interleave.
+
+    Parameters:
+        control_system (`ControlSystem`):
+            Provides the chambers of each group and the purge phases.
+        cycles (`int`):
+            Purge cycles run per batch.
+    """
+    def __init__(self, control_system, cycles: int = 2):
+        self.control_system = control_system
+        self.cycles = cycles
+        self.lock = threading.Lock()
+        # thread -> groups it is purging
+        self._active: dict[threading.Thread, list[str]] = {}
+        self._idle = threading.Condition(self.lock)
+        self._stop_event = threading.Event()
+
+    @property
+    def active_groups(self) -> list[str]:
+        """Groups with a purge in progress"""
+        with self.lock:
+            return [group for groups in self._active.values() for group in groups]
+
+    def submit(self, groups: list[str], on_done: Callable[[list[str], bool], None] | None = None) -> threading.Thread:
+        """
+        Starts purging the chambers of `groups` together on a new thread and returns it.
+        `on_done(groups, ok)` is called from that thread once the purge finishes (ok True)
+        or fails (ok False).
+        """
+        thread = threading.Thread(target=self._run, args=(list(groups), on_done),
+                                  name=f"purge-{'+'.join(groups)}",
+                                  daemon=False)  # non-daemon so shut down can join it
+        with self.lock:
+            self._active[thread] = list(groups)
+        thread.start()
+        return thread
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        """Blocks until no purge is running, returns False if `timeout` passed first"""
+        with self._idle:
+            return self._idle.wait_for(lambda: not self._active, timeout=timeout)
+
+    def stop(self, join_timeout: float | None = None) -> bool:
+        """Lets running purges finish their current cycle, skips remaining cycles, and waits for them"""
+        self._stop_event.set()
+        return self.wait_idle(timeout=join_timeout)
+
+    def _run(self, groups: list[str], on_done):
+        cs = self.control_system
+        chambers = [c for group in groups for c in cs.group_chambers.get(group, [])]
+        ok = False
+        try:
+            for _ in range(self.cycles):
+                if self._stop_event.is_set():
+                    break
+                cs.purge_chambers(chambers=chambers)
+            ok = True
+        except Exception as e:
+            for chamber in chambers:
+                send_discord_alert_webhook(chamber.chamber_slot, f"Purge failed: {type(e).__name__}: {e}")
+        finally:
+            try:
+                if on_done is not None:
+                    on_done(groups, ok)
+            finally:
+                with self._idle:
+                    self._active.pop(threading.current_thread(), None)
+                    self._idle.notify_all()
@@ -0,0 +1,125 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class PurgeScheduler:
+    """
+    Min-heap of chamber groups keyed on the time their next purge is due.
+
+    Rescheduling a group pushes a new heap entry and leaves the old one in place;
+    entries whose due time no longer matches `_due` are skipped when they reach
+    the top, so every operation stays O(log n) in the number of groups.
+
+    Groups returned by `pop_due` are in flight until `finish` is called for
+    them. `schedule` leaves in-flight groups alone, so a config change made
+    while a group is being purged cannot queue a second purge of it; the group
+    is rescheduled from the current settings once its purge finishes.
+
+    Parameters:
+        coalesce_window (`float`):
+            Groups due within this many seconds of the first due group are
+            returned together so they can share one vacuum cycle.
+    """
+    def __init__(self, coalesce_window: float = 0.0):
+        self.coalesce_window = coalesce_window
+        self._heap: list[tuple[float, int, str]] = []
+        # group -> due time of its live heap entry
+        self._due: dict[str, float] = {}
+        # groups popped by pop_due whose purge has not finished yet
+        self._in_flight: set[str] = set()
+        self._counter = itertools.count()  # tie breaker so groups are never compared
+        self._cond = threading.Condition()
+
+    def __len__(self) -> int:
+        return len(self._due)
+
+    def __contains__(self, group: str) -> bool:
+        return group in self._due
+
+    def schedule(self, group: str, due: float) -> bool:
+        """
+        Sets (or moves) the time the group's next purge is due and wakes any waiter.
+        Returns False, without scheduling it, if the group is in flight.
+        """
+        with self._cond:
+            if group in self._in_flight:
+                return False
+            self._due[group] = due
+            heapq.heappush(self._heap, (due, next(self._counter), group))
+            self._cond.notify_all()
+            return True
+
+    def finish(self, group: str):
+        """Marks the purge of a group returned by `pop_due` as finished so it can be scheduled again"""
+        with self._cond:
+            self._in_flight.discard(group)
+
+    def in_flight(self, group: str) -> bool:
+        with self._cond:
+            return group in self._in_flight
+
+    def remove(self, group: str):
+        """Stops scheduling purges for the group"""
+        with self._cond:
+            self._due.pop(group, None)
+            self._cond.notify_all()
+
+    def notify(self):
+        """Wakes a waiter so it re-checks the schedule, ex: after a config change"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def next_due(self) -> tuple[float, str] | None:
+        """Returns (due time, group) for the next purge, or None if nothing is scheduled"""
+        with self._cond:
+            return self._peek()
+
+    def pop_due(self, now: float | None = None) -> list[str]:
+        """
+        Removes and returns every group due by `now`, plus groups due within
+        `coalesce_window` seconds after it. Empty if no group is due yet. The
+        returned groups are in flight until `finish` is called for them.
+        """
+        now = now if now is not None else time.time()
+        with self._cond:
+            top = self._peek()
+            if top is None or top[0] > now:
+                return []
+            cutoff = now + self.coalesce_window
+            groups = []
+            while (top := self._peek()) is not None and top[0] <= cutoff:
+                heapq.heappop(self._heap)
+                del self._due[top[1]]
+                self._in_flight.add(top[1])
+                groups.append(top[1])
+            return groups
+
+    def wait_for_due(self, stop_event: threading.Event | None = None) -> list[str]:
+        """
+        Blocks until at least one group is due and returns the due (coalesced) groups.
+        Wakes early on `schedule`, `remove`, and `notify` so schedule changes take
+        effect immediately. Returns an empty list if `stop_event` is set.
+        """
+        with self._cond:
+            while stop_event is None or not stop_event.is_set():
+                groups = self.pop_due()
+                if groups:
+                    return groups
+                top = self._peek()
+                timeout = None if top is None else max(0.0, top[0] - time.time())
+                if stop_event is not None:
+                    # re-check the stop flag at least once a second
+                    timeout = 1.0 if timeout is None else min(timeout, 1.0)
+                self._cond.wait(timeout=timeout)
+            return []
+
+    def _peek(self) -> tuple[float, str] | None:
+        # caller must hold self._cond, discards stale entries left by rescheduling
+        while self._heap:
+            due, _, group = self._heap[0]
+            if self._due.get(group) == due:
+                return due, group
+            heapq.heappop(self._heap)
+        return None
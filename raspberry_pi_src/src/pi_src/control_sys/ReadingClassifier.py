@@ -0,0 +1,109 @@
+"""
+ReadingClassifier.py
+
+NumPy-only runtime for the `NeuralNet` trained in ML_model/Neural_Net.py, so the
+Pi can classify readings without importing torch, pandas, or sklearn.
+
+Model file: a `.npz` holding the weights and biases of each linear layer
+(`l1_weight`, `l1_bias`, ... in torch's (out, in) layout, ReLU between layers),
+the fitted StandardScaler (`scaler_mean`, `scaler_scale`), the `READING_FIELDS`
+used as inputs in order (`feature_names`) and the class of each output
+(`class_names`). Written by ML_model/model_export.py.
+
+Weights may be stored as float16, or as int8 with a float32 scale per output row
+(`l1_weight_scale`, ...). They are dequantized to float32 on load, the network
+always runs in float32.
+"""
+import numpy as np
+
+from .SerialMessages import READING_FIELDS
+
+FORMAT_VERSION = 1
+# classes in the order of the network outputs, label_mapping in Neural_Net.py
+DEFAULT_CLASS_NAMES = ["AIR", "LIGHT", "MEDIUM", "DARK"]
+
+
+class ReadingClassifier:
+    """
+    Scales readings and runs them through the exported network.
+
+    Parameters:
+        layers (`list[tuple[np.ndarray, np.ndarray]]`):
+            (weight, bias) of each linear layer, weight in torch's (out, in) layout.
+        scaler_mean (`np.ndarray`):
+            Mean of each feature in the training data.
+        scaler_scale (`np.ndarray`):
+            Standard deviation of each feature in the training data.
+        feature_names (`list[str]`):
+            `READING_FIELDS` fed to the network, in order.
+        class_names (`list[str]`):
+            Class of each network output.
+    """
+    def __init__(self, layers: list[tuple[np.ndarray, np.ndarray]], scaler_mean: np.ndarray,
+                 scaler_scale: np.ndarray, feature_names: list[str], class_names: list[str] | None = None):
+        unknown = [name for name in feature_names if name not in READING_FIELDS]
+        if unknown:
+            raise ValueError(f"Model inputs {unknown} are not reading fields")
+        if len(feature_names) != layers[0][0].shape[1]:
+            raise ValueError(f"Model takes {layers[0][0].shape[1]} inputs but {len(feature_names)} feature names were given")
+        self.feature_names = list(feature_names)
+        self.class_names = list(class_names or DEFAULT_CLASS_NAMES[:layers[-1][0].shape[0]])
+        # (in, out) so a batch is x @ weight, contiguous for the matmul
+        self.layers = [(np.ascontiguousarray(w.T, dtype=np.float32), np.asarray(b, dtype=np.float32)) for w, b in layers]
+        # scaling folded into one multiply-add
+        self.scale = (1.0 / np.asarray(scaler_scale, dtype=np.float32)).astype(np.float32)
+        self.offset = (-np.asarray(scaler_mean, dtype=np.float32) * self.scale).astype(np.float32)
+
+    @classmethod
+    def load(cls, path: str) -> "ReadingClassifier":
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data["format_version"]) if "format_version" in data else FORMAT_VERSION
+            if version != FORMAT_VERSION:
+                raise ValueError(f"{path} is a version {version} model, expected version {FORMAT_VERSION}")
+            layers = []
+            while f"l{len(layers) + 1}_weight" in data:
+                i = len(layers) + 1
+                weight = data[f"l{i}_weight"]
+                if weight.dtype == np.int8:
+                    weight = weight.astype(np.float32) * data[f"l{i}_weight_scale"][:, None]
+                layers.append((weight, data[f"l{i}_bias"]))
+            if not layers:
+                raise ValueError(f"{path} has no layer weights")
+            return cls(layers, data["scaler_mean"], data["scaler_scale"],
+                       [str(n) for n in data["feature_names"]], [str(n) for n in data["class_names"]])
+
+    @property
+    def num_classes(self) -> int:
+        return len(self.class_names)
+
+    def features(self, records: np.ndarray) -> np.ndarray:
+        """Unscaled (n, features) float32 inputs for a `READING_DTYPE` array"""
+        out = np.empty((len(records), len(self.feature_names)), dtype=np.float32)
+        for i, name in enumerate(self.feature_names):
+            out[:, i] = records[name]
+        return out
+
+    def forward(self, x: np.ndarray) -> np.ndarray:
+        """Logits for a batch of unscaled (n, features) inputs"""
+        out = x * self.scale + self.offset
+        last = len(self.layers) - 1
+        for i, (weight, bias) in enumerate(self.layers):
+            out = out @ weight
+            out += bias
+            if i != last:
+                np.maximum(out, 0, out=out)
+        return out
+
+    def predict_proba(self, records: np.ndarray) -> np.ndarray:
+        """Softmax class probabilities, (n, classes), for a `READING_DTYPE` array"""
+        logits = self.forward(self.features(records))
+        logits -= logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+
+    def predict(self, records: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Index of the predicted class and its probability for each record"""
+        probs = self.predict_proba(records)
+        labels = probs.argmax(axis=1)
+        return labels, probs[np.arange(len(labels)), labels]
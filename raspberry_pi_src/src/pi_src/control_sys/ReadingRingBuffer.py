@@ -0,0 +1,149 @@
+"""
+ReadingRingBuffer.py
+
+Fixed size ring buffer holding the last N `READING_DTYPE` records for a chamber.
+
+When given a path the buffer lives in a memory-mapped file, so another process
+(a dashboard, an inference worker) can open the same file with
+`ReadingRingBuffer.open_reader` and read the newest readings without copying
+them through the control loop or re-reading CSV files.
+
+File layout: a 64 byte header (`HEADER_DTYPE`) followed by `capacity` records.
+The writer bumps `seq` to an odd value before touching a record and back to an
+even value afterwards, readers retry when they see an odd or changed `seq`.
+
+Reopening an existing file with the same capacity resumes it, so the recent
+history survives a restart. A file that doesn't match is replaced by a new one
+(renamed over it, readers still mapped to the old file keep their data).
+"""
+import os
+import numpy as np
+
+from .SerialMessages import READING_DTYPE
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "<u4"),
+    ("version", "<u4"),
+    ("capacity", "<u8"),
+    ("seq", "<u8"),      # odd while a write is in progress
+    ("count", "<u8"),    # total records ever written, next slot is count % capacity
+    ("_pad", "V32"),
+])
+HEADER_SIZE = HEADER_DTYPE.itemsize
+MAGIC = 0x52444E47  # "RDNG"
+VERSION = 1
+
+
+class ReadingRingBuffer:
+    """
+    Ring buffer of the most recent readings for one chamber.
+
+    Parameters:
+        capacity (`int`):
+            Number of readings kept.
+        path (`str | None`):
+            File to back the buffer with, resumed if it already holds a buffer of
+            the same capacity. Kept in process memory when None.
+    """
+    def __init__(self, capacity: int = 1024, path: str | None = None):
+        if capacity < 1:
+            raise ValueError("Ring buffer capacity must be at least 1")
+        self.path = path
+        self.readonly = False
+
+        if path is None:
+            self._header = np.zeros(1, dtype=HEADER_DTYPE)
+            self._records = np.zeros(capacity, dtype=READING_DTYPE)
+        else:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            size = HEADER_SIZE + capacity * READING_DTYPE.itemsize
+            resumed = self._can_resume(path, capacity, size)
+            if not resumed:
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.truncate(size)
+                os.replace(tmp_path, path)
+            self._header = np.memmap(path, dtype=HEADER_DTYPE, mode="r+", shape=(1,))
+            self._records = np.memmap(path, dtype=READING_DTYPE, mode="r+",
+                                      offset=HEADER_SIZE, shape=(capacity,))
+            if resumed:
+                if int(self._header["seq"][0]) % 2:
+                    self._header["seq"] += 1  # the last writer died mid append
+                return
+        self._header["magic"] = MAGIC
+        self._header["version"] = VERSION
+        self._header["capacity"] = capacity
+
+    @staticmethod
+    def _can_resume(path: str, capacity: int, size: int) -> bool:
+        """True if `path` holds a ring buffer of this version and capacity"""
+        try:
+            if os.path.getsize(path) != size:
+                return False
+            header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        except OSError:
+            return False
+        return (len(header) == 1 and int(header["magic"][0]) == MAGIC
+                and int(header["version"][0]) == VERSION and int(header["capacity"][0]) == capacity)
+
+    @classmethod
+    def open_reader(cls, path: str) -> "ReadingRingBuffer":
+        """Opens a ring buffer file written by another process in read-only mode"""
+        header = np.memmap(path, dtype=HEADER_DTYPE, mode="r", shape=(1,))
+        if int(header["magic"][0]) != MAGIC or int(header["version"][0]) != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} reading ring buffer")
+        capacity = int(header["capacity"][0])
+
+        buf = cls.__new__(cls)
+        buf.path = path
+        buf.readonly = True
+        buf._header = header
+        buf._records = np.memmap(path, dtype=READING_DTYPE, mode="r",
+                                 offset=HEADER_SIZE, shape=(capacity,))
+        return buf
+
+    @property
+    def capacity(self) -> int:
+        return len(self._records)
+
+    def __len__(self) -> int:
+        """Number of readings currently held"""
+        return min(int(self._header["count"][0]), self.capacity)
+
+    def append(self, record: np.ndarray):
+        """Adds a `READING_DTYPE` record, overwriting the oldest one once the buffer is full"""
+        if self.readonly:
+            raise RuntimeError("Cannot append to a read-only ring buffer")
+        count = int(self._header["count"][0])
+        self._header["seq"] += 1
+        self._records[count % self.capacity] = record
+        self._header["count"] = count + 1
+        self._header["seq"] += 1
+
+    def latest(self, n: int | None = None, retries: int = 10) -> np.ndarray:
+        """
+        Returns a copy of the newest `n` readings (all held readings when None),
+        oldest first.
+        """
+        for _ in range(retries):
+            seq = int(self._header["seq"][0])
+            if seq % 2:
+                continue
+            count = int(self._header["count"][0])
+            held = min(count, self.capacity)
+            n = held if n is None else min(n, held)
+            idx = (np.arange(count - n, count) % self.capacity) if n else np.zeros(0, dtype=np.int64)
+            out = self._records[idx].copy()
+            if int(self._header["seq"][0]) == seq:
+                return out
+        raise RuntimeError("Ring buffer kept changing while being read")
+
+    def column(self, field: str, n: int | None = None) -> np.ndarray:
+        """Returns the newest `n` values of one field, ex: `column("pressure", 60)`"""
+        return self.latest(n)[field]
+
+    def flush(self):
+        """Pushes a file backed buffer out to disk"""
+        if isinstance(self._records, np.memmap) and not self.readonly:
+            self._header.flush()
+            self._records.flush()
@@ -0,0 +1,194 @@
+"""
+ReadingStore.py
+
+Pluggable storage backends for `##READING` messages.
+
+- `CSVReadingStore` appends text rows through a `CSVWriterPool`, the original format.
+- `BinaryReadingStore` appends fixed size typed records (`READING_DTYPE`) to one
+  file per chamber per UTC day. Files have no header, so they can be loaded with
+  `numpy.fromfile` or `numpy.memmap` and concatenated without parsing.
+
+`convert_csv` / `main` convert existing chamber CSVs into the binary format.
+"""
+import argparse
+import csv
+import os
+import time
+import numpy as np
+
+from ..config.config_manager import settings
+from .BatchedWriter import BatchedWriter
+from .CSVWriterPool import CSVWriterPool
+from .SerialMessages import READING_DTYPE, ReadingMessage, split_fields, values_to_record
+
+
+def load_readings(path: str, mmap: bool = False) -> np.ndarray:
+    """
+    Loads a binary reading file as a structured array. A trailing partial record
+    (left by a power loss mid write) is ignored.
+    """
+    n = os.path.getsize(path) // READING_DTYPE.itemsize
+    if mmap:
+        if n == 0:
+            return np.zeros(0, dtype=READING_DTYPE)
+        return np.memmap(path, dtype=READING_DTYPE, mode='r', shape=(n,))
+    return np.fromfile(path, dtype=READING_DTYPE, count=n)
+
+
+def load_chamber(data_dir: str, chamber: str) -> np.ndarray:
+    """Loads and concatenates every day of binary readings for a chamber, oldest first"""
+    prefix = f"chamber_{chamber}_"
+    files = sorted(f for f in os.listdir(data_dir)
+                   if f.startswith(prefix) and f.endswith(BinaryReadingStore.SUFFIX)
+                   and len(f) == len(prefix) + len("YYYY-MM-DD") + len(BinaryReadingStore.SUFFIX))
+    if not files:
+        return np.zeros(0, dtype=READING_DTYPE)
+    return np.concatenate([load_readings(os.path.join(data_dir, f)) for f in files])
+
+
+class ReadingStore:
+    """Interface for a sink that ##READING messages are persisted to"""
+    def append(self, reading: ReadingMessage):
+        """Stores one parsed reading"""
+        raise NotImplementedError
+
+    def flush(self, fsync: bool = False):
+        """Writes any buffered readings to disk"""
+        pass
+
+    def close(self, join_timeout: float = 3.0):
+        """Flushes, fsyncs, and releases any open files"""
+        pass
+
+
+class CSVReadingStore(ReadingStore):
+    """Stores readings as `timestamp, chamber, values...` text rows, one CSV per chamber"""
+    def __init__(self, writer_pool: CSVWriterPool | None = None):
+        self.writer_pool = writer_pool if writer_pool is not None else CSVWriterPool()
+
+    def append(self, reading: ReadingMessage):
+        # values are written as received so the text isn't re-formatted
+        self.writer_pool.write_row(reading.chamber, [str(int(reading.timestamp)), reading.chamber, *reading.raw_values])
+
+    def flush(self, fsync: bool = False):
+        self.writer_pool.flush(fsync=fsync)
+
+    def close(self, join_timeout: float = 3.0):
+        self.writer_pool.close(join_timeout=join_timeout)
+
+
+class BinaryReadingStore(BatchedWriter, ReadingStore):
+    """
+    Stores readings as `READING_DTYPE` records in `<data_dir>/chamber_<name>_<YYYY-MM-DD>.bin`.
+    Records are buffered per chamber and appended in chunks of `flush_rows`
+    (`binary_flush_rows`), or after `flush_interval` seconds (`binary_flush_interval_s`),
+    whichever comes first (see `BatchedWriter`).
+    """
+    SUFFIX = ".bin"
+    DATA_NAME = "binary chamber data"
+
+    def __init__(self,
+                 data_dir=None,
+                 flush_rows=None,
+                 flush_interval=None):
+        super().__init__(data_dir if data_dir is not None else os.path.join(settings.get("data_dir", "data"), "binary"),
+                         flush_rows if flush_rows is not None else settings.get("binary_flush_rows", 32),
+                         flush_interval if flush_interval is not None else settings.get("binary_flush_interval_s", 5.0))
+        # chamber name -> (day, open file handle) for the day currently being written
+        self._files = {}
+
+    def file_path(self, chamber: str, day: str) -> str:
+        """Returns the path readings for `chamber` on `day` (YYYY-MM-DD, UTC) are appended to"""
+        return os.path.join(self.data_dir, f"chamber_{chamber}_{day}{self.SUFFIX}")
+
+    def append(self, reading: ReadingMessage):
+        self.append_record(reading.chamber, reading.record)
+
+    def append_record(self, chamber: str, record: np.ndarray):
+        """Stores an already converted `READING_DTYPE` record (or array of records)"""
+        self._append(chamber, record)
+
+    def _write_rows(self, chamber: str, rows: list[np.ndarray]):
+        # caller must hold self._io_lock
+        records = np.concatenate(rows)
+        days = np.array([time.strftime("%Y-%m-%d", time.gmtime(ts)) for ts in records["timestamp"]])
+        for day in dict.fromkeys(days):  # keeps arrival order of days
+            self._file_for(chamber, day).write(records[days == day].tobytes())
+        self._files[chamber][1].flush()
+
+    def _file_for(self, chamber: str, day: str):
+        # caller must hold self._io_lock
+        current = self._files.get(chamber)
+        if current is not None and current[0] == day:
+            return current[1]
+        if current is not None:
+            current[1].close()
+        os.makedirs(self.data_dir, exist_ok=True)
+        f = open(self.file_path(chamber, day), mode='ab')
+        self._files[chamber] = (day, f)
+        return f
+
+    def _open_files(self) -> list:
+        return [(chamber, f) for chamber, (_, f) in self._files.items()]
+
+    def _forget_files(self):
+        self._files.clear()
+
+
+def create_reading_stores(backends: list[str], csv_writer: CSVWriterPool | None = None) -> list[ReadingStore]:
+    """
+    Builds the reading stores named in `backends` ("csv" and/or "binary").
+    `csv_writer` is reused by the csv backend when given.
+    """
+    stores: list[ReadingStore] = []
+    for backend in backends:
+        match backend:
+            case "csv":
+                stores.append(CSVReadingStore(writer_pool=csv_writer))
+            case "binary":
+                stores.append(BinaryReadingStore())
+            case _:
+                raise ValueError(f"Unknown reading storage backend \"{backend}\"")
+    return stores
+
+
+def convert_csv(csv_path: str, out_dir: str) -> int:
+    """
+    Converts a chamber CSV written by `CSVReadingStore` into binary day files in
+    `out_dir`. Rows that do not parse are skipped. Returns the number of rows converted.
+    """
+    store = BinaryReadingStore(data_dir=out_dir, flush_rows=4096, flush_interval=60)
+    converted = skipped = 0
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            # rows logged before the firmware fields were split on commas hold
+            # two readings in one (quoted) column, re-tokenize like a serial line
+            row = split_fields(",".join(row))
+            if len(row) < 2:
+                continue
+            try:
+                store.append_record(row[1], values_to_record(float(row[0]), row[2:]))
+                converted += 1
+            except ValueError:
+                skipped += 1
+    store.close()
+    if skipped:
+        print(f"Skipped {skipped} malformed row(s) in {csv_path}")
+    return converted
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Convert chamber reading CSVs to the binary reading format")
+    parser.add_argument("csv_files", nargs="+", help="chamber_<name>_readings.csv files to convert")
+    parser.add_argument("-o", "--out-dir", default=os.path.join("data", "binary"),
+                        help="directory the binary day files are written to")
+    args = parser.parse_args()
+
+    for path in args.csv_files:
+        n = convert_csv(path, args.out_dir)
+        print(f"Converted {n} row(s) from {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,137 @@
+"""
+SerialMessages.py
+
+Typed records for the messages chambers send over serial. Each line is split,
+converted, and validated once by `parse_message`, and the resulting object is
+shared by everything downstream (pressure waiting, storage, history, alerts).
+
+Message formats (see src/main.cc):
+    ##READING, <chamber>, <22 sensor values>
+    ##PRESSURE, <chamber>, <pressure in Pa>
+    ##ALERT, <chamber>, <alert text>
+"""
+import math
+import numpy as np
+
+# Values sent in a ##READING message after the chamber name, in order
+READING_FIELDS = [
+    "co2_ppm", "temperature", "humidity",                     # SCD41
+    *[f"gas_res_{i}" for i in range(8)], "pressure",          # BME688
+    *[f"light_{i}" for i in range(10)],                       # AS7341
+]
+_INT_FIELDS = {"co2_ppm", *[f"light_{i}" for i in range(10)]}
+_IS_INT = [name in _INT_FIELDS for name in READING_FIELDS]
+
+# One stored reading. Little endian so files move between the Pi and a desktop unchanged.
+READING_DTYPE = np.dtype(
+    [("timestamp", "<i8")]
+    + [(name, "<i4" if name in _INT_FIELDS else "<f4") for name in READING_FIELDS]
+)
+
+
+def split_fields(line: str, maxsplit: int = -1) -> list[str]:
+    """
+    Splits a serial line or CSV row on commas and strips the whitespace around each
+    field. The firmware's ##READING printf is two joined literals and has no space
+    after one of its commas, so splitting on ", " is not enough.
+    """
+    return [field.strip() for field in line.split(",", maxsplit)]
+
+
+class MalformedMessageError(ValueError):
+    """Raised when a serial line has a known message type but cannot be parsed"""
+    def __init__(self, msg_type: str, reason: str):
+        super().__init__(f"Malformed {msg_type} message: {reason}")
+        self.msg_type = msg_type
+
+
+def values_to_record(timestamp: float, values: list) -> np.ndarray:
+    """
+    Converts a timestamp and the ##READING values into a single `READING_DTYPE` record.
+    Raises ValueError if the wrong number of values is given or a value is not numeric.
+    """
+    if len(values) != len(READING_FIELDS):
+        raise ValueError(f"Expected {len(READING_FIELDS)} reading values, got {len(values)}")
+    converted = tuple(int(float(v)) if is_int else float(v) for v, is_int in zip(values, _IS_INT))
+    return np.array([(int(timestamp), *converted)], dtype=READING_DTYPE)
+
+
+class PressureMessage:
+    """A `##PRESSURE` message"""
+    __slots__ = ("chamber", "timestamp", "port", "pressure")
+
+    def __init__(self, chamber: str, timestamp: float, port: str | None, pressure: float):
+        self.chamber = chamber
+        self.timestamp = timestamp
+        self.port = port
+        self.pressure = pressure
+
+
+class ReadingMessage:
+    """
+    A `##READING` message. `record` is the converted `READING_DTYPE` record,
+    `raw_values` keeps the values as sent for text storage.
+    """
+    __slots__ = ("chamber", "timestamp", "port", "record", "raw_values")
+
+    def __init__(self, chamber: str, timestamp: float, port: str | None, record: np.ndarray, raw_values: list[str]):
+        self.chamber = chamber
+        self.timestamp = timestamp
+        self.port = port
+        self.record = record
+        self.raw_values = raw_values
+
+    def __getitem__(self, field: str):
+        """Returns a single sensor value, ex: `reading["co2_ppm"]`"""
+        return self.record[field][0].item()
+
+
+class AlertMessage:
+    """A `##ALERT` message"""
+    __slots__ = ("chamber", "timestamp", "port", "text")
+
+    def __init__(self, chamber: str, timestamp: float, port: str | None, text: str):
+        self.chamber = chamber
+        self.timestamp = timestamp
+        self.port = port
+        self.text = text
+
+
+SerialMessage = PressureMessage | ReadingMessage | AlertMessage
+
+
+def parse_message(line: str, timestamp: float, port: str | None = None) -> SerialMessage | None:
+    """
+    Parses a line received over serial. Returns None for lines that are not
+    chamber messages (debug output etc.) and raises `MalformedMessageError` for
+    chamber messages that can't be parsed.
+    """
+    if not line.startswith("##"):
+        return None
+    msg_type = line.split(",", 1)[0].strip()
+    if msg_type not in ("##READING", "##PRESSURE", "##ALERT"):
+        return None
+    # alert text may contain commas, keep it whole
+    col = split_fields(line, 2 if msg_type == "##ALERT" else -1)
+    if len(col) < 3 or not col[1]:
+        raise MalformedMessageError(msg_type, "missing chamber name or value")
+    chamber = col[1]
+
+    match msg_type:
+        case "##PRESSURE":
+            try:
+                pressure = float(col[2])
+            except ValueError:
+                raise MalformedMessageError(msg_type, f"pressure \"{col[2]}\" is not a number")
+            if not math.isfinite(pressure):
+                raise MalformedMessageError(msg_type, f"pressure \"{col[2]}\" is not finite")
+            return PressureMessage(chamber, timestamp, port, pressure)
+        case "##READING":
+            raw_values = col[2:]
+            try:
+                record = values_to_record(timestamp, raw_values)
+            except ValueError as e:
+                raise MalformedMessageError(msg_type, str(e))
+            return ReadingMessage(chamber, timestamp, port, record, raw_values)
+        case _:
+            return AlertMessage(chamber, timestamp, port, col[2])
@@ -1,33 +1,94 @@
+import os
 import serial
 import threading
 import time
-import csv
+import numpy as np
+from queue import Queue, Empty, Full
 from serial.tools import list_ports
 from ..config.config_manager import settings
 from .DiscordAlerts import send_discord_alert_webhook
+from .CSVWriterPool import CSVWriterPool
+from .ChamberRoutes import ChamberRoutes
+from .ReadingStore import create_reading_stores
+from .SerialMessages import (READING_DTYPE, AlertMessage, MalformedMessageError, PressureMessage,
+                             ReadingMessage, parse_message)
+from .ReadingRingBuffer import ReadingRingBuffer
+from .PressureWatch import PressureWatch
+from .InferenceService import InferenceService
 
 
 class SerialMonitor:
     """
     Monitors all serial ports and stores sensor data messages in their
     designated csv files
+
+    Reading and parsing are split into two stages. Per-port reader threads only
+    decode lines and push them, timestamped, onto a bounded queue. Parse worker
+    threads pull from that queue to update readings, write data, and send alerts,
+    so slow downstream work never holds up `readline()`.
     """
     def __init__(self,
                  baud_rate=None,
                  print_msgs=False,
-                 save_data=True):
+                 save_data=True,
+                 ports: list[str] | None = None):
 
         self.baud_rate = baud_rate or settings.get("serial_monitor_baud_rate", 115200)
         self.print_msgs = print_msgs
         self.save_data = save_data
+        # fixed list of devices to listen on (ex: pty pairs), scans for ports when None
+        self.ports = ports
 
         # port_name -> Thread
         self.active_ports = {}
+        # port_name -> open serial.Serial held by a reader, reused for writes
+        self.connections: dict[str, serial.Serial] = {}
+        # port_name -> Lock serializing writes to that port
+        self.write_locks: dict[str, threading.Lock] = {}
+        # chamber name -> port and last seen time, learned from incoming messages
+        self.routes = ChamberRoutes()
         self.lock = threading.Lock()
         self.running = False
+        # chamber name -> latest values of each message type, for chambers added by the control system:
+        #   "pressure": float, the last ##PRESSURE value in Pa (was the value as text before the typed parser)
+        #   "reading":  str, the last ##READING line as received
+        #   "message":  ReadingMessage, the same reading converted, ex: last_readings[name]["message"]["co2_ppm"]
+        #   "alert":    str, the text of the last ##ALERT
         self.last_readings = {}
         self.monitor_thread = None
         self.ignore_next_reading = {}
+        # chamber name -> pressure watches waiting on that chamber
+        self.pressure_watches: dict[str, list[PressureWatch]] = {}
+        # long lived per-chamber csv handles, rows are buffered and flushed in batches
+        self.csv_writer = CSVWriterPool()
+        # every backend ##READING messages are persisted to ("csv" and/or "binary")
+        self.reading_stores = create_reading_stores(settings.get("reading_storage", ["csv"]),
+                                                    csv_writer=self.csv_writer)
+        # chamber name -> ring buffer of the most recent numeric readings
+        self.recent_readings: dict[str, ReadingRingBuffer] = {}
+        self.ring_buffer_size = settings.get("ring_buffer_size", 1024)
+        # directory for memory-mapped ring buffer files other processes can read, in memory when None
+        self.ring_buffer_dir = settings.get("ring_buffer_dir", None)
+        # classifies readings in a separate process when an exported model is configured
+        self.inference = None
+        if settings.get("inference_model_path", None):
+            try:
+                self.inference = InferenceService()
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Inference disabled, could not load model {settings.get('inference_model_path')}: {e}")
+
+        # (timestamp, port_name, line) tuples waiting to be parsed
+        self.line_queue: Queue = Queue(maxsize=settings.get("serial_queue_size", 4096))
+        # more than one worker can reorder lines from the same chamber
+        self.num_parse_workers = settings.get("serial_parse_workers", 1)
+        self.parse_threads: list[threading.Thread] = []
+        self.stats_lock = threading.Lock()
+        self.received_lines = 0
+        self.parsed_lines = 0
+        self.dropped_lines = 0
+        self.max_queue_depth = 0
+        # message type -> number of lines of that type that failed to parse
+        self.malformed_lines: dict[str, int] = {}
 
     def read_from_port(self, port_name):
         ser = None
@@ -40,6 +101,7 @@ class SerialMonitor:
                 self.active_ports.pop(port_name, None)
             return
 
+        self._register_connection(port_name, ser)
         try:
             print(f"Started listening on {port_name}")
             # Clear any stale data in the buffer
@@ -61,11 +123,12 @@ class SerialMonitor:
                 except Exception:
                     continue
                 if line:
-                    self.parse_serial_msg(line)
-                    
+                    self._enqueue_line(port_name, line)
+
         except Exception as e:
             print(f"Error on {port_name}: {e}")
         finally:
+            self._unregister_connection(port_name)
             try:
                 if ser is not None and ser.is_open:
                     ser.close()
@@ -75,58 +138,218 @@ class SerialMonitor:
                 self.active_ports.pop(port_name, None)
             print(f"Stopped listening on {port_name}")
 
-    def parse_serial_msg(self, data: str):
-        if self.print_msgs or True:
+    def _register_connection(self, port_name: str, ser: serial.Serial):
+        """Makes an open reader handle available for outgoing messages"""
+        with self.lock:
+            self.connections[port_name] = ser
+            self.write_locks.setdefault(port_name, threading.Lock())
+
+    def _unregister_connection(self, port_name: str):
+        with self.lock:
+            self.connections.pop(port_name, None)
+            # under self.lock so a parse worker can't re-add a route between the two
+            dropped = self.routes.drop_port(port_name)
+        if dropped and settings.debug:
+            print(f"Lost route to chamber(s) {dropped} on {port_name}")
+
+    def _enqueue_line(self, port_name: str, line: str):
+        """Hands a line off to the parse workers, dropping it if the queue is full"""
+        try:
+            self.line_queue.put_nowait((time.time(), port_name, line))
+        except Full:
+            with self.stats_lock:
+                self.dropped_lines += 1
+                dropped = self.dropped_lines
+            if settings.debug:
+                print(f"Serial line queue full, dropped line from {port_name} ({dropped} dropped total)")
+            return
+        depth = self.line_queue.qsize()
+        with self.stats_lock:
+            self.received_lines += 1
+            if depth > self.max_queue_depth:
+                self.max_queue_depth = depth
+
+    def _parse_worker(self):
+        while True:
+            try:
+                item = self.line_queue.get(timeout=0.1)
+            except Empty:
+                continue
+            if item is None:  # stop sentinel, queued once per worker by stop_monitoring
+                break
+            timestamp, port_name, line = item
+            try:
+                self.parse_serial_msg(line, timestamp=timestamp, port_name=port_name)
+            except Exception as e:
+                print(f"Error parsing serial message \"{line}\": {e}")
+            with self.stats_lock:
+                self.parsed_lines += 1
+
+    def get_ingest_stats(self) -> dict:
+        """Returns counters describing the state of the serial ingestion pipeline"""
+        with self.stats_lock:
+            return {
+                "queue_depth": self.line_queue.qsize(),
+                "max_queue_depth": self.max_queue_depth,
+                "received_lines": self.received_lines,
+                "parsed_lines": self.parsed_lines,
+                "dropped_lines": self.dropped_lines,
+                "malformed_lines": dict(self.malformed_lines),
+                "inference": self.inference.get_stats() if self.inference is not None else None,
+            }
+
+    def parse_serial_msg(self, data: str, timestamp: float | None = None, port_name: str | None = None):
+        if self.print_msgs:
             print(f"{data}")
+        timestamp = timestamp if timestamp is not None else time.time()
+        # convert and validate the line once, everything below shares the typed message
+        try:
+            msg = parse_message(data, timestamp, port_name)
+        except MalformedMessageError as e:
+            with self.stats_lock:
+                self.malformed_lines[e.msg_type] = self.malformed_lines.get(e.msg_type, 0) + 1
+            if settings.debug: print(f"{e}:\n\t{data}")
+            return
+        if msg is None:
+            return
+        # remember which port the chamber talks on so commands can be sent only to it,
+        # lines still queued from a port that has closed since must not bring its routes back
+        if port_name is not None:
+            with self.lock:
+                if port_name in self.connections:
+                    self.routes.update(msg.chamber, port_name, timestamp)
         # save to appropriate CSV based off of message
         if self.save_data:
-            # Split the string into a list (assuming comma-and-space-separated values)
-            col = data.split(', ')
-            if not col:
-                return
-
-            match col[0]:
-                case "##PRESSURE":
+            match msg:
+                case PressureMessage():
                     # check chamber has been added by control system
-                    if self.last_readings.get(col[1], None) is not None:
-                        self.last_readings[col[1]]["pressure"] = col[2]
+                    if self.last_readings.get(msg.chamber, None) is not None:
+                        self.last_readings[msg.chamber]["pressure"] = msg.pressure
+                        for watch in self.pressure_watches.get(msg.chamber, ()):
+                            watch.update(msg.chamber, msg.pressure)
                     else:
-                        #if (settings.get("DEBUG", False)): print(f"Pressure reading recived for chamber \"{col[1]}\" but chamber is uninitialized.")
+                        #if (settings.debug): print(f"Pressure reading recived for chamber \"{msg.chamber}\" but chamber is uninitialized.")
                         pass
-                case "##READING":
+                case ReadingMessage():
                     # check chamber has been added by control system
-                    if self.last_readings.get(col[1], None) is not None:
-                        if self.ignore_next_reading.get(col[1], False):
-                            self.ignore_next_reading[col[1]] = False
-                            if (settings.get("DEBUG", False)): print(f"Ignoring sensor reading for chamber \"{col[1]}\"")
+                    if self.last_readings.get(msg.chamber, None) is not None:
+                        if self.ignore_next_reading.get(msg.chamber, False):
+                            self.ignore_next_reading[msg.chamber] = False
+                            if (settings.debug): print(f"Ignoring sensor reading for chamber \"{msg.chamber}\"")
                             return
-                        self.last_readings[col[1]]["reading"] = col[2]
-                        # save reading to csv file specific to the chamber
-                        file_path = f"data/chamber_{col[1]}_readings.csv"
-                        
-                        # replace the reading flag with a timestamp
-                        col[0] = str(int(time.time()))
-                        with open(file_path, mode='a', newline='', encoding='utf-8') as file:
-                            writer = csv.writer(file)
-                            writer.writerow(col)
-                        print(f"Data appended to {file_path}")
+                        self.last_readings[msg.chamber]["reading"] = data
+                        self.last_readings[msg.chamber]["message"] = msg
+                        for store in self.reading_stores:
+                            store.append(msg)
+                        self._ring_buffer_for(msg.chamber).append(msg.record)
+                        if self.inference is not None:
+                            self.inference.submit(msg.chamber, msg.record)
                     else:
-                        print(f"Sensor reading(s) recived for chamber \"{col[1]}\" but chamber is uninitialized:\n\t{data}")
-                case "##ALERT":
+                        print(f"Sensor reading(s) recived for chamber \"{msg.chamber}\" but chamber is uninitialized:\n\t{data}")
+                case AlertMessage():
                     # check chamber has been added by control system
-                    if self.last_readings.get(col[1], None) is not None:
-                        self.last_readings[col[1]]["alert"] = col[2]
-                        send_discord_alert_webhook(col[1], col[2])
+                    if self.last_readings.get(msg.chamber, None) is not None:
+                        self.last_readings[msg.chamber]["alert"] = msg.text
+                        # firmware repeats an alert while its condition lasts
+                        send_discord_alert_webhook(msg.chamber, msg.text, dedup=True)
                     else:
-                        if settings.get("DEBUG", False):
-                            print(f"Alert received for chamber \"{col[1]}\" but chamber is uninitialized:\n\t{data}")
-                            send_discord_alert_webhook(col[1], col[2])
+                        if settings.debug:
+                            print(f"Alert received for chamber \"{msg.chamber}\" but chamber is uninitialized:\n\t{data}")
+                        send_discord_alert_webhook(msg.chamber, msg.text, dedup=True)
+
+    def watch_pressure(self, chambers: list[str], pressure_lvl: float, low_pressure: bool) -> PressureWatch:
+        """
+        Registers a `PressureWatch` that is woken when the chambers' `##PRESSURE`
+        values cross `pressure_lvl`. The chambers' latest known pressure is checked
+        right away. Call `unwatch_pressure` when done waiting.
+        """
+        watch = PressureWatch(chambers, pressure_lvl, low_pressure)
+        with self.lock:
+            for chamber in watch.chambers:
+                self.pressure_watches[chamber] = [*self.pressure_watches.get(chamber, []), watch]
+        for chamber in watch.chambers:
+            watch.update(chamber, self.last_readings.get(chamber, {}).get("pressure", None))
+        return watch
+
+    def unwatch_pressure(self, watch: PressureWatch):
+        with self.lock:
+            for chamber in watch.chambers:
+                watches = self.pressure_watches.get(chamber)
+                if watches is None:
+                    continue
+                # copy on write so parse workers can iterate without the lock
+                remaining = [w for w in watches if w is not watch]
+                if remaining:
+                    self.pressure_watches[chamber] = remaining
+                else:
+                    del self.pressure_watches[chamber]
+
+    def _ring_buffer_for(self, chamber: str) -> ReadingRingBuffer:
+        ring = self.recent_readings.get(chamber)
+        if ring is None:
+            path = None
+            if self.ring_buffer_dir is not None:
+                path = os.path.join(self.ring_buffer_dir, f"chamber_{chamber}.ring")
+            ring = ReadingRingBuffer(capacity=self.ring_buffer_size, path=path)
+            self.recent_readings[chamber] = ring
+        return ring
+
+    def get_recent_readings(self, chamber: str, n: int | None = None):
+        """
+        Returns up to `n` of the chamber's most recent readings as a `READING_DTYPE`
+        array, oldest first. Empty if the chamber has not sent a reading yet.
+        """
+        ring = self.recent_readings.get(chamber)
+        if ring is None:
+            return np.zeros(0, dtype=READING_DTYPE)
+        return ring.latest(n)
+
+    def get_prediction(self, chamber: str) -> dict | None:
+        """The chamber's latest class prediction (see `InferenceService.get_prediction`), None without a model"""
+        if self.inference is None:
+            return None
+        return self.inference.get_prediction(chamber)
 
     def start_monitoring(self, monitor_interval: int = 2):
         if self.running:
             return  # already running
 
         self.running = True
+        if self.inference is not None:
+            self.inference.start()
+        self._start_parse_workers()
+        self._start_readers(monitor_interval)
+
+    def stop_monitoring(self, join_timeout: float = 3.0):
+        # Tell all threads to stop
+        self.running = False
+
+        self._stop_readers(join_timeout)
+
+        # Let the parse workers drain what the readers already queued, then stop them
+        for _ in self.parse_threads:
+            self.line_queue.put(None)
+        for th in self.parse_threads:
+            th.join(timeout=join_timeout)
+        self.parse_threads = []
+
+        # Write out any buffered readings and make sure they hit the disk
+        for store in self.reading_stores:
+            store.close(join_timeout=join_timeout)
+        for ring in self.recent_readings.values():
+            ring.flush()
+        if self.inference is not None:
+            self.inference.stop(join_timeout=join_timeout)
+
+    def _start_parse_workers(self):
+        self.parse_threads = []
+        for _ in range(max(1, self.num_parse_workers)):
+            t = threading.Thread(target=self._parse_worker, daemon=False)
+            self.parse_threads.append(t)
+            t.start()
+
+    def _start_readers(self, monitor_interval):
+        """Starts the port scanning thread, which spawns one reader thread per port"""
         self.monitor_thread = threading.Thread(
             target=self._monitor_ports,
             args=(monitor_interval,),
@@ -134,10 +357,8 @@ class SerialMonitor:
         )
         self.monitor_thread.start()
 
-    def stop_monitoring(self, join_timeout: float = 3.0):
-        # Tell all threads to stop
-        self.running = False
-
+    def _stop_readers(self, join_timeout):
+        """Waits for the port scanning thread and all reader threads to exit"""
         # Wait for monitor thread to exit
         t = self.monitor_thread
         if t is not None:
@@ -149,9 +370,17 @@ class SerialMonitor:
         for th in threads:
             th.join(timeout=join_timeout)
 
+    def _list_ports(self) -> list[str]:
+        """Returns the serial devices that should be listened on"""
+        if self.ports is not None:
+            return list(self.ports)
+        return [port.device for port in list_ports.comports()]
+
     def send_to_all_serial_ports(self, message: str, baudrate: int = 115200, timeout: float = 1.0):
         """
-        Sends a string message to all available serial ports.
+        Sends a string message to all available serial ports. Ports that are
+        already open by a reader are written through that handle, any other
+        port is opened just for this message.
 
         Parameters:
             message (`str`):
@@ -161,21 +390,55 @@ class SerialMonitor:
             timeout (`float`):
             Timeout for opening the serial port.
         """
-        ports = list_ports.comports()
-        for port in ports:
-            try:
-                with serial.Serial(port.device, baudrate=baudrate, timeout=timeout) as ser:
-                    ser.write(message.encode('utf-8'))
-                    print(f"Sent to {port.device}")
-            except serial.SerialException as e:
-                print(f"Failed to send to {port.device}: {e}")
-        if settings.get("DEBUG", False):
+        for port in self._list_ports():
+            self._write_to_port(port, message, baudrate=baudrate, timeout=timeout)
+        if settings.debug:
             print(f"Sent \"{message}\" to all serial ports")
 
+    def send_to_chamber(self, chamber_name: str, message: str, baudrate: int = 115200, timeout: float = 1.0) -> bool:
+        """
+        Sends a string message only to the port the chamber was last heard on.
+        Falls back to sending to all serial ports if the chamber's port is unknown.
+
+        Parameters:
+            chamber_name (`str`):
+            The name the chamber reports in its serial messages.
+            message (`str`):
+            The message to send.
+
+        Returns:
+            `bool`: True if the message was sent to the chamber's port, False if it was broadcast instead.
+        """
+        port = self.routes.port_for(chamber_name)
+        if port is not None and self._write_to_port(port, message, baudrate=baudrate, timeout=timeout):
+            if settings.debug:
+                print(f"Sent \"{message}\" to chamber \"{chamber_name}\" on {port}")
+            return True
+        self.send_to_all_serial_ports(message, baudrate=baudrate, timeout=timeout)
+        return False
+
+    def _write_to_port(self, port_name: str, message: str, baudrate: int = 115200, timeout: float = 1.0) -> bool:
+        with self.lock:
+            ser = self.connections.get(port_name)
+            write_lock = self.write_locks.setdefault(port_name, threading.Lock())
+        try:
+            with write_lock:
+                if ser is not None and ser.is_open:
+                    ser.write(message.encode('utf-8'))
+                    ser.flush()
+                else:
+                    with serial.Serial(port_name, baudrate=baudrate, timeout=timeout) as tmp_ser:
+                        tmp_ser.write(message.encode('utf-8'))
+            print(f"Sent to {port_name}")
+            return True
+        except (serial.SerialException, OSError) as e:
+            print(f"Failed to send to {port_name}: {e}")
+            return False
+
     def _monitor_ports(self, monitor_interval=2):
         # Scan for ports only while monitoring is active
         while self.running:
-            ports = [port.device for port in list_ports.comports()]
+            ports = self._list_ports()
 
             with self.lock:
                 if not self.running:
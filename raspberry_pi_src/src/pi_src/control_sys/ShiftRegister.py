@@ -1,12 +1,23 @@
-import RPi.GPIO as GPIO
-from time import sleep
+import threading
+from contextlib import contextmanager
 from ..config.config_manager import settings
-from typing import cast, Literal
+from typing import Any, cast, Literal
+from .ShiftRegisterTransport import ShiftTransport, GPIOShiftTransport, SPIShiftTransport
 
 class ShiftRegister:
     """
-    Controls an N-bit shift register. Based on the SN74LV595A 8-bit shift register
+    Controls an N-bit shift register, or a daisy chain of them (each register's
+    serial output wired to the next one's SER). Based on the SN74LV595A 8-bit shift register.
+    The chain is driven through a `ShiftTransport`: bit-banged GPIO by default, or
+    SPI when `valve_shift_reg_transport` is "spi".
+
+    The output image is kept as an integer bitmask, bit 0 is the first output of
+    the first register in the chain. A 595 chain can't be partially updated, so
+    every write clocks the whole chain, but writes that don't change the image
+    are skipped entirely.
     """
+    BITS_PER_REGISTER = 8
+
     def __init__(self,
                  num_bits: int = 8, # The number of bits "N" in the shift register
                  SER: int | None = None, # Serial input to the register
@@ -15,138 +26,138 @@ class ShiftRegister:
                  OE: int | None = None, # active low, when asserted it leaves the previous out values in the register
                                         # until RCLK is asserted, otherwise outputs are low while shifting in
                  SRCLR: int | None = None, # active low, clears the shiftted in values when asserted
-                 gpio_mode: Literal[10, 11] = GPIO.BCM): # outputs the value that was in the N-th bit when SRCLK is asserted
+                 gpio_mode: Literal[10, 11] = 11, # GPIO.BCM, outputs the value that was in the N-th bit when SRCLK is asserted
+                 num_registers: int | None = None, # number of chained 8-bit registers, overrides num_bits when given
+                 transport: ShiftTransport | None = None, # how the image reaches the chain, built from settings when None
+                 gpio: Any = None): # RPi.GPIO style backend for the default transports, HAL.get_gpio() when None
         
-        self.num_bits = num_bits
+        self.num_bits = num_registers * self.BITS_PER_REGISTER if num_registers is not None else num_bits
+        self._mask = (1 << self.num_bits) - 1
+        # desired output image and the image last latched to the outputs (None when unknown)
+        self._state = 0
+        self._latched: int | None = None
+
+        # batching state for transaction(), re-entrant so helpers can nest transactions
+        self._lock = threading.RLock()
+        self._txn_depth = 0
+
+        self.transport = transport if transport is not None else self._transport_from_settings(
+            SER=SER, SRCLK=SRCLK, RCLK=RCLK, OE=OE, SRCLR=SRCLR, gpio_mode=gpio_mode, gpio=gpio)
+        self.set_all_low()
+
+    @staticmethod
+    def _transport_from_settings(SER, SRCLK, RCLK, OE, SRCLR, gpio_mode, gpio=None) -> ShiftTransport:
+        rclk_value = RCLK or settings.get("valve_shift_reg_rclk_pin", 4)
+        if settings.get("valve_shift_reg_transport", "gpio") == "spi":
+            return SPIShiftTransport(bus=settings.get("valve_shift_reg_spi_bus", 0),
+                                     device=settings.get("valve_shift_reg_spi_device", 0),
+                                     max_speed_hz=settings.get("valve_shift_reg_spi_speed_hz", 1_000_000),
+                                     RCLK=rclk_value,
+                                     gpio_mode=gpio_mode,
+                                     gpio=gpio)
+
         ser_value: int | None = SER or cast(int | None, settings.get("valve_shift_reg_ser_pin", None))
         srclk_value: int | None = SRCLK or cast(int | None, settings.get("valve_shift_reg_srclk_pin", None))
-        rclk_value = RCLK or settings.get("valve_shift_reg_rclk_pin", 4)
         srclr_value = SRCLR or cast(int | None, settings.get("valve_shift_reg_srclr_pin", None))
-        self.OE = OE or settings.get("valve_shift_reg_oe_pin", None)
-
-        self.gpio_mode: Literal[10, 11] = gpio_mode
-        self.current_outputs: list[int] = [0] * num_bits
-        
-        self.settling_time = 0
-        
+        oe_value = OE or settings.get("valve_shift_reg_oe_pin", None)
         if (ser_value is None or srclk_value is None or srclr_value is None or srclk_value is None): 
             raise TypeError("No pin values provided for essential shift register pins")
-        
-        self.SER = ser_value
-        self.SRCLK = srclk_value
-        self.RCLK = rclk_value
-        self.SRCLR = srclr_value
+        return GPIOShiftTransport(SER=ser_value, SRCLK=srclk_value, RCLK=rclk_value,
+                                  SRCLR=srclr_value, OE=oe_value, gpio_mode=gpio_mode, gpio=gpio)
+
+    @property
+    def num_registers(self) -> int:
+        return -(-self.num_bits // self.BITS_PER_REGISTER)
+
+    @property
+    def current_outputs(self) -> list[int]:
+        """The output levels as a list, index i is output bit i"""
+        return [(self._state >> i) & 1 for i in range(self.num_bits)]
+
+    @current_outputs.setter
+    def current_outputs(self, levels: list[int]):
+        self._state = sum(1 << i for i, level in enumerate(levels) if level) & self._mask
+
+    @property
+    def word(self) -> int:
+        """The output image as an integer bitmask"""
+        return self._state
 
-        self._initialize_gpio()
-        self.set_all_low()
-    
     def write_bit(self, bit_num, level: int):
-        if (self.OE != None): self._disable_shift_reg_outputs()
-
-        GPIO.output(self.SRCLK, GPIO.LOW)
-        sleep(self.settling_time)
-        GPIO.output(self.RCLK, GPIO.LOW)
-        sleep(self.settling_time)
-        self.current_outputs[bit_num] = level
-        for i in range (self.num_bits-1, -1, -1): # reverse index 
-            GPIO.output(self.SER, bool(self.current_outputs[i]))
-            sleep(self.settling_time)
-            
-            GPIO.output(self.SRCLK, GPIO.HIGH)
-            sleep(self.settling_time)
-            
-            GPIO.output(self.SRCLK, GPIO.LOW)
-            sleep(self.settling_time)
-        self._commit()
-        if (self.OE != None): self._enable_shift_reg_outputs()
+        """
+        Sets one output bit. Shifts out the whole chain immediately, or once at
+        the end of the enclosing `transaction()` if one is open.
+        """
+        if not 0 <= bit_num < self.num_bits:
+            raise IndexError(f"bit {bit_num} out of range for a {self.num_bits} bit shift register")
+        with self._lock:
+            if level:
+                self._state |= 1 << bit_num
+            else:
+                self._state &= ~(1 << bit_num)
+            self._update()
+
+    def write_bits(self, levels: dict[int, int]):
+        """Sets several output bits ({bit_num: level}) with a single shift out"""
+        with self.transaction():
+            for bit_num, level in levels.items():
+                self.write_bit(bit_num, level)
+
+    def write_word(self, word: int):
+        """Replaces the whole output image with the integer bitmask `word`"""
+        with self._lock:
+            self._state = word & self._mask
+            self._update()
 
+    def write_register(self, register: int, byte: int):
+        """Replaces the 8 outputs of one register in the chain (0 is the register wired to SER)"""
+        if not 0 <= register < self.num_registers:
+            raise IndexError(f"register {register} out of range for a chain of {self.num_registers}")
+        shift = register * self.BITS_PER_REGISTER
+        with self._lock:
+            self._state = (self._state & ~(0xFF << shift) | (byte & 0xFF) << shift) & self._mask
+            self._update()
+
+    @contextmanager
+    def transaction(self):
+        """
+        Collects every write made inside the block and shifts the final image
+        out once when the outermost block exits. Nothing is shifted out if the
+        outputs didn't change.
+
+            with shift_reg.transaction():
+                shift_reg.write_bit(0, GPIO.HIGH)
+                shift_reg.write_bit(3, GPIO.LOW)
+        """
+        with self._lock:
+            self._txn_depth += 1
+            try:
+                yield self
+            finally:
+                self._txn_depth -= 1
+                self._update()
 
     def overwrite_buffer(self, bit_nums: list):
         # sets the bits specified in the bit_nums list to high and every other bit to low
-        if (self.OE != None): self._disable_shift_reg_outputs()
-        sleep(self.settling_time)
-        GPIO.output(self.SRCLK, GPIO.LOW)
-        sleep(self.settling_time)
-        
-        GPIO.output(self.RCLK, GPIO.LOW)
-        sleep(self.settling_time)
-        # for i in range (self.num_bits):
-        for i in range (self.num_bits-1, -1, -1): # reverse index
-            bit_val = GPIO.HIGH if i in bit_nums else GPIO.LOW
-            self.current_outputs[i] = bit_val
-            GPIO.output(self.SER, bit_val)
-            sleep(self.settling_time)
-            
-            GPIO.output(self.SRCLK, GPIO.HIGH)
-            sleep(self.settling_time)
-            
-            GPIO.output(self.SRCLK, GPIO.LOW)
-            sleep(self.settling_time)
-        self._commit()
-        if (self.OE != None): self._enable_shift_reg_outputs()
+        self.write_word(sum(1 << i for i in set(bit_nums) if 0 <= i < self.num_bits))
+
+    def _update(self):
+        # caller must hold self._lock, latches the image unless a transaction is open or nothing changed
+        if self._txn_depth == 0 and self._state != self._latched:
+            self._shift_out()
 
+    def _shift_out(self):
+        # pushes the whole image into the chain and latches it to the outputs
+        state = self._state
+        self.transport.shift_out(state, self.num_bits)
+        self._latched = state
 
     def set_all_low(self):
         """Sets all shift register outputs to low"""
-        if (self.SRCLR != None): 
-            self._clear_shadow_registers()
-            self._commit()
-        else: self.overwrite_buffer(bit_nums=[]) # write nothing which will set all values low
-        self.current_outputs = [0] * self.num_bits
-
-
-    def _initialize_gpio(self):
-        GPIO.setmode(self.gpio_mode)
-        # GPIO.setwarnings(False)
-        for pin in [self.SER, self.SRCLK, self.RCLK, self.SRCLR]:
-            GPIO.setup(pin, GPIO.OUT, initial=GPIO.LOW)
-            sleep(self.settling_time)
-        
-        GPIO.setup(self.SRCLR, GPIO.OUT, initial=GPIO.HIGH) # SRCLR is active low so writing high allows writting
-        sleep(self.settling_time)
-        if self.OE != None:
-            GPIO.setup(self.OE, GPIO.OUT, initial=GPIO.LOW)
-            sleep(self.settling_time)
-    
-    
-    def _disable_shift_reg_outputs(self):
-        # disable all shift register outputs
-        try:
-            if (self.OE == None): raise ValueError(f"OE pin not provided")
-            GPIO.output(self.OE, GPIO.LOW)
-            sleep(self.settling_time)
-        except ValueError as e:
-            print(f"ERROR: {e}")
-    
-    
-    def _enable_shift_reg_outputs(self):
-        # enables shift reg outputs if they were disabled (enabled by default)
-        try:
-            if (self.OE == None): raise ValueError(f"OE pin not provided")
-            GPIO.output(self.OE, GPIO.HIGH)
-            sleep(self.settling_time)
-        except ValueError as e:
-            print(f"ERROR: {e}")
-
-
-    def _commit(self):
-        # pushes values in shadow/storage registers to the output registers
-        GPIO.output(self.RCLK, GPIO.LOW)
-        sleep(self.settling_time)
-        
-        GPIO.output(self.RCLK, GPIO.HIGH)
-        sleep(self.settling_time)
-        
-        GPIO.output(self.RCLK, GPIO.LOW)
-        sleep(self.settling_time)
-
-
-    def _clear_shadow_registers(self):
-        GPIO.output(self.SRCLR, GPIO.HIGH)
-        sleep(self.settling_time)
-        
-        GPIO.output(self.SRCLR, GPIO.LOW)
-        sleep(self.settling_time)
-        
-        GPIO.output(self.SRCLR, GPIO.HIGH)
-        sleep(self.settling_time)
+        with self._lock:
+            if self._txn_depth:
+                self.write_word(0)
+                return
+            self.transport.clear(self.num_bits)
+            self._state = 0
+            self._latched = 0
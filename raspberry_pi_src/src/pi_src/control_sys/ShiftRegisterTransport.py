@@ -0,0 +1,223 @@
+"""
+ShiftRegisterTransport.py
+
+Transports that get a `ShiftRegister` output image into a 595 chain.
+
+- `GPIOShiftTransport` bit-bangs SER/SRCLK/RCLK through the HAL GPIO backend (the original driver).
+- `SPIShiftTransport` pushes the whole image in one spidev transfer, MOSI -> SER and
+  SCLK -> SRCLK, then latches it with RCLK.
+- `FakeShiftTransport` records every image written so bit order and batching can be
+  checked without hardware.
+
+Every transport takes the image as an integer (bit 0 is the first output of the
+register wired to SER) and sends it last bit first so bit 0 ends up in that register.
+"""
+import time
+from typing import Any, Literal
+
+from .HAL import get_gpio
+
+
+def word_to_bytes(word: int, num_bits: int) -> bytes:
+    """
+    Packs an output image into the bytes to shift out, in send order. The first
+    byte goes to the register at the far end of the chain and each byte is
+    shifted MSB first, which is the order SPI sends in.
+    """
+    num_bytes = -(-num_bits // 8)
+    return (word & ((1 << num_bits) - 1)).to_bytes(num_bytes, "big")
+
+
+class ShiftTransport:
+    """Interface for pushing an output image into a shift register chain"""
+    def shift_out(self, word: int, num_bits: int):
+        """Shifts `word` into the chain and latches it to the outputs"""
+        raise NotImplementedError
+
+    def clear(self, num_bits: int):
+        """Sets every output low"""
+        self.shift_out(0, num_bits)
+
+    def close(self):
+        pass
+
+
+class GPIOShiftTransport(ShiftTransport):
+    """
+    Bit-bangs the image out through an RPi.GPIO style backend, one SRCLK pulse per bit.
+
+    Parameters:
+        SER, SRCLK, RCLK (`int`): serial data, shift clock, and latch clock pins
+        SRCLR (`int | None`): active low clear pin, used to clear the chain in one pulse
+        OE (`int | None`): active low output enable pin
+        gpio_mode: GPIO numbering mode (GPIO.BOARD or GPIO.BCM)
+        settling_time (`float`): delay after every edge, skipped when 0
+        gpio: RPi.GPIO style backend, `HAL.get_gpio()` when None
+    """
+    def __init__(self,
+                 SER: int,
+                 SRCLK: int,
+                 RCLK: int,
+                 SRCLR: int | None = None,
+                 OE: int | None = None,
+                 gpio_mode: Literal[10, 11] = 11,
+                 settling_time: float = 0,
+                 gpio: Any = None):
+        self.GPIO = gpio if gpio is not None else get_gpio()
+        self.SER = SER
+        self.SRCLK = SRCLK
+        self.RCLK = RCLK
+        self.SRCLR = SRCLR
+        self.OE = OE
+        self.gpio_mode: Literal[10, 11] = gpio_mode
+        self.settling_time = settling_time
+        self._initialize_gpio()
+
+    def shift_out(self, word: int, num_bits: int):
+        GPIO = self.GPIO
+        if (self.OE != None): self._disable_shift_reg_outputs()
+
+        GPIO.output(self.SRCLK, GPIO.LOW)
+        self._settle()
+        GPIO.output(self.RCLK, GPIO.LOW)
+        self._settle()
+        ser_level = None
+        for i in range (num_bits-1, -1, -1): # reverse index
+            bit = (word >> i) & 1
+            if bit != ser_level: # SER only needs to change between differing bits
+                GPIO.output(self.SER, bit)
+                self._settle()
+                ser_level = bit
+
+            GPIO.output(self.SRCLK, GPIO.HIGH)
+            self._settle()
+
+            GPIO.output(self.SRCLK, GPIO.LOW)
+            self._settle()
+        self._commit()
+        if (self.OE != None): self._enable_shift_reg_outputs()
+
+    def clear(self, num_bits: int):
+        if self.SRCLR == None:
+            self.shift_out(0, num_bits)
+            return
+        self._clear_shadow_registers()
+        self._commit()
+
+    def _settle(self):
+        # per-edge delay, skipped entirely when no settling time is needed
+        if self.settling_time:
+            time.sleep(self.settling_time)
+
+    def _initialize_gpio(self):
+        GPIO = self.GPIO
+        GPIO.setmode(self.gpio_mode)
+        # GPIO.setwarnings(False)
+        for pin in [self.SER, self.SRCLK, self.RCLK]:
+            GPIO.setup(pin, GPIO.OUT, initial=GPIO.LOW)
+            self._settle()
+
+        if self.SRCLR != None:
+            GPIO.setup(self.SRCLR, GPIO.OUT, initial=GPIO.HIGH) # SRCLR is active low so writing high allows writting
+            self._settle()
+        if self.OE != None:
+            GPIO.setup(self.OE, GPIO.OUT, initial=GPIO.LOW)
+            self._settle()
+
+    def _disable_shift_reg_outputs(self):
+        # disable all shift register outputs
+        self.GPIO.output(self.OE, self.GPIO.LOW)
+        self._settle()
+
+    def _enable_shift_reg_outputs(self):
+        # enables shift reg outputs if they were disabled (enabled by default)
+        self.GPIO.output(self.OE, self.GPIO.HIGH)
+        self._settle()
+
+    def _commit(self):
+        # pushes values in shadow/storage registers to the output registers
+        GPIO = self.GPIO
+        GPIO.output(self.RCLK, GPIO.LOW)
+        self._settle()
+
+        GPIO.output(self.RCLK, GPIO.HIGH)
+        self._settle()
+
+        GPIO.output(self.RCLK, GPIO.LOW)
+        self._settle()
+
+    def _clear_shadow_registers(self):
+        GPIO = self.GPIO
+        GPIO.output(self.SRCLR, GPIO.HIGH)
+        self._settle()
+
+        GPIO.output(self.SRCLR, GPIO.LOW)
+        self._settle()
+
+        GPIO.output(self.SRCLR, GPIO.HIGH)
+        self._settle()
+
+
+class SPIShiftTransport(ShiftTransport):
+    """
+    Sends the whole image in one SPI transfer (MOSI -> SER, SCLK -> SRCLK) and
+    pulses RCLK afterwards. The 595 samples on the rising clock edge, so SPI mode 0 is used.
+
+    Parameters:
+        bus, device (`int`): spidev bus and chip select, ex: 0, 0 for /dev/spidev0.0
+        max_speed_hz (`int`): SPI clock rate
+        RCLK (`int | None`): latch pin, pulsed through the GPIO backend after each transfer. When None
+            the chip select line is assumed to be wired to RCLK, its rising edge at the end of
+            the transfer latches the outputs.
+        gpio_mode: GPIO numbering mode used for RCLK
+        gpio: RPi.GPIO style backend for RCLK, `HAL.get_gpio()` when None
+    """
+    def __init__(self,
+                 bus: int = 0,
+                 device: int = 0,
+                 max_speed_hz: int = 1_000_000,
+                 RCLK: int | None = None,
+                 gpio_mode: Literal[10, 11] = 11,
+                 gpio: Any = None):
+        import spidev
+        self.spi = spidev.SpiDev()
+        self.spi.open(bus, device)
+        self.spi.max_speed_hz = max_speed_hz
+        self.spi.mode = 0
+        self.RCLK = RCLK
+        self.GPIO = None
+        if RCLK is not None:
+            GPIO = gpio if gpio is not None else get_gpio()
+            self.GPIO = GPIO
+            GPIO.setmode(gpio_mode)
+            GPIO.setup(RCLK, GPIO.OUT, initial=GPIO.LOW)
+
+    def shift_out(self, word: int, num_bits: int):
+        self.spi.writebytes2(word_to_bytes(word, num_bits))
+        if self.GPIO is not None:
+            self.GPIO.output(self.RCLK, self.GPIO.HIGH)
+            self.GPIO.output(self.RCLK, self.GPIO.LOW)
+
+    def close(self):
+        self.spi.close()
+
+
+class FakeShiftTransport(ShiftTransport):
+    """
+    Records every image instead of driving hardware.
+
+    Attributes:
+        writes (`list[tuple[float, bytes]]`): (time.perf_counter(), bytes in send order) per shift out
+        latched (`int`): the image the outputs would currently show
+    """
+    def __init__(self):
+        self.writes: list[tuple[float, bytes]] = []
+        self.latched = 0
+
+    def shift_out(self, word: int, num_bits: int):
+        self.writes.append((time.perf_counter(), word_to_bytes(word, num_bits)))
+        self.latched = word & ((1 << num_bits) - 1)
+
+    def bits_sent(self, index: int = -1) -> list[int]:
+        """Returns the bits of one recorded write in the order they were clocked in"""
+        return [(byte >> (7 - i)) & 1 for byte in self.writes[index][1] for i in range(8)]
@@ -0,0 +1,178 @@
+"""
+StateStore.py
+
+Runtime state of the control system (purge history and chamber status), kept
+apart from the static configuration in config.json.
+
+The state lives in a SQLite database in WAL mode. Every update is a small
+appended transaction instead of a rewrite of the whole config file, so it is
+cheap to write many times a minute and a crash or power cut can only lose the
+last few commits, never corrupt the state.
+
+Recovery on startup: purges that were started but never finished (the process
+died mid purge) are marked "interrupted". Only purges that finished without an
+error ("done") count toward a group's last purge time, so an interrupted group
+is purged again right away.
+"""
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from ..config.config_manager import settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS purges (
+    id INTEGER PRIMARY KEY,
+    grp TEXT NOT NULL,
+    started REAL NOT NULL,
+    finished REAL,
+    status TEXT NOT NULL            -- running, done, failed, interrupted
+);
+CREATE INDEX IF NOT EXISTS purges_grp_started ON purges (grp, status, started);
+CREATE TABLE IF NOT EXISTS chambers (
+    slot INTEGER PRIMARY KEY,
+    name TEXT,
+    status TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+class StateStore:
+    """
+    Purge history and chamber status backed by a SQLite WAL database. Safe to
+    use from several threads.
+
+    Parameters:
+        path (`str | None`):
+            Database file, `state_db_path` or `<data_dir>/runtime_state.db` when None.
+        history_limit (`int | None`):
+            Purge records kept per group, older ones are pruned (`state_purge_history`).
+            A group's newest finished purge is always kept.
+    """
+    def __init__(self, path: str | None = None, history_limit: int | None = None):
+        self.path = path or settings.get("state_db_path", None) or os.path.join(settings.get("data_dir", "data"), "runtime_state.db")
+        self.history_limit = history_limit if history_limit is not None else settings.get("state_purge_history", 10000)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL only syncs at checkpoints in WAL mode, the database stays consistent on power loss
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self.interrupted = self.recover()
+
+    def recover(self) -> list[tuple[str, float]]:
+        """Marks purges left running by a crash as interrupted, returns their (group, start time)"""
+        with self.lock, self._transaction():
+            rows = self._conn.execute("SELECT grp, started FROM purges WHERE status = 'running'").fetchall()
+            self._conn.execute("UPDATE purges SET status = 'interrupted' WHERE status = 'running'")
+        return [(grp, started) for grp, started in rows]
+
+    def import_settings(self, config: dict):
+        """
+        One time migration of the runtime state that used to live in config.json
+        (`last_purge` per group and `disabled_chambers`). Does nothing once done.
+        """
+        with self.lock, self._transaction():
+            if self._conn.execute("SELECT 1 FROM meta WHERE key = 'imported_settings'").fetchone():
+                return
+            now = time.time()
+            for group, cfg in config.get("chamber_groups", {}).items():
+                last_purge = cfg.get("last_purge", 0)
+                if last_purge:
+                    self._conn.execute("INSERT INTO purges (grp, started, finished, status) VALUES (?, ?, ?, 'done')",
+                                       (group, last_purge, last_purge))
+            for slot in config.get("disabled_chambers", []):
+                self._conn.execute("INSERT OR IGNORE INTO chambers (slot, name, status, updated) VALUES (?, NULL, 'DISABLED', ?)",
+                                   (slot, now))
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('imported_settings', ?)", (str(now),))
+
+    def start_purge(self, group: str, started: float | None = None) -> int:
+        """Records the start of a purge and returns its id for `finish_purge`"""
+        started = started if started is not None else time.time()
+        with self.lock:
+            cur = self._conn.execute("INSERT INTO purges (grp, started, status) VALUES (?, ?, 'running')",
+                                     (group, started))
+            return cur.lastrowid
+
+    def finish_purge(self, purge_id: int, finished: float | None = None, ok: bool = True):
+        """Records the end of a purge, as "failed" when `ok` is False"""
+        finished = finished if finished is not None else time.time()
+        with self.lock, self._transaction():
+            self._conn.execute("UPDATE purges SET finished = ?, status = ? WHERE id = ?",
+                               (finished, "done" if ok else "failed", purge_id))
+            if self.history_limit:
+                self._prune(purge_id)
+
+    def _prune(self, purge_id: int):
+        # caller must hold self.lock, pruned per group so groups purged often can't push
+        # out the history (and the last purge time) of groups purged rarely
+        self._conn.execute(
+            "DELETE FROM purges WHERE grp = (SELECT grp FROM purges WHERE id = :id) "
+            "AND id NOT IN (SELECT id FROM purges WHERE grp = (SELECT grp FROM purges WHERE id = :id) "
+            "               ORDER BY id DESC LIMIT :limit) "
+            "AND id NOT IN (SELECT MAX(id) FROM purges WHERE grp = (SELECT grp FROM purges WHERE id = :id) "
+            "               AND status = 'done')",
+            {"id": purge_id, "limit": self.history_limit})
+
+    def last_purge(self, group: str) -> float:
+        """Start time of the group's last finished purge, 0 if it was never purged"""
+        with self.lock:
+            row = self._conn.execute("SELECT MAX(started) FROM purges WHERE grp = ? AND status = 'done'",
+                                     (group,)).fetchone()
+        return row[0] or 0
+
+    def purge_history(self, group: str | None = None, limit: int = 100) -> list[dict]:
+        """Newest first purge records, for one group or every group"""
+        query = "SELECT id, grp, started, finished, status FROM purges"
+        args: tuple = ()
+        if group is not None:
+            query += " WHERE grp = ?"
+            args = (group,)
+        query += " ORDER BY id DESC LIMIT ?"
+        with self.lock:
+            rows = self._conn.execute(query, (*args, limit)).fetchall()
+        return [dict(zip(("id", "group", "started", "finished", "status"), row)) for row in rows]
+
+    def set_chamber_status(self, slot: int, status: str, name: str | None = None):
+        with self.lock:
+            self._conn.execute("INSERT INTO chambers (slot, name, status, updated) VALUES (?, ?, ?, ?) "
+                               "ON CONFLICT (slot) DO UPDATE SET name = COALESCE(excluded.name, name), "
+                               "status = excluded.status, updated = excluded.updated",
+                               (slot, name, status, time.time()))
+
+    def chamber_status(self, slot: int) -> str | None:
+        """The last status recorded for the slot, None if nothing was recorded"""
+        with self.lock:
+            row = self._conn.execute("SELECT status FROM chambers WHERE slot = ?", (slot,)).fetchone()
+        return row[0] if row else None
+
+    def disabled_slots(self) -> list[int]:
+        with self.lock:
+            rows = self._conn.execute("SELECT slot FROM chambers WHERE status != 'NORMAL' ORDER BY slot").fetchall()
+        return [slot for slot, in rows]
+
+    @contextmanager
+    def _transaction(self):
+        # caller must hold self.lock, the connection is in autocommit mode otherwise
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def close(self):
+        with self.lock:
+            try:
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            finally:
+                self._conn.close()
@@ -1,5 +1,4 @@
 import time
-import RPi.GPIO as GPIO
 from .control_sys.ControlSystem import ControlSystem
 from .control_sys.LEDBreather import LEDBreather
 from .config.config_manager import settings
@@ -0,0 +1,297 @@
+"""
+BenchSimulator.py
+
+Runs N `VirtualChamber`s, each on its own pseudo-terminal, from a single thread.
+The slave side of every pty looks like a chamber board's serial port, so
+`SerialMonitor`/`AsyncSerialMonitor` and `ControlSystem` can run end to end
+against as many chambers as needed on an ordinary Linux machine.
+
+Valve states reach the chambers through `BenchValveTransport`, a shift register
+transport that decodes the valve image (bit (slot-1)*2 gas, bit (slot-1)*2+1
+vacuum) instead of driving hardware, and the vacuum pump state is read through
+`pump_state`. `attach_control_system` wires both up for a `ControlSystem`
+created with the "sim" HAL backend.
+
+Usage:
+    python -m pi_src.simulator.BenchSimulator -n 50 --reading-interval 5 --monitor
+"""
+import argparse
+import errno
+import fcntl
+import os
+import select
+import threading
+import time
+import tty
+from typing import Callable
+
+from ..control_sys.ShiftRegisterTransport import ShiftTransport
+from .VirtualChamber import VirtualChamber
+
+
+class BenchValveTransport(ShiftTransport):
+    """Shift register transport that hands every latched valve image to a `BenchSimulator`"""
+    def __init__(self, bench: "BenchSimulator"):
+        self.bench = bench
+        self.latched = 0
+
+    def shift_out(self, word: int, num_bits: int):
+        self.latched = word & ((1 << num_bits) - 1)
+        self.bench.set_valve_word(self.latched)
+
+
+class BenchSimulator:
+    """
+    Simulated test bench of virtual chambers on ptys.
+
+    Parameters:
+        num_chambers (`int`):
+            Number of chambers, given slots 1..N.
+        name_prefix (`str`):
+            Chamber names are `<name_prefix><slot>`.
+        tick (`float`):
+            Seconds between model steps.
+        pump_state (`Callable[[], bool] | None`):
+            Returns True while the vacuum pump is powered. Without it the pump is
+            treated as on whenever a vacuum valve is open.
+        max_pending_bytes (`int`):
+            Output kept per port while its reader is behind, lines past it are dropped.
+        **chamber_kwargs:
+            Passed to every `VirtualChamber`, ex: reading_interval, alert_rate.
+    """
+    def __init__(self,
+                 num_chambers: int = 4,
+                 name_prefix: str = "sim",
+                 tick: float = 0.05,
+                 pump_state: Callable[[], bool] | None = None,
+                 max_pending_bytes: int = 64 * 1024,
+                 seed: int | None = None,
+                 **chamber_kwargs):
+        self.chambers = [VirtualChamber(f"{name_prefix}{slot}", slot,
+                                        seed=None if seed is None else seed + slot,
+                                        **chamber_kwargs)
+                         for slot in range(1, num_chambers + 1)]
+        self.tick = tick
+        self.pump_state = pump_state
+        self.max_pending_bytes = max_pending_bytes
+
+        # chamber slot -> (master fd, slave fd, slave path)
+        self._ptys: dict[int, tuple[int, int, str]] = {}
+        self._out: dict[int, bytearray] = {}  # master fd -> bytes waiting to be written
+        self._in: dict[int, bytearray] = {}   # master fd -> partial command line
+        self._last_rx: dict[int, float] = {}  # master fd -> time the last command bytes arrived
+        self._by_fd: dict[int, VirtualChamber] = {}
+        self._lock = threading.Lock()
+        self.thread: threading.Thread | None = None
+        self.running = False
+
+        self.lines_sent = 0
+        self.lines_dropped = 0
+        self.commands_received = 0
+
+    @property
+    def port_paths(self) -> list[str]:
+        """Device paths of the chamber ports, in slot order"""
+        return [self._ptys[c.slot][2] for c in self.chambers if c.slot in self._ptys]
+
+    def port_for(self, chamber_name: str) -> str | None:
+        for chamber in self.chambers:
+            if chamber.name == chamber_name and chamber.slot in self._ptys:
+                return self._ptys[chamber.slot][2]
+        return None
+
+    def chamber_config(self, group: str = "bench") -> list[dict]:
+        """Returns name/group/slot entries for adding the chambers to a `ControlSystem`"""
+        return [{"name": c.name, "group": group, "slot": c.slot} for c in self.chambers]
+
+    def valve_transport(self) -> BenchValveTransport:
+        return BenchValveTransport(self)
+
+    def set_valve_word(self, word: int):
+        """Applies a valve image (2 bits per slot, gas then vacuum) to the chambers"""
+        with self._lock:
+            for chamber in self.chambers:
+                bit = (chamber.slot - 1) * 2
+                chamber.set_valves(gas_open=(word >> bit) & 1, vac_open=(word >> (bit + 1)) & 1)
+
+    def attach_control_system(self, control_system, group: str = "bench"):
+        """
+        Points a `ControlSystem` at the bench: its serial monitor listens on the
+        chamber ptys, its valve shift register drives the virtual valves, the
+        vacuum pump is read from its `SimulatedGPIO` backend, and every chamber is
+        added. The valve chain needs at least 2 bits per chamber (valve_shift_reg_count).
+        """
+        control_system.serial_monitor.ports = self.port_paths
+        control_system.valve_shift_reg.transport = self.valve_transport()
+        gpio, pin = control_system.GPIO, control_system.vacuum_ctrl_pin
+        self.pump_state = lambda: bool(gpio.levels.get(pin, 0))
+        for entry in self.chamber_config(group):
+            control_system.add_chamber(entry["name"], entry["group"], entry["slot"])
+
+    def start(self):
+        """Opens a pty per chamber and starts emitting serial traffic"""
+        if self.running:
+            return
+        for chamber in self.chambers:
+            master, slave = os.openpty()
+            tty.setraw(slave)  # no echo or newline translation, like a USB serial port
+            fcntl.fcntl(master, fcntl.F_SETFL, fcntl.fcntl(master, fcntl.F_GETFL) | os.O_NONBLOCK)
+            self._ptys[chamber.slot] = (master, slave, os.ttyname(slave))
+            self._out[master] = bytearray()
+            self._in[master] = bytearray()
+            self._last_rx[master] = 0.0
+            self._by_fd[master] = chamber
+        self.running = True
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self, join_timeout: float = 3.0):
+        """Stops the bench and closes every pty"""
+        self.running = False
+        if self.thread is not None:
+            self.thread.join(timeout=join_timeout)
+            self.thread = None
+        for master, slave, _ in self._ptys.values():
+            for fd in (master, slave):
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._ptys.clear()
+        self._out.clear()
+        self._in.clear()
+        self._last_rx.clear()
+        self._by_fd.clear()
+
+    def get_stats(self) -> dict:
+        return {
+            "chambers": len(self.chambers),
+            "lines_sent": self.lines_sent,
+            "lines_dropped": self.lines_dropped,
+            "commands_received": self.commands_received,
+            "purges": sum(c.purges for c in self.chambers),
+        }
+
+    def _run(self):
+        next_tick = time.monotonic()
+        masters = list(self._by_fd)
+        while self.running:
+            timeout = max(0.0, next_tick - time.monotonic())
+            writable = [fd for fd in masters if self._out[fd]]
+            try:
+                r, w, _ = select.select(masters, writable, [], timeout)
+            except (OSError, ValueError):
+                break  # ptys closed underneath us
+            for fd in r:
+                self._read_commands(fd)
+            for fd in w:
+                self._flush(fd)
+
+            now = time.monotonic()
+            if now < next_tick:
+                continue
+            next_tick += self.tick
+            if next_tick <= now:
+                next_tick = now + self.tick
+            pump_on = self.pump_state() if self.pump_state is not None else None
+            with self._lock:
+                for fd in masters:
+                    chamber = self._by_fd[fd]
+                    if self._in[fd] and now - self._last_rx[fd] >= self.tick:
+                        # SerialMonitor sends commands without a terminator, a quiet line ends one
+                        self._handle_command(fd, bytes(self._in[fd]), now)
+                        self._in[fd].clear()
+                    if chamber.valves_driven:
+                        chamber.pump_on = pump_on if pump_on is not None else chamber.vac_valve
+                    for line in chamber.step(now):
+                        self._queue_line(fd, line)
+                    if self._out[fd]:
+                        self._flush(fd)
+
+    def _queue_line(self, fd: int, line: str):
+        data = (line + "\r\n").encode()
+        if len(self._out[fd]) + len(data) > self.max_pending_bytes:
+            self.lines_dropped += 1
+            return
+        self._out[fd] += data
+        self.lines_sent += 1
+
+    def _flush(self, fd: int):
+        buf = self._out[fd]
+        try:
+            written = os.write(fd, buf)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            raise
+        del buf[:written]
+
+    def _read_commands(self, fd: int):
+        try:
+            data = os.read(fd, 4096)
+        except OSError:
+            return  # EIO/EAGAIN while no reader has the port open
+        now = time.monotonic()
+        self._last_rx[fd] = now
+        buf = self._in[fd]
+        buf += data
+        while (end := buf.find(b"\n")) != -1:
+            line = bytes(buf[:end])
+            del buf[:end + 1]
+            with self._lock:
+                self._handle_command(fd, line, now)
+
+    def _handle_command(self, fd: int, line: bytes, now: float):
+        # caller must hold self._lock
+        text = line.decode("utf-8", errors="replace").strip()
+        if text:
+            self.commands_received += 1
+            self._by_fd[fd].handle_command(text, now)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Run virtual chamber boards on pseudo-terminals")
+    parser.add_argument("-n", "--chambers", type=int, default=4, help="number of virtual chambers")
+    parser.add_argument("--reading-interval", type=float, default=300.0, help="seconds between ##READING lines per chamber")
+    parser.add_argument("--pressure-interval", type=float, default=1.0, help="seconds between ##PRESSURE lines per chamber")
+    parser.add_argument("--alert-rate", type=float, default=0.0, help="mean ##ALERT lines per second per chamber")
+    parser.add_argument("--leak-tau", type=float, default=3600.0, help="ambient leak time constant in seconds")
+    parser.add_argument("--tick", type=float, default=0.05, help="seconds between model steps")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--monitor", action="store_true",
+                        help="also run a SerialMonitor on the ports and print its ingest stats")
+    args = parser.parse_args()
+
+    bench = BenchSimulator(num_chambers=args.chambers,
+                           tick=args.tick,
+                           seed=args.seed,
+                           reading_interval=args.reading_interval,
+                           pressure_interval=args.pressure_interval,
+                           alert_rate=args.alert_rate,
+                           leak_tau=args.leak_tau)
+    bench.start()
+    for chamber, path in zip(bench.chambers, bench.port_paths):
+        print(f"{chamber.name} (slot {chamber.slot}): {path}")
+
+    monitor = None
+    if args.monitor:
+        from ..control_sys.SerialMonitor import SerialMonitor
+        monitor = SerialMonitor(ports=bench.port_paths)
+        monitor.start_monitoring()
+    try:
+        while True:
+            time.sleep(5)
+            print(bench.get_stats())
+            if monitor is not None:
+                print(monitor.get_ingest_stats())
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        if monitor is not None:
+            monitor.stop_monitoring()
+        bench.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
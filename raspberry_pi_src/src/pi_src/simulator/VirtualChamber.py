@@ -0,0 +1,204 @@
+"""
+VirtualChamber.py
+
+Model of one chamber board running `src/main.cc`. It produces the same serial
+lines the Feather firmware prints and follows its valves with a first order
+pressure model, so the Pi side can be exercised without hardware.
+
+Pressure model: every open path pulls the chamber pressure toward its source
+(vacuum pump, gas supply, ambient leak) with its own time constant. With open
+paths of time constants tau_i and targets p_i the pressure relaxes toward
+sum(p_i / tau_i) / sum(1 / tau_i) at rate sum(1 / tau_i), which is integrated
+exactly between steps so the curve doesn't depend on the step size. A leaky
+chamber (small `leak_tau`) stalls above the vacuum threshold the same way a
+badly sealed real chamber does.
+"""
+import math
+import random
+
+AMBIENT_PA = 101325.0
+
+# alert texts the firmware can print
+ALERT_TEXTS = [
+    "SCD4x Error: Received NACK on transmit of address",
+    "Failed to call readAllChannels as7341.",
+    "Failed to call averaged_read as7341.",
+    "GAS MEASUREMENT TIMED OUT",
+]
+
+# The Serial.printf format of ##READING in src/main.cc, byte for byte. The two
+# string literals are joined by the compiler, leaving no space after gas_res[6].
+READING_FORMAT = ("##READING, %s, %u, %f, %f, %f, %f, %f, %f, %f, %f, %f,"
+                  "%f, %f, %d, %d, %d, %d, %d, %d, %d, %d, %d, %d")
+
+
+class VirtualChamber:
+    """
+    One simulated chamber board.
+
+    Parameters:
+        name (`str`):
+            Chamber name sent in every message (`CHAMBER_NAME` on the board).
+        slot (`int`):
+            Valve slot, the board reacts to `#<slot>, purging`.
+        reading_interval (`float`):
+            Seconds between `##READING` lines (`SAMPLE_INTERVAL` on the board).
+        pressure_interval (`float`):
+            Seconds between `##PRESSURE` lines.
+        alert_rate (`float`):
+            Mean `##ALERT` lines per second.
+        vac_tau, gas_tau, leak_tau (`float`):
+            Time constants (s) of the vacuum, gas supply, and ambient leak paths.
+        vac_floor, gas_supply (`float`):
+            Pressure (Pa) the vacuum pump and the gas supply pull toward.
+        purge_hold (`float`):
+            Seconds after a purge command during which no `##READING` is sent.
+        scripted_purge (`tuple[float, float]`):
+            (vacuum s, gas s) the board cycles through on its own after a purge
+            command when nothing drives its valves.
+        seed (`int | None`):
+            Seed for the chamber's random number generator.
+    """
+    def __init__(self,
+                 name: str,
+                 slot: int,
+                 reading_interval: float = 300.0,
+                 pressure_interval: float = 1.0,
+                 alert_rate: float = 0.0,
+                 vac_tau: float = 1.5,
+                 gas_tau: float = 1.0,
+                 leak_tau: float = 3600.0,
+                 vac_floor: float = 1500.0,
+                 gas_supply: float = 103000.0,
+                 purge_hold: float = 30.0,
+                 scripted_purge: tuple[float, float] = (5.0, 5.0),
+                 seed: int | None = None):
+        self.name = name
+        self.slot = slot
+        self.reading_interval = reading_interval
+        self.pressure_interval = pressure_interval
+        self.alert_rate = alert_rate
+        self.vac_tau = vac_tau
+        self.gas_tau = gas_tau
+        self.leak_tau = leak_tau
+        self.vac_floor = vac_floor
+        self.gas_supply = gas_supply
+        self.purge_hold = purge_hold
+        self.scripted_purge = scripted_purge
+        self.rng = random.Random(seed)
+
+        self.pressure = AMBIENT_PA
+        self.gas_valve = False
+        self.vac_valve = False
+        self.pump_on = False
+        # True once a control system drives the valves, scripted purges are skipped from then on
+        self.valves_driven = False
+
+        # sensor state, drifts slowly between readings
+        self.co2 = self.rng.uniform(420, 600)
+        self.temperature = self.rng.uniform(21.0, 24.0)
+        self.humidity = self.rng.uniform(35.0, 50.0)
+        self.gas_res = [self.rng.uniform(20_000, 200_000) for _ in range(8)]
+        self.light = [self.rng.randint(50, 3000) for _ in range(10)]
+
+        self.purges = 0
+        self._last_step: float | None = None
+        # stagger first messages so N chambers don't all print in the same tick
+        self._next_reading: float | None = None
+        self._next_pressure: float | None = None
+        self._hold_until = 0.0
+        self._script_start: float | None = None
+
+    def set_valves(self, gas_open: bool, vac_open: bool):
+        """Sets the valve states from the control system's valve image"""
+        self.valves_driven = True
+        self._script_start = None
+        self.gas_valve = bool(gas_open)
+        self.vac_valve = bool(vac_open)
+
+    def handle_command(self, line: str, now: float) -> bool:
+        """Handles a line sent to the board, returns True if it was a purge command for this slot"""
+        parts = [part.strip() for part in line.strip().lstrip("#").split(",")]
+        if len(parts) != 2 or parts[1] != "purging":
+            return False
+        try:
+            if int(parts[0]) != self.slot:
+                return False
+        except ValueError:
+            return False
+        self.purges += 1
+        self._hold_until = now + self.purge_hold
+        if not self.valves_driven:
+            self._script_start = now
+        return True
+
+    def step(self, now: float) -> list[str]:
+        """Advances the model to `now` (monotonic seconds) and returns the lines the board prints"""
+        if self._last_step is None:
+            self._last_step = now
+            self._next_pressure = now + self.rng.uniform(0, self.pressure_interval)
+            self._next_reading = now + self.rng.uniform(0, self.reading_interval)
+        dt = now - self._last_step
+        self._last_step = now
+        self._run_script(now)
+        self._advance_pressure(dt)
+
+        lines = []
+        if now >= self._next_pressure:
+            self._next_pressure += self.pressure_interval
+            if self._next_pressure <= now:  # fell behind, don't burst to catch up
+                self._next_pressure = now + self.pressure_interval
+            lines.append(self.pressure_line())
+        if now >= self._next_reading:
+            self._next_reading += self.reading_interval
+            if self._next_reading <= now:
+                self._next_reading = now + self.reading_interval
+            if now >= self._hold_until:
+                self._drift()
+                lines.append(self.reading_line())
+        if self.alert_rate > 0 and self.rng.random() < 1 - math.exp(-self.alert_rate * dt):
+            lines.append(self.alert_line(self.rng.choice(ALERT_TEXTS)))
+        return lines
+
+    def pressure_line(self) -> str:
+        # Arduino String(float) prints two decimals
+        measured = self.pressure + self.rng.gauss(0, 15)
+        return f"##PRESSURE, {self.name}, {measured:.2f}"
+
+    def reading_line(self) -> str:
+        return READING_FORMAT % (self.name, int(self.co2), self.temperature, self.humidity,
+                                 *self.gas_res, self.pressure, *(int(l) for l in self.light))
+
+    def alert_line(self, text: str) -> str:
+        return f"##ALERT, {self.name}, {text}"
+
+    def _run_script(self, now: float):
+        # board driven purge cycle used when no valve image is available
+        if self._script_start is None:
+            return
+        vac_s, gas_s = self.scripted_purge
+        elapsed = now - self._script_start
+        self.pump_on = self.vac_valve = elapsed < vac_s
+        self.gas_valve = vac_s <= elapsed < vac_s + gas_s
+        if elapsed >= vac_s + gas_s:
+            self._script_start = None
+            self.pump_on = False
+
+    def _advance_pressure(self, dt: float):
+        if dt <= 0:
+            return
+        paths = [(AMBIENT_PA, self.leak_tau)]
+        if self.vac_valve and self.pump_on:
+            paths.append((self.vac_floor, self.vac_tau))
+        if self.gas_valve:
+            paths.append((self.gas_supply, self.gas_tau))
+        rate = sum(1 / tau for _, tau in paths)
+        target = sum(p / tau for p, tau in paths) / rate
+        self.pressure = target + (self.pressure - target) * math.exp(-rate * dt)
+
+    def _drift(self):
+        self.co2 = min(40_000, max(400, self.co2 + self.rng.gauss(5, 20)))
+        self.temperature += self.rng.gauss(0, 0.05)
+        self.humidity = min(100.0, max(0.0, self.humidity + self.rng.gauss(0, 0.2)))
+        self.gas_res = [max(1000.0, g * (1 + self.rng.gauss(-0.001, 0.01))) for g in self.gas_res]
+        self.light = [max(0, l + self.rng.randint(-20, 20)) for l in self.light]
@@ -0,0 +1,18 @@
+import json
+import os
+import tempfile
+
+EXAMPLE_CONFIG = os.path.join(os.path.dirname(__file__), "..", "src", "pi_src", "config", "example_config.json")
+
+
+def pytest_configure(config):
+    # settings are loaded when pi_src.config.config_manager is first imported, point them
+    # at a scratch copy of the example config so tests never touch a deployment's config.json
+    scratch = tempfile.mkdtemp(prefix="pi_src_tests_")
+    with open(EXAMPLE_CONFIG) as f:
+        example = json.load(f)
+    example.update({"DEBUG": 0, "data_dir": os.path.join(scratch, "data")})
+    path = os.path.join(scratch, "config.json")
+    with open(path, "w") as f:
+        json.dump(example, f, indent=2)
+    os.environ["PI_SRC_CONFIG"] = path
@@ -0,0 +1,74 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from pi_src.control_sys.DiscordAlerts import AlertDispatcher
+
+
+@pytest.fixture
+def webhook():
+    """Local webhook stub, answers with the queued status codes (then 204) and records each message"""
+    received, responses = [], []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            code = responses.pop(0) if responses else 204
+            received.append((code, body["content"]))
+            data = b'{"retry_after": 0.1}' if code == 429 else b""
+            self.send_response(code)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/webhook", received, responses
+    server.shutdown()
+    server.server_close()
+
+
+def _dispatcher(url, **kwargs):
+    options = {"coalesce_s": 0.2, "dedup_window_s": 60, "timeout_s": 2, "max_retries": 3, "min_interval_s": 0}
+    return AlertDispatcher(url=url, **{**options, **kwargs})
+
+
+def test_retries_on_5xx_and_429(webhook):
+    url, received, responses = webhook
+    responses.extend([500, 429])
+    dispatcher = _dispatcher(url)
+    dispatcher.send(1, "Vacuum pressure not met!")
+    assert dispatcher.stop(timeout=10)
+    assert [code for code, _ in received] == [500, 429, 204]
+    assert dispatcher.stats["sent"] == 1 and dispatcher.stats["failed"] == 0
+
+
+def test_burst_is_coalesced_into_one_message(webhook):
+    url, received, _ = webhook
+    dispatcher = _dispatcher(url)
+    dispatcher.send(1, "DISABLED")
+    dispatcher.send(2, "DISABLED")
+    dispatcher.send(3, "Gas pressure not met!")
+    assert dispatcher.stop(timeout=10)
+    assert received == [(204, "Chamber 1 DISABLED\nChamber 2 DISABLED\nChamber 3 Gas pressure not met!")]
+    assert dispatcher.stats["messages"] == 1 and dispatcher.stats["sent"] == 3
+
+
+def test_only_repeating_status_lines_are_deduplicated(webhook):
+    url, received, _ = webhook
+    dispatcher = _dispatcher(url)
+    for _ in range(2):
+        dispatcher.send("chamber1", "Temperature high", dedup=True)
+        dispatcher.send(1, "Vacuum pressure not met!")  # a separate purge each time
+        assert dispatcher.flush(timeout=10)
+    dispatcher.stop()
+    assert [content for _, content in received] == [
+        "Chamber chamber1 Temperature high\nChamber 1 Vacuum pressure not met!",
+        "Chamber 1 Vacuum pressure not met!",
+    ]
+    assert dispatcher.stats["deduplicated"] == 1
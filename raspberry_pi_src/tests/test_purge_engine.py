@@ -0,0 +1,24 @@
+from types import SimpleNamespace
+
+from pi_src.control_sys.PurgeEngine import PurgeEngine
+
+
+class FakeControlSystem:
+    def __init__(self, fail: bool):
+        self.fail = fail
+        self.group_chambers = {"A": [SimpleNamespace(chamber_slot=1)]}
+        self.purges = 0
+
+    def purge_chambers(self, chambers):
+        self.purges += 1
+        if self.fail:
+            raise TimeoutError("vacuum pressure not met")
+
+
+def test_on_done_reports_success_and_failure():
+    results = []
+    for fail in (False, True):
+        engine = PurgeEngine(FakeControlSystem(fail), cycles=2)
+        engine.submit(["A"], on_done=lambda groups, ok: results.append((groups, ok)))
+        assert engine.wait_idle(timeout=5)
+    assert results == [(["A"], True), (["A"], False)]
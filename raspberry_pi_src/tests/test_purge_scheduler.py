@@ -0,0 +1,17 @@
+from pi_src.control_sys.PurgeScheduler import PurgeScheduler
+
+
+def test_in_flight_group_is_not_rescheduled_until_finished():
+    scheduler = PurgeScheduler()
+    scheduler.schedule("a", 100.0)
+    assert scheduler.pop_due(now=100.0) == ["a"]
+    assert scheduler.in_flight("a")
+
+    # ex: the interval changed while "a" is purging
+    assert not scheduler.schedule("a", 50.0)
+    assert "a" not in scheduler
+    assert scheduler.pop_due(now=200.0) == []
+
+    scheduler.finish("a")
+    assert scheduler.schedule("a", 300.0)
+    assert scheduler.pop_due(now=300.0) == ["a"]
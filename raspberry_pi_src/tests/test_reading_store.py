@@ -0,0 +1,31 @@
+import csv
+
+from pi_src.control_sys.ReadingStore import BinaryReadingStore, convert_csv, load_chamber
+from pi_src.control_sys.SerialMessages import parse_message
+
+from test_serial_messages import FIRMWARE_LINE
+
+
+def test_convert_csv_keeps_firmware_rows(tmp_path):
+    csv_path = tmp_path / "chamber_chamber1_readings.csv"
+    reading = parse_message(FIRMWARE_LINE, timestamp=1700000000.0)
+    values = list(reading.raw_values)
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["1700000000", "chamber1", *values])
+        # gas_res_6 and gas_res_7 in one column, as logged before the fields were split on commas
+        writer.writerow(["1700000001", "chamber1", *values[:9], f"{values[9]},{values[10]}", *values[11:]])
+        writer.writerow(["1700000002", "chamber1", "garbage"])
+
+    assert convert_csv(str(csv_path), str(tmp_path / "binary")) == 2
+    records = load_chamber(str(tmp_path / "binary"), "chamber1")
+    assert records["timestamp"].tolist() == [1700000000, 1700000001]
+    assert records["gas_res_7"].tolist() == [1007.0, 1007.0]
+
+
+def test_binary_store_writes_batches_in_order(tmp_path):
+    store = BinaryReadingStore(data_dir=str(tmp_path), flush_rows=4, flush_interval=60)
+    for i in range(50):
+        store.append_record("chamber1", parse_message(FIRMWARE_LINE, timestamp=1700000000.0 + i).record)
+    store.close()
+    assert load_chamber(str(tmp_path), "chamber1")["timestamp"].tolist() == list(range(1700000000, 1700000050))
@@ -0,0 +1,37 @@
+import numpy as np
+
+from pi_src.control_sys.ReadingRingBuffer import ReadingRingBuffer
+from pi_src.control_sys.SerialMessages import READING_DTYPE
+
+
+def _records(timestamps):
+    records = np.zeros(len(timestamps), dtype=READING_DTYPE)
+    records["timestamp"] = timestamps
+    return records
+
+
+def test_file_backed_buffer_resumes_after_restart(tmp_path):
+    path = str(tmp_path / "chamber1.ring")
+    ring = ReadingRingBuffer(capacity=4, path=path)
+    for record in _records([1, 2, 3, 4, 5]):
+        ring.append(record)
+    ring.flush()
+    del ring
+
+    ring = ReadingRingBuffer(capacity=4, path=path)
+    assert ring.latest()["timestamp"].tolist() == [2, 3, 4, 5]
+    ring.append(_records([6])[0])
+    assert ReadingRingBuffer.open_reader(path).latest()["timestamp"].tolist() == [3, 4, 5, 6]
+
+
+def test_file_with_other_capacity_is_replaced(tmp_path):
+    path = str(tmp_path / "chamber1.ring")
+    old = ReadingRingBuffer(capacity=4, path=path)
+    for record in _records([1, 2]):
+        old.append(record)
+    reader = ReadingRingBuffer.open_reader(path)
+
+    ring = ReadingRingBuffer(capacity=8, path=path)
+    assert len(ring) == 0 and ring.capacity == 8
+    # a reader mapped to the old file keeps seeing its data
+    assert reader.latest()["timestamp"].tolist() == [1, 2]
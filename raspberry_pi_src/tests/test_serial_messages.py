@@ -0,0 +1,44 @@
+from pi_src.control_sys.SerialMessages import (READING_FIELDS, AlertMessage, ReadingMessage, parse_message,
+                                               split_fields)
+
+# Serial.printf format of ##READING in src/main.cc, the two string literals joined as the compiler does
+FIRMWARE_READING_FORMAT = ("##READING, %s, %u, %f, %f, %f, %f, %f, %f, %f, %f, %f,"
+                           "%f, %f, %d, %d, %d, %d, %d, %d, %d, %d, %d, %d")
+# a line as the firmware prints it, note "1006.000000,1007.000000" without a space
+FIRMWARE_LINE = ("##READING, chamber1, 412, 23.450000, 45.120000, 1000.000000, 1001.000000, 1002.000000, "
+                 "1003.000000, 1004.000000, 1005.000000, 1006.000000,1007.000000, 101325.000000, "
+                 "10, 11, 12, 13, 14, 15, 16, 17, 18, 19")
+
+
+def test_firmware_reading_line_parses():
+    msg = parse_message(FIRMWARE_LINE, timestamp=1700000000.0, port="/dev/ttyUSB0")
+    assert isinstance(msg, ReadingMessage)
+    assert msg.chamber == "chamber1"
+    assert len(msg.raw_values) == len(READING_FIELDS)
+    assert msg["co2_ppm"] == 412
+    assert msg["gas_res_6"] == 1006.0
+    assert msg["gas_res_7"] == 1007.0
+    assert msg["pressure"] == 101325.0
+    assert msg["light_9"] == 19
+
+
+def test_firmware_format_string_matches_sample_line():
+    values = (412, 23.45, 45.12, *(1000.0 + i for i in range(8)), 101325.0, *range(10, 20))
+    assert FIRMWARE_READING_FORMAT % ("chamber1", *values) == FIRMWARE_LINE
+
+
+def test_alert_text_keeps_commas():
+    msg = parse_message("##ALERT, chamber1, Vacuum pressure not met, retrying", timestamp=0.0)
+    assert isinstance(msg, AlertMessage)
+    assert msg.text == "Vacuum pressure not met, retrying"
+
+
+def test_split_fields_strips_whitespace():
+    assert split_fields("a, b,c ,  d") == ["a", "b", "c", "d"]
+
+
+def test_simulator_uses_firmware_layout():
+    from pi_src.simulator.VirtualChamber import READING_FORMAT, VirtualChamber
+    assert READING_FORMAT == FIRMWARE_READING_FORMAT
+    line = VirtualChamber("sim1", 1, seed=1).reading_line()
+    assert isinstance(parse_message(line, timestamp=0.0), ReadingMessage)
@@ -0,0 +1,52 @@
+import os
+import time
+
+import pytest
+
+from pi_src.control_sys.AsyncSerialMonitor import AsyncSerialMonitor
+from pi_src.control_sys.SerialMonitor import SerialMonitor
+
+from test_serial_messages import FIRMWARE_LINE
+
+
+def _wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.fixture
+def pty_port():
+    """A pseudo terminal pair, lines written to the master fd arrive on the slave port"""
+    master, slave = os.openpty()
+    yield master, os.ttyname(slave)
+    os.close(master)
+    os.close(slave)
+
+
+@pytest.mark.parametrize("monitor_cls", [SerialMonitor, AsyncSerialMonitor])
+def test_lines_from_port_are_parsed_and_routed(pty_port, monitor_cls):
+    master, port_name = pty_port
+    monitor = monitor_cls(ports=[port_name])
+    monitor.last_readings["chamber1"] = {"pressure": None, "reading": None, "message": None, "alert": None}
+    monitor.start_monitoring(monitor_interval=0.1)
+    try:
+        assert _wait_for(lambda: port_name in monitor.connections)
+        os.write(master, b"##PRESSURE, chamber1, 3000.00\r\n" + FIRMWARE_LINE.encode() + b"\r\n")
+        assert _wait_for(lambda: monitor.get_ingest_stats()["parsed_lines"] == 2)
+        assert monitor.routes.port_for("chamber1") == port_name
+    finally:
+        monitor.stop_monitoring()
+
+    stats = monitor.get_ingest_stats()
+    assert stats["received_lines"] == 2 and stats["dropped_lines"] == 0
+    assert stats["malformed_lines"] == {}
+    # the route goes away with the port
+    assert monitor.routes.port_for("chamber1") is None
+    assert monitor.last_readings["chamber1"]["pressure"] == 3000.0
+    assert monitor.last_readings["chamber1"]["reading"] == FIRMWARE_LINE
+    assert monitor.last_readings["chamber1"]["message"]["co2_ppm"] == 412
+    assert monitor.get_recent_readings("chamber1")["co2_ppm"].tolist() == [412]
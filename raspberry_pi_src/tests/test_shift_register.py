@@ -0,0 +1,62 @@
+from pi_src.control_sys.ShiftRegister import ShiftRegister
+from pi_src.control_sys.ShiftRegisterTransport import FakeShiftTransport
+
+
+def _shift_register(num_registers: int = 2) -> tuple[ShiftRegister, FakeShiftTransport]:
+    transport = FakeShiftTransport()
+    shift_reg = ShiftRegister(num_registers=num_registers, transport=transport)
+    transport.writes.clear()  # the clear done on construction
+    return shift_reg, transport
+
+
+def test_bit_order_across_two_register_chain():
+    shift_reg, transport = _shift_register()
+
+    # bit 0 is clocked in last so it stays in the register wired to SER
+    shift_reg.write_bit(0, 1)
+    assert transport.writes[-1][1] == b"\x00\x01"
+    assert transport.bits_sent() == [0] * 15 + [1]
+
+    # bit 8 is the first output of the second register, clocked in 8 bits earlier
+    shift_reg.write_bit(8, 1)
+    assert transport.writes[-1][1] == b"\x01\x01"
+    assert transport.bits_sent() == [0] * 7 + [1] + [0] * 7 + [1]
+
+    # the last output of the far register is the first bit clocked in
+    shift_reg.write_register(1, 0x80)
+    assert transport.bits_sent() == [1] + [0] * 14 + [1]
+    assert transport.latched == shift_reg.word == 0x8001
+    assert shift_reg.current_outputs == [1] + [0] * 14 + [1]
+
+
+def test_unchanged_writes_are_skipped():
+    shift_reg, transport = _shift_register()
+    shift_reg.write_bit(3, 1)
+    shift_reg.write_bit(3, 1)
+    shift_reg.write_bits({3: 1})
+    shift_reg.write_word(1 << 3)
+    assert len(transport.writes) == 1
+
+    shift_reg.write_bit(3, 0)
+    shift_reg.write_bit(3, 0)
+    assert len(transport.writes) == 2
+    assert transport.latched == 0
+
+
+def test_transaction_latches_once():
+    shift_reg, transport = _shift_register()
+    with shift_reg.transaction():
+        shift_reg.write_bit(0, 1)
+        shift_reg.write_bit(9, 1)
+        with shift_reg.transaction():  # nested blocks latch with the outermost one
+            shift_reg.write_bit(15, 1)
+            shift_reg.write_bit(0, 0)
+        assert transport.writes == []
+    assert len(transport.writes) == 1
+    assert transport.latched == (1 << 9) | (1 << 15)
+
+    # a transaction that ends where it started shifts nothing out
+    with shift_reg.transaction():
+        shift_reg.write_bit(2, 1)
+        shift_reg.write_bit(2, 0)
+    assert len(transport.writes) == 1
@@ -0,0 +1,42 @@
+from pi_src.control_sys.StateStore import StateStore
+
+
+def test_frequent_group_does_not_prune_rare_groups_last_purge(tmp_path):
+    store = StateStore(path=str(tmp_path / "state.db"), history_limit=5)
+    rare = store.start_purge("1", started=1000.0)
+    store.finish_purge(rare, finished=1010.0)
+    for i in range(50):
+        store.finish_purge(store.start_purge("Test 1", started=2000.0 + i), finished=2000.5 + i)
+
+    assert store.last_purge("1") == 1000.0
+    assert store.last_purge("Test 1") == 2049.0
+    assert len(store.purge_history("Test 1")) == 5
+    store.close()
+
+
+def test_pruning_keeps_newest_done_purge(tmp_path):
+    store = StateStore(path=str(tmp_path / "state.db"), history_limit=2)
+    store.finish_purge(store.start_purge("A", started=100.0))
+    # purges that never finished, ex: the process died mid purge each time
+    for i in range(5):
+        store.start_purge("A", started=200.0 + i)
+    store.close()
+    store = StateStore(path=str(tmp_path / "state.db"), history_limit=2)
+    store.finish_purge(store.start_purge("B", started=300.0))
+    store.finish_purge(store.start_purge("A", started=400.0))
+
+    assert store.last_purge("A") == 400.0
+    assert store.last_purge("B") == 300.0
+    assert [r["status"] for r in store.purge_history("A")] == ["done", "interrupted"]
+    store.close()
+
+
+def test_failed_purges_never_prune_the_last_done_purge(tmp_path):
+    store = StateStore(path=str(tmp_path / "state.db"), history_limit=2)
+    store.finish_purge(store.start_purge("A", started=100.0))
+    for i in range(5):
+        store.finish_purge(store.start_purge("A", started=200.0 + i), ok=False)
+
+    assert store.last_purge("A") == 100.0
+    assert [r["status"] for r in store.purge_history("A")] == ["failed", "failed", "done"]
+    store.close()